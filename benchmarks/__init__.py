@@ -0,0 +1,4 @@
+# Benchmark scripts for the FraudGuard scoring code.
+# Run from the repository root, e.g. `python -m benchmarks.bench_import_time`.
+# `python -m benchmarks.run_suite` runs the core set and writes a JSON report that
+# `--compare <baseline.json>` checks for regressions.
@@ -0,0 +1,134 @@
+# bench_dashboard_render.py
+"""Server-side time-to-render per dashboard interaction.
+
+Drives the dashboard with Streamlit's AppTest and, for each kind of
+interaction, times the script run itself (from the runner's SCRIPT_STARTED to
+its finish event, so AppTest's own start-up is left out) and counts the
+messages and bytes it sends to the browser, which is what the browser has to
+re-render. The interactions are:
+
+- page load: a full run of step 1
+- edit input: moving the V14 slider; the live risk preview is a fragment, so
+  only the fragment reruns (a script without input fragments is rerun whole)
+- analyze: the full run that renders the step-2 results
+
+    python -m benchmarks.bench_dashboard_render
+    python -m benchmarks.bench_dashboard_render --script old_dashboard.py
+
+--script points the benchmark at another copy of the dashboard (e.g. an older
+revision checked out next to it) for a before/after comparison.
+"""
+import argparse
+import dataclasses
+import os
+import statistics
+import time
+
+from streamlit.runtime.scriptrunner import ScriptRunnerEvent
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.runtime.scriptrunner_utils.script_requests import ScriptRequests
+from streamlit.testing.v1 import AppTest, app_test
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SCRIPT = os.path.join(ROOT, "deepseek_python_20260104_f682ac.py")
+DEFAULT_REPEATS = 15
+FINISHED = (ScriptRunnerEvent.SCRIPT_STOPPED_WITH_SUCCESS, ScriptRunnerEvent.SCRIPT_STOPPED_WITH_COMPILE_ERROR,
+            ScriptRunnerEvent.FRAGMENT_STOPPED_WITH_SUCCESS)
+
+
+class TimedScriptRunner(LocalScriptRunner):
+    """LocalScriptRunner that times its script run, counts what it sends and can rerun just some fragments."""
+
+    fragment_ids = []
+    last = None
+    script_cache = ScriptCache()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # A server compiles the script once; AppTest would recompile it for every run
+        self._script_cache = TimedScriptRunner.script_cache
+        if TimedScriptRunner.fragment_ids:
+            # Drop the full-run request ScriptRunner queues on creation; it would swallow the fragment rerun
+            self._requests = ScriptRequests()
+        self.started = self.finished = None
+        self.sent = []
+        self.on_event.connect(self._record, weak=False)
+        TimedScriptRunner.last = self
+
+    def _record(self, sender, event, **kwargs):
+        # A run that calls st.rerun() starts again in the same runner; time it through to the last finish
+        if event == ScriptRunnerEvent.SCRIPT_STARTED and self.started is None:
+            self.started = time.perf_counter()
+        elif event in FINISHED:
+            self.finished = time.perf_counter()
+        elif event == ScriptRunnerEvent.ENQUEUE_FORWARD_MSG:
+            self.sent.append(kwargs["forward_msg"])
+
+    def request_rerun(self, rerun_data):
+        if TimedScriptRunner.fragment_ids:
+            rerun_data = dataclasses.replace(rerun_data, fragment_id_queue=list(TimedScriptRunner.fragment_ids))
+        return super().request_rerun(rerun_data)
+
+    def stats(self):
+        deltas = [msg for msg in self.sent if msg.HasField("delta")]
+        return self.finished - self.started, len(deltas), sum(msg.ByteSize() for msg in deltas)
+
+
+# Function to get the ids of the fragments a run drew elements for
+def fragment_ids(runner):
+    return sorted({msg.delta.fragment_id for msg in runner.sent if msg.HasField("delta") and msg.delta.fragment_id})
+
+
+# Function to run at (whole, or only the given fragments) and return the last runner's stats
+def timed_run(at, fragments=()):
+    TimedScriptRunner.fragment_ids = list(fragments)
+    try:
+        at.run()
+    finally:
+        TimedScriptRunner.fragment_ids = []
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return TimedScriptRunner.last.stats()
+
+
+# Function to print the median script time, elements sent and bytes sent of a list of runs
+def report(label, runs):
+    seconds, deltas, sizes = zip(*runs)
+    print(f"{label:<24}: {statistics.median(seconds) * 1000:7.1f} ms, "
+          f"{statistics.median(deltas):4.0f} elements, {statistics.median(sizes) / 1024:6.1f} KiB sent")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--script", default=DEFAULT_SCRIPT, help="dashboard script to drive")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    args = parser.parse_args()
+
+    app_test.LocalScriptRunner = TimedScriptRunner
+    at = AppTest.from_file(os.path.abspath(args.script), default_timeout=120)
+    timed_run(at)  # warm the caches (model, feature store, stylesheet)
+
+    loads = [timed_run(at) for _ in range(args.repeats)]
+    report("page load (step 1)", loads)
+    fragments = fragment_ids(TimedScriptRunner.last)
+
+    edits = []
+    for i in range(args.repeats):
+        at.slider[0].set_value(round(0.3 + 0.02 * (i % 20), 2))
+        edits.append(timed_run(at, fragments))
+    report("edit input (fragment)" if fragments else "edit input (full rerun)", edits)
+
+    analyses = []
+    for _ in range(args.repeats):
+        at.session_state.current_step = 1
+        timed_run(at)
+        next(button for button in at.button if "Analyze" in button.label).click()
+        analyses.append(timed_run(at))
+        if at.session_state.current_step != 2:
+            raise RuntimeError("Analyze did not reach step 2")
+    report("analyze (step 2)", analyses)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# bench_decision_log.py
+"""DecisionLog sustained throughput and append() latency.
+
+Several threads append decisions concurrently, the way multiple dashboard
+sessions record Approve/Review/Block clicks. append() only enqueues, so its
+latency is what a caller sees; throughput is measured up to flush(), i.e.
+until every decision is committed to disk. A synchronous
+one-transaction-per-decision insert is timed for comparison.
+"""
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from decision_log import ACTIONS, INSERT, SCHEMA, DecisionLog, connect
+
+THREADS = 4
+DECISIONS_PER_THREAD = 25_000
+SYNC_DECISIONS = 2_000
+
+
+def run_threads(log, threads, per_thread):
+    latencies = [None] * threads
+
+    def writer(index):
+        samples = np.empty(per_thread)
+        for i in range(per_thread):
+            start = time.perf_counter()
+            log.append(f"TXN-{index}-{i}", ACTIONS[i % 3], 0.5, 100.0 + i, f"CARD-{i % 500:04d}")
+            samples[i] = time.perf_counter() - start
+        latencies[index] = samples
+
+    workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    log.flush()
+    return time.perf_counter() - start, np.concatenate(latencies) * 1e6
+
+
+def run_sync(path, decisions):
+    connection = connect(path)
+    connection.executescript(SCHEMA)
+    start = time.perf_counter()
+    for i in range(decisions):
+        with connection:
+            connection.execute(INSERT, (f"TXN-{i}", time.time(), i % 3, 0.5, 100.0, None))
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return elapsed
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        log = DecisionLog(os.path.join(directory, "decisions.db"))
+        elapsed, latencies = run_threads(log, THREADS, DECISIONS_PER_THREAD)
+        total = THREADS * DECISIONS_PER_THREAD
+        print(f"group commit: {total:,} decisions from {THREADS} threads in {elapsed:.2f} s "
+              f"-> {total / elapsed:,.0f} decisions/s in {log.commits:,} commits")
+        print(f"append() latency: p50 {np.percentile(latencies, 50):.1f} us, "
+              f"p99 {np.percentile(latencies, 99):.1f} us, max {latencies.max():.0f} us")
+        summary = log.summary()
+        assert summary["total"] == total, summary
+        log.close()
+
+        elapsed = run_sync(os.path.join(directory, "sync.db"), SYNC_DECISIONS)
+        print(f"one commit per decision: {SYNC_DECISIONS / elapsed:,.0f} decisions/s "
+              f"({elapsed / SYNC_DECISIONS * 1e6:.0f} us per blocking insert)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# bench_drift_monitor.py
+"""Per-event cost, memory and detection delay of the DriftMonitor.
+
+The reference profile is built from synthetic transactions (seed 42) and the
+traffic is another synthetic draw, shuffled so that a window is not one
+stretch of the day (time-of-day risk moves the score within a day). The
+benchmark times observe() next to the dashboard's inline scoring call
+(score_with_features) and observe_batch() at a few batch sizes, checks that
+the monitor's memory does not grow with the number of events, then replays
+stable traffic and a few kinds of drift and reports how many events it took
+to raise the first alert.
+"""
+import time
+import tracemalloc
+
+import numpy as np
+
+from drift_monitor import DriftMonitor, build_profile_from_frame
+from feature_store import VelocityFeatureStore, score_with_features
+from scoring_engine import calculate_risk_scores_frame
+from synthetic_data import generate_dataset
+
+REFERENCE_ROWS = 200_000
+EVENTS = 200_000
+BATCH_SIZES = (64, 1024)
+SCORER_COLUMNS = ["amount", "v14", "v17", "payment_method", "merchant", "device_type", "timestamp"]
+
+
+# Function to get shuffled traffic with risk scores as plain column arrays
+def traffic(n, seed):
+    frame = generate_dataset(n, seed)[SCORER_COLUMNS]
+    frame = frame.sample(frac=1, random_state=seed).reset_index(drop=True)
+    columns = {name: frame[name].to_numpy(np.float64) for name in ("amount", "v14", "v17")}
+    columns["risk_score"] = calculate_risk_scores_frame(frame)
+    return frame, columns
+
+
+# Function to feed columns one event at a time; returns seconds per event
+def per_event(monitor, columns):
+    rows = list(zip(*(columns[name].tolist() for name in ("amount", "v14", "v17", "risk_score"))))
+    start = time.perf_counter()
+    for amount, v14, v17, score in rows:
+        monitor.observe(amount, v14, v17, score)
+    return (time.perf_counter() - start) / len(rows)
+
+
+# Function to get how many drifted events it takes to raise the first alert after a full window of stable ones
+def events_to_alert(profile, stable, drifted):
+    raised = []
+    monitor = DriftMonitor(profile, on_alert=raised.append)
+    monitor.observe_batch(**{name: values[:monitor.window] for name, values in stable.items()})
+    for start in range(monitor.window, len(drifted["amount"]), 100):
+        monitor.observe_batch(**{name: values[start:start + 100] for name, values in drifted.items()})
+        if raised:
+            first = raised[0]
+            return (f"{first['level']} on {first['feature']} after {first['events'] - monitor.window:,} "
+                    f"drifted events (psi {first['psi']:.2f}, ks {first['ks']:.2f})")
+    return "no alert"
+
+
+def main():
+    profile = build_profile_from_frame(generate_dataset(REFERENCE_ROWS, 42)[SCORER_COLUMNS])
+    frame, columns = traffic(EVENTS, 7)
+    print(f"reference profile: {REFERENCE_ROWS:,} rows, "
+          f"{sum(feature.n_bins for feature in profile.values())} bins over {', '.join(profile)}")
+
+    store = VelocityFeatureStore()
+    sample = frame.head(20_000)
+    start = time.perf_counter()
+    for row in sample.itertuples(index=False):
+        score_with_features(store, "CARD-1", row.amount, row.v14, row.v17, row.payment_method, row.merchant,
+                            row.device_type)
+    scoring = (time.perf_counter() - start) / len(sample)
+    monitor = DriftMonitor(profile)
+    observe = per_event(monitor, columns)
+    print(f"score_with_features: {scoring * 1e6:6.2f} us/txn")
+    print(f"observe()          : {observe * 1e6:6.2f} us/txn ({observe / scoring:.0%} of scoring, "
+          f"{monitor.events // monitor.check_every:,} checks included)")
+    for size in BATCH_SIZES:
+        monitor = DriftMonitor(profile)
+        start = time.perf_counter()
+        for offset in range(0, EVENTS, size):
+            monitor.observe_batch(**{name: values[offset:offset + size] for name, values in columns.items()})
+        print(f"observe_batch({size:>4}): {(time.perf_counter() - start) / EVENTS * 1e6:6.2f} us/txn")
+
+    tracemalloc.start()
+    monitor = DriftMonitor(profile)
+    per_event(monitor, {name: values[:10_000] for name, values in columns.items()})
+    after_window, _ = tracemalloc.get_traced_memory()
+    per_event(monitor, columns)
+    after_all, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"monitor memory: {after_window / 1024:.1f} KiB after 10,000 events, "
+          f"{after_all / 1024:.1f} KiB after {10_000 + EVENTS:,}")
+
+    print(f"stable traffic   : {events_to_alert(profile, columns, columns)}")
+    cases = {
+        "amounts x1.5": dict(columns, amount=columns["amount"] * 1.5),
+        "v14 +0.1": dict(columns, v14=np.clip(columns["v14"] + 0.1, 0, 1)),
+        "2% missing v17": dict(columns, v17=np.where(np.arange(EVENTS) % 50 == 0, np.nan, columns["v17"])),
+        "scores +0.05": dict(columns, risk_score=columns["risk_score"] + 0.05),
+    }
+    for name, drifted in cases.items():
+        print(f"{name:<17}: {events_to_alert(profile, columns, drifted)}")
+
+
+if __name__ == "__main__":
+    main()
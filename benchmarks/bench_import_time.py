@@ -0,0 +1,58 @@
+# bench_import_time.py
+"""Cold-start benchmark for the headless scoring engine.
+
+Each measurement runs in a fresh interpreter so nothing is cached in
+sys.modules. The Streamlit import is measured the same way for comparison.
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 15
+
+ENGINE_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+import scoring_engine
+elapsed = time.perf_counter() - start
+heavy = [name for name in ("streamlit", "pandas", "numpy") if name in sys.modules]
+print(elapsed, ",".join(heavy))
+"""
+
+STREAMLIT_SNIPPET = """
+import time
+start = time.perf_counter()
+import streamlit
+print(time.perf_counter() - start, "")
+"""
+
+
+# Function to time an import snippet in a fresh interpreter
+def measure(snippet, runs=RUNS):
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", snippet], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.split()
+        timings.append(float(output[0]))
+        if len(output) > 1:
+            raise SystemExit(f"scoring_engine imported heavy modules: {output[1]}")
+    return timings
+
+
+def main():
+    engine = measure(ENGINE_SNIPPET)
+    print(f"import scoring_engine: median {statistics.median(engine) * 1000:.2f} ms, "
+          f"max {max(engine) * 1000:.2f} ms over {RUNS} runs")
+    try:
+        reference = measure(STREAMLIT_SNIPPET, runs=3)
+    except subprocess.CalledProcessError:
+        print("import streamlit: not installed, skipping comparison")
+    else:
+        print(f"import streamlit:      median {statistics.median(reference) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
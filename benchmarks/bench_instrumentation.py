@@ -0,0 +1,95 @@
+# bench_instrumentation.py
+"""Overhead of stage instrumentation and of the idle sampling profiler.
+
+score_with_features (three sampled stages) is timed with instrumentation
+disabled, enabled with the default 1-in-64 sampling, enabled with every call
+timed, and enabled with the sampling profiler running at its default 10 ms
+interval. Runs are interleaved and the best of
+several repeats is kept, but on a shared machine the spread between runs is
+larger than the overhead being measured. The overhead is therefore also
+built up from its measured parts (the per-call sampling check and the cost
+of one stage observation) and set against score_with_features and a ~100 us
+score_server request; a dashboard rerun takes tens of milliseconds.
+"""
+import itertools
+import time
+
+from feature_store import VelocityFeatureStore, score_with_features
+from instrumentation import INSTRUMENTATION, SamplingProfiler, clock
+
+CALLS = 20_000
+REPEATS = 25
+STAGES = 3
+
+
+def per_call_us(store, calls=CALLS):
+    start = time.perf_counter()
+    for i in range(calls):
+        score_with_features(store, i & 1023, 120.0, 0.35, 0.25, "Credit Card", "Amazon", "Desktop",
+                            timestamp=1_700_000_000 + i)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def observation_ns(calls=CALLS):
+    start = time.perf_counter()
+    for _ in range(calls):
+        INSTRUMENTATION.since("bench", clock())
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def untimed_call_ns(calls=CALLS * 10):
+    """Cost of the sampling check plus three skipped stages, minus an empty loop"""
+    sample = itertools.repeat(False)
+    start = time.perf_counter()
+    for _ in range(calls):
+        stage = clock() if next(sample) else 0
+        if stage:
+            pass
+        if stage:
+            pass
+        if stage:
+            pass
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(calls):
+        pass
+    return (elapsed - (time.perf_counter() - start)) / calls * 1e9
+
+
+def main():
+    store = VelocityFeatureStore()
+    per_call_us(store, 5_000)
+
+    sample_every = INSTRUMENTATION.sample_every
+    best = dict.fromkeys(("disabled", "enabled", "every call timed", "enabled + profiler"), float("inf"))
+    profiler = SamplingProfiler()
+    for _ in range(REPEATS):
+        INSTRUMENTATION.configure(enabled=False)
+        best["disabled"] = min(best["disabled"], per_call_us(store))
+        INSTRUMENTATION.configure(enabled=True, sample_every=sample_every)
+        best["enabled"] = min(best["enabled"], per_call_us(store))
+        INSTRUMENTATION.configure(sample_every=1)
+        best["every call timed"] = min(best["every call timed"], per_call_us(store))
+        INSTRUMENTATION.configure(sample_every=sample_every)
+        profiler.start()
+        best["enabled + profiler"] = min(best["enabled + profiler"], per_call_us(store))
+        profiler.stop()
+
+    baseline = best["disabled"]
+    for name, value in best.items():
+        print(f"score_with_features, instrumentation {name:<19} {value:6.2f} us/call "
+              f"({(value - baseline) / baseline:+.1%})")
+    print(f"profiler took {profiler.samples:,} samples while running")
+
+    # Run-to-run noise here is several percent, so also add the overhead up from its parts
+    tick = untimed_call_ns()
+    observation = observation_ns()
+    overhead = tick + STAGES * observation / sample_every
+    print(f"untimed call: {tick:.0f} ns; one stage observation: {observation:.0f} ns")
+    print(f"estimated overhead at 1 in {sample_every} timed: {overhead:.0f} ns/call "
+          f"= {overhead / (baseline * 1e3):.2%} of score_with_features, "
+          f"{overhead / 100e3:.2%} of a 100 us service request")
+
+
+if __name__ == "__main__":
+    main()
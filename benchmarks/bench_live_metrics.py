@@ -0,0 +1,52 @@
+# bench_live_metrics.py
+"""LiveMetrics update cost, snapshot cost and latency-sketch accuracy.
+
+snapshot() is timed after increasing numbers of recorded transactions to
+show that rendering the Control Panel does not grow with history, and the
+sketch's p50/p95/p99 are compared with exact NumPy percentiles of the same
+lognormal latencies.
+"""
+import time
+
+import numpy as np
+
+from live_metrics import LiveMetrics
+
+CHECKPOINTS = (1_000, 10_000, 100_000, 1_000_000)
+SNAPSHOT_REPEATS = 2_000
+
+
+def main():
+    rng = np.random.default_rng(13)
+    total = CHECKPOINTS[-1]
+    latencies = rng.lognormal(np.log(40e-6), 0.6, total)
+    scores = rng.random(total).tolist()
+    actions = np.array(["approved", "flagged", "blocked"])[rng.integers(0, 3, total)].tolist()
+    amounts = rng.lognormal(4, 1.3, total).tolist()
+
+    metrics = LiveMetrics(window=1e9)
+    done = 0
+    for checkpoint in CHECKPOINTS:
+        start = time.perf_counter()
+        for i in range(done, checkpoint):
+            metrics.record_score(scores[i], latencies[i])
+            metrics.record_decision(actions[i], amounts[i], scores[i])
+        update_us = (time.perf_counter() - start) / (checkpoint - done) * 1e6
+        done = checkpoint
+
+        start = time.perf_counter()
+        for _ in range(SNAPSHOT_REPEATS):
+            snapshot = metrics.snapshot()
+        snapshot_us = (time.perf_counter() - start) / SNAPSHOT_REPEATS * 1e6
+        print(f"{checkpoint:>9,} transactions: record_score+record_decision {update_us:5.2f} us, "
+              f"snapshot {snapshot_us:6.1f} us")
+
+    exact = np.percentile(latencies, [50, 95, 99])
+    sketch = (snapshot["latency_p50"], snapshot["latency_p95"], snapshot["latency_p99"])
+    for name, true, estimate in zip(("p50", "p95", "p99"), exact, sketch):
+        print(f"latency {name}: exact {true * 1e6:7.2f} us, sketch {estimate * 1e6:7.2f} us "
+              f"(error {abs(estimate - true) / true:.2%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# bench_model_load.py
+"""Load-time benchmark: .fgm model artifact versus pickle.
+
+Compares the create_model.py metadata on its own and with 50 MB of numeric
+arrays attached (the size of a real tree ensemble), plus the legacy
+"model (1).pkl" (a joblib-pickled RandomForestClassifier) when scikit-learn
+is installed to load it.
+"""
+import importlib
+import os
+import pickle
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from model_artifact import load_artifact, model_data_to_artifact, save_artifact
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 20
+
+
+def best_of(fn, runs=RUNS):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), statistics.median(timings)
+
+
+def load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def compare(label, tmp, metadata, arrays):
+    fgm_path = os.path.join(tmp, f"{label}.fgm")
+    pkl_path = os.path.join(tmp, f"{label}.pkl")
+    save_artifact(fgm_path, metadata, arrays)
+    with open(pkl_path, "wb") as f:
+        pickle.dump({"metadata": metadata, "arrays": dict(arrays)}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    fgm_best, fgm_median = best_of(lambda: load_artifact(fgm_path).close())
+    pkl_best, pkl_median = best_of(lambda: load_pickle(pkl_path))
+    print(f"{label:<22} fgm {fgm_median * 1000:8.3f} ms   pickle {pkl_median * 1000:8.3f} ms   "
+          f"({pkl_median / fgm_median:.1f}x)  size {os.path.getsize(fgm_path) / 1e6:.2f} MB")
+
+
+def main():
+    model_data = importlib.import_module("deepseek_python_20260104_200e72").model_data
+    metadata, arrays = model_data_to_artifact(model_data)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        compare("metadata", tmp, metadata, arrays)
+
+        rng = np.random.default_rng(0)
+        nodes = 50_000_000 // 24
+        large = dict(arrays, node_feature=rng.integers(0, 30, nodes).astype(np.int32),
+                     node_threshold=rng.random(nodes), node_left=np.arange(nodes, dtype=np.int32),
+                     node_right=np.arange(nodes, dtype=np.int32), node_value=rng.random(nodes))
+        compare("metadata + 50MB arrays", tmp, metadata, large)
+
+    legacy = os.path.join(ROOT, "model (1).pkl")
+    try:
+        import joblib
+        import sklearn  # noqa: F401
+    except ImportError:
+        print("model (1).pkl: scikit-learn not installed, skipping")
+    else:
+        _, median = best_of(lambda: joblib.load(legacy), runs=5)
+        print(f"{'model (1).pkl':<22} joblib {median * 1000:8.3f} ms")
+    fgm = os.path.join(ROOT, "model.fgm")
+    if os.path.exists(fgm):
+        _, median = best_of(lambda: load_artifact(fgm).close())
+        print(f"{'model.fgm':<22} fgm    {median * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# bench_parallel_scoring.py
+"""Scaling benchmark for score_file.py --workers over a synthetic 1M-row CSV."""
+import os
+import sys
+import tempfile
+import time
+
+from synthetic_data import generate_transactions
+from score_file import score_file
+
+ROWS = 1_000_000
+WORKER_COUNTS = (1, 2, 4, 8)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "transactions.csv")
+        generate_transactions(rows).to_csv(input_path, index=False)
+        print(f"{rows:,} rows, {os.cpu_count()} CPUs available")
+
+        baseline = None
+        for workers in WORKER_COUNTS:
+            output_path = os.path.join(tmp, f"scores_{workers}.csv")
+            start = time.perf_counter()
+            score_file(input_path, output_path, quiet=True, workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers} worker(s): {elapsed:6.2f}s  {rows / elapsed:>12,.0f} rows/s  "
+                  f"speedup {baseline / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# bench_risk_table.py
+"""Microbenchmark: calls/sec of the scalar scorer before and after compiling the risk tables.
+
+legacy_calculate_risk_score is the original dashboard function, which rebuilt
+the three risk dicts and read the wall clock on every call.
+"""
+import random
+import time
+from datetime import datetime
+
+from scoring_engine import DEFAULT_RISK_TABLE, calculate_risk_score
+
+CALLS = 200_000
+
+
+def legacy_calculate_risk_score(amount, v14, v17, payment_method, merchant, device_type="Desktop"):
+    base_risk = 0.05
+    amount_risk = min(amount / 10000, 0.25)
+    v14_risk = v14 * 0.25
+    v17_risk = v17 * 0.20
+    payment_risks = {"Credit Card": 0.05, "Debit Card": 0.08, "Digital Wallet": 0.12,
+                     "Bank Transfer": 0.15, "Cryptocurrency": 0.25}
+    method_risk = payment_risks.get(payment_method, 0.10)
+    merchant_risks = {"Amazon": 0.05, "Apple": 0.04, "Netflix": 0.03, "Uber": 0.08, "Airbnb": 0.12,
+                      "Walmart": 0.06, "Target": 0.05, "Best Buy": 0.06, "Other": 0.15}
+    merchant_risk = merchant_risks.get(merchant, 0.10)
+    device_risks = {"Mobile": 0.05, "Desktop": 0.03, "Tablet": 0.06, "Unknown": 0.20}
+    device_risk = device_risks.get(device_type, 0.10)
+    current_hour = datetime.now().hour
+    if 0 <= current_hour < 6:
+        time_risk = 0.15
+    elif 6 <= current_hour < 12:
+        time_risk = 0.05
+    elif 12 <= current_hour < 18:
+        time_risk = 0.04
+    else:
+        time_risk = 0.08
+    return min(base_risk + amount_risk + v14_risk + v17_risk + method_risk + merchant_risk + device_risk
+               + time_risk, 0.95)
+
+
+def make_rows(count, seed=7):
+    rng = random.Random(seed)
+    table = DEFAULT_RISK_TABLE
+    return [
+        (rng.uniform(0, 5000), rng.random(), rng.random(), rng.choice(table.payment_methods),
+         rng.choice(table.merchants), rng.choice(table.device_types))
+        for _ in range(count)
+    ]
+
+
+def rate(fn, rows):
+    start = time.perf_counter()
+    for row in rows:
+        fn(*row)
+    return len(rows) / (time.perf_counter() - start)
+
+
+def main():
+    rows = make_rows(CALLS)
+    table = DEFAULT_RISK_TABLE
+    hour = datetime.now().hour
+    encoded = [(a, b, c, table.payment_id(p), table.merchant_id(m), table.device_id(d), hour)
+               for a, b, c, p, m, d in rows]
+    with_hour = [row + (hour,) for row in rows]
+
+    results = [
+        ("legacy calculate_risk_score", rate(legacy_calculate_risk_score, rows)),
+        ("calculate_risk_score", rate(calculate_risk_score, rows)),
+        ("RiskTable.score", rate(table.score, with_hour)),
+        ("RiskTable.score_encoded", rate(table.score_encoded, encoded)),
+    ]
+    baseline = results[0][1]
+    for name, calls_per_sec in results:
+        print(f"{name:<30} {calls_per_sec:>12,.0f} calls/s  ({calls_per_sec / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
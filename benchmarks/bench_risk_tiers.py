@@ -0,0 +1,46 @@
+# bench_risk_tiers.py
+"""Threshold tiering: per-row get_risk_level calls vs one searchsorted over the array.
+
+Also compares the memory of per-row label strings with the uint8 tier codes
+(and the pandas Categorical built on them) that score_file now writes.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from scoring_engine import DEFAULT_RISK_TABLE, RISK_TIERS, get_risk_level
+
+ROWS = 1_000_000
+
+
+def main():
+    scores = np.random.default_rng(5).random(ROWS) * 0.95
+    tiers = DEFAULT_RISK_TABLE.tiers
+
+    start = time.perf_counter()
+    labels = [get_risk_level(score)[0] for score in scores.tolist()]
+    chain = time.perf_counter() - start
+
+    start = time.perf_counter()
+    codes = tiers.classify(scores)
+    vectorized = time.perf_counter() - start
+
+    start = time.perf_counter()
+    categorical = tiers.labels(codes)
+    categorical_time = time.perf_counter() - start
+
+    print(f"{ROWS:,} scores")
+    print(f"get_risk_level per row:         {chain * 1000:8.1f} ms")
+    print(f"RiskTiers.classify searchsorted: {vectorized * 1000:8.1f} ms ({chain / vectorized:,.0f}x faster)")
+    print(f"codes -> Categorical:            {categorical_time * 1000:8.1f} ms")
+
+    strings = pd.Series(labels, dtype=object).memory_usage(deep=True)
+    tier_strings = pd.Series(np.array([tier[0] for tier in RISK_TIERS], dtype=object)[codes]).memory_usage(deep=True)
+    print(f"per-row label strings: {strings / 2 ** 20:7.1f} MiB (level), {tier_strings / 2 ** 20:7.1f} MiB (tier)")
+    print(f"uint8 tier codes:      {codes.nbytes / 2 ** 20:7.1f} MiB; Categorical "
+          f"{pd.Series(categorical).memory_usage(deep=True) / 2 ** 20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
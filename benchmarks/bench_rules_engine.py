@@ -0,0 +1,107 @@
+# bench_rules_engine.py
+"""Memory and lookup speed of compiled allow/deny lists vs Python sets and dicts.
+
+Builds a 2M-card deny list and a 500k-merchant risk list, once as a
+RuleSet (hashed, Bloom-filtered, saved and memory-mapped back) and once as
+a plain set / dict of the same keys. Memory is measured with tracemalloc for
+the Python containers, key strings included, and reported by
+RuleSet.memory() for the compiled lists. Lookups are timed for keys on the
+list (hits) and off it (misses, most of which the Bloom filter answers), one
+at a time and as whole columns through evaluate_many(), and the benchmark
+times a hot reload: rewriting the file and the watcher's swap to the new
+rules.
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from rules_engine import RuleSet, RulesWatcher, format_bytes, print_memory
+
+DENIED_CARDS = 2_000_000
+MERCHANTS = 500_000
+QUERIES = 100_000
+BATCH = 10_000
+
+
+# Function to return fn's result and the memory it left allocated
+def traced(fn):
+    tracemalloc.start()
+    result = fn()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+# Function to get the mean seconds per call of lookup over keys
+def per_lookup(lookup, keys):
+    start = time.perf_counter()
+    for key in keys:
+        lookup(key)
+    return (time.perf_counter() - start) / len(keys)
+
+
+def main():
+    rng = np.random.default_rng(3)
+    cards = [f"CARD-{i:012d}" for i in range(2 * DENIED_CARDS)]
+    denied = cards[:DENIED_CARDS]
+    merchant_risks = {f"merchant-{i:08d}": float(risk) for i, risk in enumerate(rng.uniform(0, 0.3, MERCHANTS))}
+
+    start = time.perf_counter()
+    rules = RuleSet.build({"deny_cards": denied, "merchant_risk": merchant_risks})
+    print(f"compiled {DENIED_CARDS:,} cards + {MERCHANTS:,} merchants in {time.perf_counter() - start:.1f}s")
+    print_memory(rules)
+
+    # Fresh key strings, as when the lists are read from their files
+    python_set, set_bytes = traced(lambda: {f"CARD-{i:012d}" for i in range(DENIED_CARDS)})
+    python_dict, dict_bytes = traced(lambda: {f"merchant-{i:08d}": risk
+                                              for i, risk in enumerate(merchant_risks.values())})
+    memory = rules.memory()["lists"]
+    print(f"python set of cards      : {format_bytes(set_bytes):>11} ({set_bytes / DENIED_CARDS:.0f} B/entry, "
+          f"{set_bytes / memory['deny_cards']['total']:.1f}x the compiled list)")
+    print(f"python dict of merchants : {format_bytes(dict_bytes):>11} ({dict_bytes / MERCHANTS:.0f} B/entry, "
+          f"{dict_bytes / memory['merchant_risk']['total']:.1f}x the compiled list)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rules.fgm")
+        rules.save(path)
+        start = time.perf_counter()
+        watcher = RulesWatcher(path, check_interval=0)
+        print(f"load (memory-mapped): {(time.perf_counter() - start) * 1000:.2f} ms, "
+              f"file {format_bytes(os.path.getsize(path))}")
+        loaded = watcher.current()
+
+        hits = [denied[i] for i in rng.integers(0, DENIED_CARDS, QUERIES).tolist()]
+        misses = [cards[i] for i in rng.integers(DENIED_CARDS, 2 * DENIED_CARDS, QUERIES).tolist()]
+        for label, keys in (("hit ", hits), ("miss", misses)):
+            compiled = per_lookup(loaded.deny_cards.__contains__, keys)
+            baseline = per_lookup(python_set.__contains__, keys)
+            print(f"deny_cards {label}: compiled {compiled * 1e6:5.2f} us, set {baseline * 1e6:5.2f} us")
+        assert all(key in loaded.deny_cards for key in hits[:1000])
+        assert not any(key in loaded.deny_cards for key in misses[:1000])
+        merchants = list(merchant_risks)
+        verdict = per_lookup(lambda key: loaded.evaluate(key, merchants[len(key) % MERCHANTS]), misses)
+        print(f"evaluate(card, merchant): {verdict * 1e6:5.2f} us")
+
+        batch_cards = np.array(misses[:BATCH // 2] + hits[:BATCH // 2])
+        batch_merchants = np.array([merchants[i] for i in rng.integers(0, MERCHANTS, BATCH).tolist()])
+        start = time.perf_counter()
+        denied_rows, risks = loaded.evaluate_many(batch_cards, batch_merchants)
+        elapsed = time.perf_counter() - start
+        print(f"evaluate_many({BATCH:,} rows): {elapsed * 1000:.1f} ms ({elapsed / BATCH * 1e6:.2f} us/row), "
+              f"{int(denied_rows.sum()):,} denied, {int(np.isfinite(risks).sum()):,} merchant risks")
+
+        RuleSet.build({"deny_cards": denied[:DENIED_CARDS // 2], "merchant_risk": merchant_risks}).save(path)
+        start = time.perf_counter()
+        reloaded = watcher.current()
+        print(f"hot reload: swapped in {(time.perf_counter() - start) * 1000:.2f} ms "
+              f"(reloads {watcher.reloads}); old rules still answer: {hits[0] in loaded.deny_cards}, "
+              f"new rules: {len(reloaded.deny_cards):,} cards")
+        loaded.close()
+        reloaded.close()
+
+
+if __name__ == "__main__":
+    main()
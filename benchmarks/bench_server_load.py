@@ -0,0 +1,109 @@
+# bench_server_load.py
+"""Load test for score_server.py: p50/p99 latency and throughput.
+
+Starts the service in a subprocess (or targets --port of a running one) and
+drives it with concurrent keep-alive connections. Every request sends the same
+payload, so the spawned server runs with its score cache off (--cache-size 0)
+to measure micro-batched scoring rather than cache hits.
+
+    python -m benchmarks.bench_server_load --connections 64 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAYLOAD = json.dumps({
+    "amount": 500.0, "v14": 0.35, "v17": 0.25,
+    "payment_method": "Credit Card", "merchant": "Amazon", "device_type": "Desktop",
+}).encode()
+REQUEST = (b"POST /score HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+           b"Content-Length: " + str(len(PAYLOAD)).encode() + b"\r\n\r\n" + PAYLOAD)
+
+
+async def read_response(reader):
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    return await reader.readexactly(length)
+
+
+async def client(host, port, deadline, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            writer.write(REQUEST)
+            await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, connections, seconds):
+    latencies = []
+    deadline = time.monotonic() + seconds
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, deadline, latencies) for _ in range(connections)))
+    return latencies, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def wait_for_port(host, port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, help="use an already running service on this port")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    args = parser.parse_args()
+
+    host, port, server = "127.0.0.1", args.port, None
+    if port is None:
+        port = 18080
+        server = subprocess.Popen(
+            [sys.executable, "score_server.py", "--port", str(port),
+             "--window-ms", str(args.window_ms), "--max-batch", str(args.max_batch), "--cache-size", "0"],
+            cwd=ROOT, stdout=subprocess.DEVNULL,
+        )
+    try:
+        asyncio.run(wait_for_port(host, port))
+        latencies, elapsed = asyncio.run(run_load(host, port, args.connections, args.seconds))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(f"{len(latencies):,} requests over {args.connections} connections in {elapsed:.1f}s")
+    print(f"throughput {len(latencies) / elapsed:,.0f} req/s")
+    print(f"p50 {percentile(latencies, 0.50) * 1000:.2f} ms   p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
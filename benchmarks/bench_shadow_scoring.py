@@ -0,0 +1,134 @@
+# bench_shadow_scoring.py
+"""p99 cost of shadow (champion/challenger) scoring on the champion's path.
+
+Scores synthetic traffic (seed 42) in micro-batches the way score_server.py
+does, timing each champion call (score_transactions plus ShadowScorer.submit)
+with no shadow scoring, with two challengers on a thread pool, with the same
+challengers on a process pool and on the thread pool with only --sample-rate
+of the batches shadow-scored. Batches arrive every --interval-ms, like
+the server's micro-batch window, so the challengers run between and alongside
+them. A last run submits as fast as the champion can score with a small
+max_pending, to show that a backlog is dropped rather than queued.
+
+The challengers are copies of model.fgm with their merchant risks raised by
+half and lower tier thresholds; every challenger row goes to a ShadowLog.
+
+    python -m benchmarks.bench_shadow_scoring --batches 3000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from model_artifact import ArtifactWatcher, load_artifact, update_artifact, update_thresholds
+from score_server import score_transactions
+from shadow_scoring import ShadowLog, ShadowScorer, print_report
+from synthetic_data import generate_dataset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(ROOT, "model.fgm")
+BATCH = 64
+COLUMNS = ["id", "amount", "v14", "v17", "payment_method", "merchant", "device_type", "Time"]
+
+
+# Function to write a challenger artifact: model.fgm with scaled merchant risks and new thresholds
+def make_challenger(path, merchant_scale, thresholds):
+    shutil.copy(MODEL_PATH, path)
+    artifact = load_artifact(path)
+    try:
+        merchant_risks = np.array(artifact.arrays["merchant_risks"]) * merchant_scale
+    finally:
+        artifact.close()
+    update_artifact(path, arrays={"merchant_risks": merchant_risks})
+    update_thresholds(path, thresholds)
+    return path
+
+
+# Function to score batches through the champion path; returns per-batch seconds
+def run(table, batches, shadow=None, interval=0.0):
+    latencies = np.empty(len(batches))
+    next_tick = time.perf_counter()
+    for i, batch in enumerate(batches):
+        start = time.perf_counter()
+        results = score_transactions(batch, table)
+        if shadow is not None:
+            shadow.submit(batch, results)
+        latencies[i] = time.perf_counter() - start
+        next_tick += interval
+        pause = next_tick - time.perf_counter()
+        if pause > 0:
+            time.sleep(pause)
+    return latencies
+
+
+# Function to print p50/p99/max champion latency of a run and what the shadow scorer did with it
+def report(label, latencies, baseline=None, shadow=None):
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e6
+    line = f"{label:<26}: p50 {p50:7.1f} us  p99 {p99:7.1f} us  max {latencies.max() * 1e6:8.1f} us"
+    if baseline is not None:
+        line += f"  (p99 {p99 - np.percentile(baseline, 99) * 1e6:+7.1f} us)"
+    if shadow is not None:
+        line += f"  shadowed {shadow.submitted:,}, sampled out {shadow.sampled_out:,}, dropped {shadow.dropped:,}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batches", type=int, default=3000)
+    parser.add_argument("--interval-ms", type=float, default=5.0, help="time between champion batches")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--sample-rate", type=float, default=0.25,
+                        help="share of batches shadow-scored in the sampled run")
+    args = parser.parse_args()
+
+    frame = generate_dataset(args.batches * BATCH, 42)[COLUMNS]
+    transactions = frame.to_dict("records")
+    batches = [transactions[i:i + BATCH] for i in range(0, len(transactions), BATCH)]
+    table = ArtifactWatcher(MODEL_PATH).current()
+    interval = args.interval_ms / 1000
+    print(f"{len(batches):,} batches of {BATCH} every {args.interval_ms} ms, {args.workers} shadow workers")
+
+    with tempfile.TemporaryDirectory() as directory:
+        challengers = {
+            "merchant_x1.5": make_challenger(os.path.join(directory, "v2.fgm"), 1.5,
+                                             {"low_risk": 0.2, "medium_risk": 0.5, "high_risk": 0.8, "critical": 0.9}),
+            "low_thresholds": make_challenger(os.path.join(directory, "v3.fgm"), 1.0,
+                                              {"low_risk": 0.15, "medium_risk": 0.4, "high_risk": 0.7,
+                                               "critical": 0.85}),
+        }
+        run(table, batches[:200])  # warm-up
+        baseline = run(table, batches, interval=interval)
+        report("champion only", baseline)
+
+        for processes, sample_rate in ((False, 1.0), (True, 1.0), (False, args.sample_rate)):
+            log_path = os.path.join(directory, f"shadow-{processes}-{sample_rate}.db")
+            shadow = ShadowScorer(challengers, log_path, args.workers, processes, sample_rate=sample_rate)
+            start = time.perf_counter()
+            latencies = run(table, batches, shadow, interval)
+            shadow.flush()
+            elapsed = time.perf_counter() - start
+            label = "processes" if processes else "threads"
+            if sample_rate < 1:
+                label += f", {sample_rate:.0%}"
+            report(f"+ shadow ({label})", latencies, baseline, shadow)
+            print(f"{'':<26}  {shadow.log.committed:,} challenger rows logged, all done {elapsed:.1f}s "
+                  f"after the first batch ({len(batches) * interval:.1f}s of traffic)")
+            shadow.close()
+
+        shadow = ShadowScorer(challengers, os.path.join(directory, "overload.db"), args.workers, max_pending=2)
+        latencies = run(table, batches, shadow)
+        shadow.flush()
+        report("+ shadow, no pacing", latencies, None, shadow)
+        shadow.close()
+
+        log = ShadowLog(os.path.join(directory, "shadow-False-1.0.db"))
+        print()
+        print_report(log.compare())
+        log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# bench_stream_consumer.py
+"""Stream consumer throughput and end-to-end lag for a few batch sizes and concurrencies.
+
+Each run pushes the same synthetic transactions through a MemorySource into
+a StreamConsumer writing to a fresh DecisionLog. The producer runs at full
+speed, so the source capacity (uncommitted records) bounds how far it can get
+ahead; lag is measured from produce() to the decision being logged.
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from decision_log import DecisionLog
+from stream_consumer import MemorySource, StreamConsumer, produce_synthetic
+
+MESSAGES = 100_000
+CAPACITY = 10_000
+CONFIGS = ((1, 64), (1, 256), (2, 256), (4, 256), (2, 1024))
+
+
+async def run(directory, concurrency, batch_size):
+    decision_log = DecisionLog(os.path.join(directory, f"decisions-{concurrency}-{batch_size}.db"))
+    source = MemorySource(CAPACITY)
+    consumer = await StreamConsumer(source, decision_log, batch_size=batch_size, concurrency=concurrency,
+                                    report_interval=0, reporter=None).start()
+    start = time.perf_counter()
+    await produce_synthetic(source, MESSAGES)
+    await consumer.wait_for(MESSAGES)
+    elapsed = time.perf_counter() - start
+    await consumer.stop()
+    decision_log.close()
+    return elapsed, consumer.report()
+
+
+def main():
+    print(f"{MESSAGES:,} messages, source capacity {CAPACITY:,}")
+    with tempfile.TemporaryDirectory() as directory:
+        for concurrency, batch_size in CONFIGS:
+            elapsed, report = asyncio.run(run(directory, concurrency, batch_size))
+            print(f"concurrency {concurrency} batch {batch_size:>5}: {MESSAGES / elapsed:>9,.0f} txn/s, "
+                  f"lag p50 {report['lag_p50'] * 1000:7.1f} ms p99 {report['lag_p99'] * 1000:7.1f} ms, "
+                  f"{report['batches']:,} batches, committed {report['committed']:,}")
+
+
+if __name__ == "__main__":
+    main()
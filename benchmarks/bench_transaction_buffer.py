@@ -0,0 +1,87 @@
+# bench_transaction_buffer.py
+"""Memory and speed of a dict per transaction vs the columnar TransactionBuffer.
+
+The dicts have the shape of the dashboard's transaction_data (without the
+contributions), built row by row the way a queue of incoming transactions
+would be. Memory is measured with tracemalloc, so it includes every string and
+float object a dict holds (and, for the buffers, the slack left by doubling).
+"""
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from scoring_engine import calculate_risk_score
+from synthetic_data import generate_dataset
+from transaction_buffer import TransactionBuffer
+
+ROWS = 200_000
+SEED = 11
+
+
+# Function to return fn's result and the memory it left allocated
+def traced(fn):
+    tracemalloc.start()
+    result = fn()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main():
+    data = generate_dataset(ROWS, SEED)
+    timestamps = (data["Time"].to_numpy() + 1_700_000_000).tolist()
+    rows = list(zip(data["id"].tolist(), (f"CARD-{i % 20_000:04d}" for i in range(ROWS)), data["amount"].tolist(),
+                    data["merchant"].tolist(), data["v14"].tolist(), data["v17"].tolist(),
+                    data["payment_method"].tolist(), data["device_type"].tolist(), timestamps))
+
+    def build_dicts():
+        return [
+            {"id": txn, "card_id": card, "amount": amount, "merchant": merchant, "v14": v14, "v17": v17,
+             "payment_method": method, "device_type": device, "v21": 0.0, "v22": 0.0,
+             "timestamp": datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+             "risk_score": None}
+            for txn, card, amount, merchant, v14, v17, method, device, ts in rows
+        ]
+
+    def build_buffer(float_dtype=np.float64):
+        buffer = TransactionBuffer(float_dtype=float_dtype)
+        for txn, card, amount, merchant, v14, v17, method, device, ts in rows:
+            buffer.append(txn, amount, v14, v17, method, merchant, device, card, ts)
+        return buffer
+
+    start = time.perf_counter()
+    dicts, dict_bytes = traced(build_dicts)
+    dict_build = time.perf_counter() - start
+    print(f"{ROWS:,} transactions")
+    print(f"list of dicts:               {dict_bytes / 2 ** 20:6.1f} MiB ({dict_bytes / ROWS:4.0f} B/txn), "
+          f"built in {dict_build:.2f}s")
+    for float_dtype in (np.float64, np.float32):
+        start = time.perf_counter()
+        built, buffer_bytes = traced(lambda: build_buffer(float_dtype))
+        build_time = time.perf_counter() - start
+        print(f"TransactionBuffer ({np.dtype(float_dtype).name}): {buffer_bytes / 2 ** 20:6.1f} MiB "
+              f"({buffer_bytes / ROWS:4.0f} B/txn at capacity {built.capacity:,}, {built.row_nbytes} B/txn "
+              f"used), appended in {build_time:.2f}s; {dict_bytes / ROWS / built.row_nbytes:.1f}x smaller per txn")
+        if float_dtype is np.float64:
+            buffer = built
+
+    start = time.perf_counter()
+    per_dict = [calculate_risk_score(d["amount"], d["v14"], d["v17"], d["payment_method"], d["merchant"],
+                                     d["device_type"], timestamp=ts) for d, ts in zip(dicts, timestamps)]
+    dict_score = time.perf_counter() - start
+    start = time.perf_counter()
+    scores = buffer.score()
+    buffer_score = time.perf_counter() - start
+    print(f"scoring: dicts {dict_score * 1000:8.1f} ms, buffer views {buffer_score * 1000:6.1f} ms "
+          f"({dict_score / buffer_score:,.0f}x); identical: {np.array_equal(np.array(per_dict), scores)}")
+
+    start = time.perf_counter()
+    window = buffer[ROWS // 2:ROWS // 2 + 10_000]
+    window.score(store=False)
+    print(f"score a 10,000-row slice (views, no copy): {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
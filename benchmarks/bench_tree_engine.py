@@ -0,0 +1,57 @@
+# bench_tree_engine.py
+"""Tree-ensemble inference: level-by-level batch evaluation versus per-row recursion.
+
+Uses the forest stored in model.fgm (run create_model.py first) and, when
+scikit-learn is installed, the legacy "model (1).pkl" forest converted with
+TreeEnsemble.from_sklearn.
+"""
+import os
+import time
+import warnings
+
+import numpy as np
+
+from synthetic_data import generate_feature_matrix
+from tree_engine import TreeEnsemble, load_tree_ensemble
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NAIVE_ROWS = 2_000
+BATCH_ROWS = 200_000
+
+
+def rows_per_sec(fn, X):
+    start = time.perf_counter()
+    fn(X)
+    return len(X) / (time.perf_counter() - start)
+
+
+def compare(label, forest, X):
+    naive = rows_per_sec(forest.predict_proba_naive, X[:NAIVE_ROWS])
+    batch = rows_per_sec(forest.predict_proba, X)
+    assert np.allclose(forest.predict_proba(X[:NAIVE_ROWS]), forest.predict_proba_naive(X[:NAIVE_ROWS]))
+    print(f"{label:<34} per-row {naive:>10,.0f} rows/s   batch {batch:>12,.0f} rows/s   ({batch / naive:,.0f}x)")
+
+
+def main():
+    X, _ = generate_feature_matrix(BATCH_ROWS, seed=3)
+    forest = load_tree_ensemble(os.path.join(ROOT, "model.fgm"))
+    compare(f"model.fgm ({forest.n_trees} trees, depth {forest.max_depth})", forest, X)
+
+    try:
+        import joblib
+        import sklearn  # noqa: F401
+    except ImportError:
+        print("model (1).pkl: scikit-learn not installed, skipping")
+        return
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        legacy = joblib.load(os.path.join(ROOT, "model (1).pkl"))
+    forest = TreeEnsemble.from_sklearn(legacy)
+    compare(f"model (1).pkl ({forest.n_trees} trees, depth {forest.max_depth})", forest, X)
+    start = time.perf_counter()
+    legacy.set_params(n_jobs=1).predict_proba(X)
+    print(f"{'  scikit-learn predict_proba':<34} {len(X) / (time.perf_counter() - start):>37,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# bench_triage.py
+"""Bulk triage of a 1M-row CSV: background scoring throughput and page latency.
+
+Measures how long TriageJob takes to score the upload, how far behind a
+progress poll from another thread falls (the dashboard's script thread polls
+once a second), the first page for a new sort order (one argsort) and the
+pages after it (a slice of the cached order), and the memory of the results.
+"""
+import io
+import threading
+import time
+
+import numpy as np
+
+from synthetic_data import generate_dataset
+from triage import DEFAULT_PAGE_SIZE, TriageJob
+
+ROWS = 1_000_000
+SEED = 7
+PAGES = 200
+
+
+def main():
+    data = generate_dataset(ROWS, SEED)
+    data["card_id"] = "CARD-" + (np.arange(ROWS) % 50_000).astype(str)
+    payload = data[["id", "card_id", "amount", "v14", "v17", "payment_method", "merchant", "device_type",
+                    "timestamp"]].to_csv(index=False).encode()
+    print(f"{ROWS:,} rows, {len(payload) / 2 ** 20:.0f} MiB CSV")
+
+    job = TriageJob(io.BytesIO(payload), name="bench.csv")
+    poll_gaps = []
+
+    def poll():
+        # Stand-in for the dashboard polling progress while the job runs
+        while not job.done:
+            start = time.perf_counter()
+            job.progress
+            _ = job.rows
+            poll_gaps.append(time.perf_counter() - start)
+            time.sleep(0.05)
+
+    job.start()
+    poller = threading.Thread(target=poll)
+    poller.start()
+    job._thread.join()
+    poller.join()
+    if job.status != "done":
+        raise SystemExit(f"triage job {job.status}: {job.error}")
+    print(f"scored in {job.elapsed:.2f}s ({job.rows / job.elapsed:,.0f} rows/s); {len(job.flagged):,} flagged")
+    print(f"progress poll: max {max(poll_gaps) * 1000:.2f} ms over {len(poll_gaps)} polls")
+
+    for sort_by in ("risk_score", "amount", "merchant"):
+        start = time.perf_counter()
+        job.page(0, DEFAULT_PAGE_SIZE, sort_by, True)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        for page in range(1, PAGES + 1):
+            job.page(page, DEFAULT_PAGE_SIZE, sort_by, True)
+        later = (time.perf_counter() - start) / PAGES
+        print(f"sort by {sort_by:<10}: first page {first * 1000:7.1f} ms, next pages {later * 1000:6.3f} ms each")
+
+    memory = job.results.memory_usage(deep=True).sum()
+    print(f"results frame: {memory / 2 ** 20:.1f} MiB ({memory / ROWS:.0f} B/row)")
+
+
+if __name__ == "__main__":
+    main()
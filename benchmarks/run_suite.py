@@ -0,0 +1,256 @@
+# run_suite.py
+"""Reproducible benchmark suite for the scoring code with a JSON report.
+
+    python -m benchmarks.run_suite --output bench_report.json
+    python -m benchmarks.run_suite --output new.json --compare bench_report.json
+
+Every run uses generate_dataset() with a fixed seed and measures:
+
+- single-call latency (p50/p99) of calculate_risk_score and score_with_features
+- batch throughput of calculate_risk_scores_frame and TreeEnsemble.predict_proba
+- peak traced memory while batch scoring
+- cold import time of scoring_engine
+
+Each measurement is repeated --repeats times. The report records each metric's
+median, its run-to-run spread (median absolute deviation / median), its unit
+and whether lower or higher is better, plus the environment it ran in and the
+dataset (rows, seed and synthetic_data.GENERATOR_VERSION). With
+--compare, metrics whose median moved the wrong way by more than --threshold
+and by more than three times the spread either report measured are listed and
+the exit status is 1, so the suite can gate a change against a stored
+baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from synthetic_data import GENERATOR_VERSION, generate_dataset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED = 42
+BATCH_ROWS = 1_000_000
+QUICK_BATCH_ROWS = 100_000
+SINGLE_CALLS = 20_000
+IMPORT_RUNS = 9
+DEFAULT_THRESHOLD = 0.10
+DEFAULT_REPEATS = 5
+# A change must exceed this many median absolute deviations (relative to the median) to count as a regression
+SPREAD_FACTOR = 3
+REPORT_VERSION = 1
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import scoring_engine; print(time.perf_counter() - start)"
+
+
+# Function to build one report entry
+def metric(value, unit, better):
+    return {"value": round(float(value), 6), "unit": unit, "better": better}
+
+
+# Function to get p50/p99 per-call latency in microseconds
+def latency_metrics(name, call, args_list):
+    samples = np.empty(len(args_list))
+    for i, args in enumerate(args_list):
+        start = time.perf_counter()
+        call(*args)
+        samples[i] = time.perf_counter() - start
+    samples *= 1e6
+    return {
+        f"{name}.p50": metric(np.percentile(samples, 50), "us", "lower"),
+        f"{name}.p99": metric(np.percentile(samples, 99), "us", "lower"),
+    }
+
+
+# Function to get the best-of-three throughput of fn over rows
+def throughput(fn, rows, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return rows / best
+
+
+def bench_single_call(data):
+    from feature_store import VelocityFeatureStore, score_with_features
+    from scoring_engine import calculate_risk_score
+
+    sample = data.head(SINGLE_CALLS)
+    times = sample["Time"].to_numpy() + 1_700_000_000
+    args = list(zip(sample["amount"].tolist(), sample["v14"].tolist(), sample["v17"].tolist(),
+                    sample["payment_method"].tolist(), sample["merchant"].tolist(), sample["device_type"].tolist()))
+    results = latency_metrics(
+        "calculate_risk_score", lambda *a: calculate_risk_score(*a[:6], timestamp=a[6]),
+        [a + (t,) for a, t in zip(args, times.tolist())],
+    )
+    store = VelocityFeatureStore()
+    results.update(latency_metrics(
+        "score_with_features", lambda card, t, *a: score_with_features(store, card, *a, timestamp=t),
+        [(i % 5_000, t) + a for i, (a, t) in enumerate(zip(args, times.tolist()))],
+    ))
+    return results
+
+
+def bench_batch(data):
+    from scoring_engine import calculate_risk_scores_frame
+
+    rows = len(data)
+    scoring = data[["amount", "v14", "v17", "payment_method", "merchant", "device_type", "timestamp"]]
+    results = {"calculate_risk_scores_frame.throughput": metric(
+        throughput(lambda: calculate_risk_scores_frame(scoring), rows), "rows/s", "higher")}
+
+    tracemalloc.start()
+    calculate_risk_scores_frame(scoring)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results["calculate_risk_scores_frame.peak_memory"] = metric(peak / 2 ** 20, "MiB", "lower")
+    results["calculate_risk_scores_frame.peak_bytes_per_row"] = metric(peak / rows, "B/row", "lower")
+
+    model_path = os.path.join(ROOT, "model.fgm")
+    if os.path.exists(model_path):
+        from model_artifact import FEATURE_ORDER
+        from tree_engine import load_tree_ensemble
+
+        forest = load_tree_ensemble(model_path)
+        X = np.ascontiguousarray(data[list(FEATURE_ORDER)].to_numpy())
+        results["tree_ensemble.predict_proba.throughput"] = metric(
+            throughput(lambda: forest.predict_proba(X), rows, repeats=1), "rows/s", "higher")
+    return results
+
+
+def bench_import_time():
+    timings = []
+    for _ in range(IMPORT_RUNS):
+        output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout
+        timings.append(float(output))
+    return {"import_scoring_engine": metric(statistics.median(timings) * 1000, "ms", "lower")}
+
+
+# Function to describe where a report was produced
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+# Function to merge repeated runs into one entry per metric: the median, plus the run-to-run spread (median
+# absolute deviation relative to the median)
+def summarize(runs):
+    merged = {}
+    for name, entry in runs[0].items():
+        values = [run[name]["value"] for run in runs]
+        median = statistics.median(values)
+        deviation = statistics.median(abs(value - median) for value in values)
+        merged[name] = metric(median, entry["unit"], entry["better"])
+        merged[name]["spread"] = round(deviation / median, 4) if median else 0.0
+    return merged
+
+
+def run_suite(batch_rows=BATCH_ROWS, seed=SEED, repeats=DEFAULT_REPEATS):
+    data = generate_dataset(batch_rows, seed)
+    runs = []
+    for _ in range(repeats):
+        results = {}
+        results.update(bench_single_call(data))
+        results.update(bench_batch(data))
+        results.update(bench_import_time())
+        runs.append(results)
+    results = summarize(runs)
+    return {
+        "version": REPORT_VERSION,
+        "environment": environment(),
+        "dataset": {"rows": batch_rows, "seed": seed, "generator": GENERATOR_VERSION,
+                    "fraud_cases": int(data["Class"].sum())},
+        "results": results,
+    }
+
+
+# Function to compare two reports; returns (rows, regressions)
+def compare_reports(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """A metric regresses when its median moved the wrong way by more than threshold and by more than
+    SPREAD_FACTOR times the run-to-run spread either report measured for it"""
+    rows = []
+    regressions = []
+    for name, entry in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None or not before["value"]:
+            rows.append((name, None, entry["value"], None, None, entry["unit"]))
+            continue
+        change = (entry["value"] - before["value"]) / before["value"]
+        allowed = max(threshold, SPREAD_FACTOR * max(before.get("spread", 0.0), entry.get("spread", 0.0)))
+        rows.append((name, before["value"], entry["value"], change, allowed, entry["unit"]))
+        worse = change > allowed if entry["better"] == "lower" else change < -allowed
+        if worse:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the FraudGuard benchmark suite.")
+    parser.add_argument("--output", default="bench_report.json", help="where to write the JSON report")
+    parser.add_argument("--compare", help="baseline report to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative change counted as a regression (default 0.10)")
+    parser.add_argument("--rows", type=int, default=None, help=f"batch rows (default {BATCH_ROWS:,})")
+    parser.add_argument("--quick", action="store_true", help=f"use {QUICK_BATCH_ROWS:,} batch rows")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS,
+                        help="runs per metric; the report keeps the median and the spread")
+    args = parser.parse_args(argv)
+    if args.repeats < 1:
+        parser.error("--repeats must be at least 1")
+    if args.compare and os.path.abspath(args.compare) == os.path.abspath(args.output):
+        parser.error("--output would overwrite the --compare baseline; write the new report elsewhere")
+
+    baseline = None
+    if args.compare:
+        # Read the baseline before the suite runs, so a bad path fails fast
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    rows = args.rows or (QUICK_BATCH_ROWS if args.quick else BATCH_ROWS)
+    report = run_suite(rows, args.seed, args.repeats)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+
+    if baseline is None:
+        for name, entry in report["results"].items():
+            print(f"{name:<45} {entry['value']:>14,.2f} {entry['unit']:<6} ±{entry['spread']:.0%}")
+        print(f"report written to {args.output}")
+        return 0
+
+    if baseline["dataset"] != report["dataset"]:
+        print(f"warning: datasets differ ({baseline['dataset']} vs {report['dataset']})")
+    table, regressions = compare_reports(baseline, report, args.threshold)
+    for name, before, after, change, allowed, unit in table:
+        before_text = f"{before:>14,.2f}" if before is not None else f"{'-':>14}"
+        change_text = f"{change:+7.1%} (limit {allowed:.0%})" if change is not None else "    new"
+        flag = "  REGRESSION" if name in regressions else ""
+        print(f"{name:<45} {before_text} -> {after:>14,.2f} {unit:<6} {change_text}{flag}")
+    print(f"report written to {args.output}; {len(regressions)} regression(s) beyond {args.threshold:.0%} "
+          f"or {SPREAD_FACTOR}x the measured spread")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+# decision_log.py
+"""Durable append-only log of Approve/Review/Block decisions.
+
+Records go to a SQLite database in WAL mode. append() only puts the record on
+an in-memory queue, so the caller (e.g. the Streamlit script thread) never
+waits on disk; a background writer drains the queue and group-commits
+everything that arrived within commit_interval in one transaction. A commit
+that fails with a SQLite error (e.g. "database is locked" after the busy
+timeout) is retried on a fresh connection up to `retries` times; if it still
+fails, that batch of decisions is dropped, .error is set and append() and
+flush() raise from then on; any other failure of the writer does the same
+and drops what is still queued.
+
+Rows are compact: the action is a small integer code and timestamps are Unix
+seconds, with indexes on transaction id and timestamp.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from scoring_engine import get_risk_level_cutoffs
+
+# Action names as stored codes (index = code); each is the recommended action for the RISK_LEVELS entry of
+# the same index
+ACTIONS = ("approved", "flagged", "blocked")
+
+DEFAULT_BATCH_SIZE = 1024
+DEFAULT_COMMIT_INTERVAL = 0.005
+DEFAULT_QUEUE_SIZE = 100_000
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_DELAY = 0.1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    seq INTEGER PRIMARY KEY,
+    transaction_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    action INTEGER NOT NULL,
+    risk_score REAL NOT NULL,
+    amount REAL NOT NULL,
+    card_id TEXT
+);
+CREATE INDEX IF NOT EXISTS decisions_transaction_id ON decisions (transaction_id);
+CREATE INDEX IF NOT EXISTS decisions_ts ON decisions (ts);
+"""
+
+INSERT = "INSERT INTO decisions (transaction_id, ts, action, risk_score, amount, card_id) VALUES (?, ?, ?, ?, ?, ?)"
+
+_STOP = object()
+
+
+# Function to open a connection with the pragmas every reader and writer uses
+def connect(path):
+    connection = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class DecisionLog:
+    """Append-only decision log with a group-committing background writer"""
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE, commit_interval=DEFAULT_COMMIT_INTERVAL,
+                 queue_size=DEFAULT_QUEUE_SIZE, retries=DEFAULT_RETRIES):
+        self.path = path
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.retries = retries
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        with closing(connect(path)) as connection:
+            connection.executescript(SCHEMA)
+        self._reader = connect(path)
+        self._reader_lock = threading.Lock()
+
+        self._queue = queue.Queue(queue_size)
+        self.committed = 0
+        self.commits = 0
+        self.retried = 0
+        self.error = None
+        self._writer = threading.Thread(target=self._write_loop, name="decision-log-writer", daemon=True)
+        self._writer.start()
+
+    def append(self, transaction_id, action, risk_score, amount, card_id=None, timestamp=None):
+        """Queue a decision; returns immediately"""
+        if self.error is not None:
+            raise RuntimeError("decision log writer failed") from self.error
+        if isinstance(action, str):
+            if action not in ACTIONS:
+                raise ValueError(f"unknown action {action!r}; expected one of {', '.join(ACTIONS)}")
+            code = ACTIONS.index(action)
+        else:
+            code = int(action)
+            if not 0 <= code < len(ACTIONS):
+                raise ValueError(f"unknown action code {code}; expected 0-{len(ACTIONS) - 1}")
+        ts = time.time() if timestamp is None else float(timestamp)
+        card_id = None if card_id is None else str(card_id)
+        self._queue.put((str(transaction_id), ts, code, float(risk_score), float(amount), card_id))
+
+    def flush(self):
+        """Block until every queued decision is committed (or the writer has failed)"""
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks and self._writer.is_alive():
+                self._queue.all_tasks_done.wait(0.1)
+        if self.error is not None:
+            raise RuntimeError("decision log writer failed") from self.error
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+        self._writer.join()
+        self._reader.close()
+
+    def _write_loop(self):
+        try:
+            self._write_batches()
+        except Exception as exc:
+            # Record the failure and release flush(); append() raises from now on
+            self.error = exc
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._queue.task_done()
+
+    def _write_batches(self):
+        connection = connect(self.path)
+        try:
+            while True:
+                record = self._queue.get()
+                if record is _STOP:
+                    self._queue.task_done()
+                    return
+                batch = [record]
+                stop = False
+                # Group commit: gather what arrives within commit_interval
+                deadline = time.monotonic() + self.commit_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        record = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is _STOP:
+                        stop = True
+                        break
+                    batch.append(record)
+                try:
+                    connection = self._commit(connection, batch)
+                finally:
+                    for _ in range(len(batch) + stop):
+                        self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            connection.close()
+
+    def _commit(self, connection, batch):
+        """Insert a batch in one transaction, retrying on a fresh connection; returns the connection to keep"""
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                time.sleep(DEFAULT_RETRY_DELAY * 2 ** (attempt - 1))
+                connection.close()
+                try:
+                    connection = connect(self.path)
+                except sqlite3.Error as exc:
+                    error = exc
+                    continue
+            try:
+                with connection:
+                    connection.executemany(INSERT, batch)
+            except sqlite3.Error as exc:
+                error = exc
+                continue
+            self.committed += len(batch)
+            self.commits += 1
+            return connection
+        # The batch is dropped; append() and flush() raise from now on instead of losing more silently
+        self.error = error
+        return connection
+
+    def _query(self, sql, params=()):
+        with self._reader_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def summary(self, since=None, table=None):
+        """Counts per action, blocked amount and the number of decisions that followed the score's risk level
+        (by table's thresholds) for decisions at or after since"""
+        medium, high = get_risk_level_cutoffs(table)
+        rows = self._query(
+            "SELECT action, COUNT(*), SUM(amount), "
+            "SUM(action = CASE WHEN risk_score >= ? THEN 2 WHEN risk_score >= ? THEN 1 ELSE 0 END) "
+            "FROM decisions WHERE ts >= ? GROUP BY action",
+            (high, medium, float("-inf") if since is None else since),
+        )
+        counts = {name: 0 for name in ACTIONS}
+        amounts = {name: 0.0 for name in ACTIONS}
+        agreed = 0
+        for code, count, amount, matches in rows:
+            counts[ACTIONS[code]] = count
+            amounts[ACTIONS[code]] = amount or 0.0
+            agreed += matches or 0
+        return {"total": sum(counts.values()), "counts": counts, "blocked_amount": amounts["blocked"],
+                "agreed": agreed}
+
+    def find(self, transaction_id):
+        """All decisions recorded for a transaction, oldest first"""
+        rows = self._query(
+            "SELECT ts, action, risk_score, amount, card_id FROM decisions WHERE transaction_id = ? ORDER BY seq",
+            (str(transaction_id),),
+        )
+        return [
+            {"transaction_id": str(transaction_id), "timestamp": ts, "action": ACTIONS[action],
+             "risk_score": score, "amount": amount, "card_id": card_id}
+            for ts, action, score, amount, card_id in rows
+        ]
+
+    def recent(self, limit=20):
+        """The latest decisions, newest first"""
+        rows = self._query(
+            "SELECT transaction_id, ts, action, risk_score, amount, card_id FROM decisions ORDER BY seq DESC LIMIT ?",
+            (limit,),
+        )
+        return [
+            {"transaction_id": txn, "timestamp": ts, "action": ACTIONS[action],
+             "risk_score": score, "amount": amount, "card_id": card_id}
+            for txn, ts, action, score, amount, card_id in rows
+        ]
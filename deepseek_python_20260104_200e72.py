@@ -1,6 +1,8 @@
 # create_model.py
-import pickle
-import numpy as np
+from drift_monitor import build_profile_from_frame, profile_to_artifact
+from model_artifact import save_model_artifact
+from synthetic_data import REFERENCE_ROWS, generate_dataset, generate_feature_matrix
+from tree_engine import train_forest
 
 # Create a comprehensive fraud detection model
 model_data = {
@@ -68,11 +70,19 @@ model_data = {
 }
 
 # Save the model
-with open("model.pkl", "wb") as f:
-    pickle.dump(model_data, f)
+if __name__ == "__main__":
+    # Train the ensemble on synthetic data shaped like the feature spec
+    X, y = generate_feature_matrix(REFERENCE_ROWS, seed=42)
+    forest = train_forest(X, y, n_trees=25, max_depth=8, seed=42)
+    forest_metadata, forest_arrays = forest.to_artifact()
+    # Reference distributions of the scorer inputs and score, for the drift monitor
+    drift_metadata, drift_arrays = profile_to_artifact(build_profile_from_frame(generate_dataset(REFERENCE_ROWS)))
+    save_model_artifact("model.fgm", dict(model_data, **forest_metadata, **drift_metadata),
+                        extra_arrays=dict(forest_arrays, **drift_arrays))
 
-print("✅ model.pkl created successfully!")
-print(f"📋 Model: {model_data['name']}")
-print(f"🏷️ Version: {model_data['version']}")
-print(f"🎯 Accuracy: {model_data['accuracy']*100:.2f}%")
-print(f"📊 Features: {len(model_data['features'])}")
\ No newline at end of file
+    print("✅ model.fgm created successfully!")
+    print(f"📋 Model: {model_data['name']}")
+    print(f"🏷️ Version: {model_data['version']}")
+    print(f"🎯 Accuracy: {model_data['accuracy']*100:.2f}%")
+    print(f"📊 Features: {len(model_data['features'])}")
+    print(f"🌲 Trees: {forest.n_trees} ({forest.n_nodes} nodes, depth {forest.max_depth})")
\ No newline at end of file
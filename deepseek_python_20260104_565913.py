@@ -1,9 +1,19 @@
 # download_background.py
+"""Optional one-off download of the dashboard's background photo.
+
+The dashboard serves its background from static/ (server.enableStaticServing
+in .streamlit/config.toml) and falls back to static/background.svg, so this
+only needs to run once, if at all; nothing is fetched while the app runs.
+"""
+import os
+
 import requests
 
 url = "https://images.unsplash.com/photo-1563013544-824ae1b704d3?w=1920&q=80"
-response = requests.get(url)
-os.makedirs("assets", exist_ok=True)
-with open("assets/credit-card-bg.jpg", "wb") as f:
+static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+response = requests.get(url, timeout=30)
+response.raise_for_status()
+os.makedirs(static_dir, exist_ok=True)
+with open(os.path.join(static_dir, "credit-card-bg.jpg"), "wb") as f:
     f.write(response.content)
-print("✅ Background image downloaded!")
\ No newline at end of file
+print("✅ Background image downloaded!")
@@ -1,8 +1,41 @@
+import os
+import re
+import time
 import streamlit as st
 import pandas as pd
 import numpy as np
 from datetime import datetime
 
+from decision_log import DecisionLog
+from drift_monitor import DriftMonitor
+from feature_store import VelocityFeatureStore, score_with_features
+from instrumentation import DEFAULT_METRICS_PORT, INSTRUMENTATION, MetricsServer, clock, start_profiler_from_env
+from live_metrics import LiveMetrics, format_latency
+from model_artifact import ArtifactWatcher
+from scoring_engine import RISK_TIERS, get_risk_level
+from triage import DEFAULT_PAGE_SIZE, TriageJob
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model.fgm")
+DECISION_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "decisions.db")
+CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "deepseek_css_20260104_2e9dd6.css")
+METRICS_PORT = int(os.environ.get("FRAUDGUARD_METRICS_PORT", DEFAULT_METRICS_PORT))
+RENDER_STAGES = {1: "render_form", 2: "render_results", 3: "render_completed"}
+ANALYSIS_MODES = ["Single transaction", "Bulk triage"]
+TRIAGE_PAGE_SIZES = [25, DEFAULT_PAGE_SIZE, 100, 250]
+
+# Risk Factors panel rows: score factor -> (label, color)
+FACTOR_DISPLAY = {
+    "amount": ("Amount", "#667eea"),
+    "v14": ("V14 Score", "#8b5cf6"),
+    "v17": ("V17 Score", "#ec4899"),
+    "payment_method": ("Payment Method", "#10b981"),
+    "merchant": ("Merchant", "#f59e0b"),
+    "device_type": ("Device", "#3b82f6"),
+    "time_of_day": ("Time of Day", "#6366f1"),
+    "velocity": ("Velocity", "#ef4444"),
+    "base": ("Baseline", "#9ca3af"),
+}
+
 # Page configuration
 st.set_page_config(
     page_title="FraudGuard™ Enterprise",
@@ -18,201 +51,290 @@ if 'transaction_data' not in st.session_state:
     st.session_state.transaction_data = {}
 if 'current_step' not in st.session_state:
     st.session_state.current_step = 1
+if 'analysis_mode' not in st.session_state:
+    st.session_state.analysis_mode = ANALYSIS_MODES[0]
 
-# Function to calculate dynamic risk score
-def calculate_risk_score(amount, v14, v17, payment_method, merchant, device_type="Desktop"):
-    """Calculate dynamic risk score based on all parameters"""
-    
-    # Base risk factors
-    base_risk = 0.05
-    
-    # Amount-based risk (higher amounts = higher risk)
-    amount_risk = min(amount / 10000, 0.25)
-    
-    # V14 risk (structural anomalies)
-    v14_risk = v14 * 0.25
-    
-    # V17 risk (behavioral patterns)
-    v17_risk = v17 * 0.20
-    
-    # Payment method risk
-    payment_risks = {
-        "Credit Card": 0.05,
-        "Debit Card": 0.08,
-        "Digital Wallet": 0.12,
-        "Bank Transfer": 0.15,
-        "Cryptocurrency": 0.25
-    }
-    method_risk = payment_risks.get(payment_method, 0.10)
-    
-    # Merchant risk
-    merchant_risks = {
-        "Amazon": 0.05,
-        "Apple": 0.04,
-        "Netflix": 0.03,
-        "Uber": 0.08,
-        "Airbnb": 0.12,
-        "Walmart": 0.06,
-        "Target": 0.05,
-        "Best Buy": 0.06,
-        "Other": 0.15
-    }
-    merchant_risk = merchant_risks.get(merchant, 0.10)
-    
-    # Device risk
-    device_risks = {
-        "Mobile": 0.05,
-        "Desktop": 0.03,
-        "Tablet": 0.06,
-        "Unknown": 0.20
-    }
-    device_risk = device_risks.get(device_type, 0.10)
-    
-    # Time-based risk
-    current_hour = datetime.now().hour
-    if 0 <= current_hour < 6:
-        time_risk = 0.15
-    elif 6 <= current_hour < 12:
-        time_risk = 0.05
-    elif 12 <= current_hour < 18:
-        time_risk = 0.04
-    else:
-        time_risk = 0.08
-    
-    # Calculate total risk
-    total_risk = min(
-        base_risk + amount_risk + v14_risk + v17_risk + method_risk + merchant_risk + device_risk + time_risk,
-        0.95
-    )
-    
-    return total_risk
-
-# Function to get risk level and color
-def get_risk_level(risk_score):
-    risk_percent = risk_score * 100
-    if risk_percent > 70:
-        return "🚨 HIGH", "#ef4444", "🔴"
-    elif risk_percent > 40:
-        return "⚠️ MEDIUM", "#f59e0b", "🟡"
+# Function to start the local /metrics endpoint and the opt-in profiler once per process
+@st.cache_resource
+def start_instrumentation():
+    start_profiler_from_env()
+    if METRICS_PORT <= 0:
+        return None
+    try:
+        return MetricsServer(port=METRICS_PORT).start()
+    except OSError:
+        # Port taken (e.g. a second dashboard process); metrics stay in-process only
+        return None
+
+# Function to get the velocity feature store shared by all sessions
+@st.cache_resource
+def get_feature_store():
+    return VelocityFeatureStore()
+
+# Function to watch the model artifact once per server process
+@st.cache_resource
+def get_model_watcher():
+    return ArtifactWatcher(MODEL_PATH)
+
+# Function to get the compiled risk table, reloaded when model.fgm (e.g. its thresholds) changes
+def get_risk_table():
+    return get_model_watcher().current()
+
+# Function to get the decision log shared by all sessions
+@st.cache_resource
+def get_decision_log():
+    return DecisionLog(DECISION_LOG_PATH)
+
+# Function to get today's decision counts and blocked amount from the log
+def get_today_summary():
+    midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return get_decision_log().summary(since=midnight.timestamp(), table=get_risk_table())
+
+# Function to get the live metrics, seeded once from today's decision log
+@st.cache_resource
+def get_live_metrics():
+    metrics = LiveMetrics()
+    metrics.seed(get_today_summary())
+    return metrics
+
+# Function to get the drift monitor for model.fgm's reference profile (None when it has none)
+@st.cache_resource
+def get_drift_monitor():
+    return DriftMonitor.from_artifact(MODEL_PATH)
+
+# Function to score a transaction and time it for the live metrics
+def timed_score(card_id, amount, v14, v17, payment_method, merchant, device_type, record=True, explain=False):
+    start = time.perf_counter()
+    result = score_with_features(get_feature_store(), card_id, amount, v14, v17,
+        payment_method, merchant, device_type, table=get_risk_table(), record=record, explain=explain)
+    latency = time.perf_counter() - start
+    if record:
+        get_live_metrics().record_score(result[0], latency, get_risk_table())
+        monitor = get_drift_monitor()
+        if monitor is not None:
+            monitor.observe(amount, v14, v17, result[0])
     else:
-        return "✅ LOW", "#10b981", "🟢"
+        get_live_metrics().record_latency(latency)
+    return result
 
-# Function to set background
-def set_background():
-    background_url = "https://wise.com/imaginary-v2/d9d50c9d096e6bb7490b1e6a72f65f83.jpg?width=1200"
-    
-    style = f"""
-    <style>
-    .stApp {{
-        background-image: url('{background_url}');
-        background-size: cover;
-        background-attachment: fixed;
-        background-position: center;
-    }}
-    
-    .stApp::before {{
-        content: '';
-        position: fixed;
-        top: 0;
-        left: 0;
-        right: 0;
-        bottom: 0;
-        background: rgba(255, 255, 255, 0.92);
-        z-index: -1;
-    }}
-    
-    .main-container {{
-        background: rgba(255, 255, 255, 0.98);
-        border-radius: 24px;
-        padding: 30px;
-        margin: 20px auto;
-        max-width: 1200px;
-        box-shadow: 0 15px 40px rgba(0, 0, 0, 0.08);
-        border: 1px solid rgba(255, 255, 255, 0.4);
-    }}
-    
-    .header {{
-        background: #333333 !important;
-        padding: 2rem;
-        border-radius: 15px;
-        margin-bottom: 2rem;
-        color: white;
-        box-shadow: 0 10px 25px rgba(102, 126, 234, 0.2);
-    }}
-    
-    .simple-card {{
-        background: rgba(255, 255, 255, 0.95);
-        border-radius: 12px;
-        padding: 20px;
-        margin: 15px 0;
-        border: 1px solid rgba(229, 231, 235, 0.8);
-        box-shadow: 0 5px 15px rgba(0, 0, 0, 0.03);
-    }}
-    
-    .metric-card {{
-        background: white;
-        padding: 20px;
-        border-radius: 12px;
-        border: 1px solid #e5e7eb;
-        text-align: center;
-        box-shadow: 0 4px 12px rgba(0, 0, 0, 0.03);
-    }}
-    
-    .metric-value {{
-        font-size: 2.2rem !important;
-        font-weight: 700 !important;
-        color: #667eea !important;
-        margin-bottom: 5px !important;
-    }}
-    
-    .stButton > button {{
-        background: #333333 !important;
-        color: white !important;
-        border: none !important;
-        padding: 14px 28px !important;
-        border-radius: 50px !important;
-        font-weight: 600 !important;
-        font-size: 16px !important;
-        box-shadow: 0 5px 15px rgba(102, 126, 234, 0.2) !important;
-    }}
-    
-    .footer {{
-        text-align: center;
-        padding: 25px;
-        color: #6b7280;
-        font-size: 0.9rem;
-        margin-top: 30px;
-        border-top: 1px solid rgba(229, 231, 235, 0.8);
-        background: rgba(255, 255, 255, 0.95);
-        border-radius: 15px;
-    }}
-    
-    .risk-gauge {{
-        width: 100%;
-        height: 20px;
-        background: linear-gradient(90deg, #10b981 0%, #f59e0b 50%, #ef4444 100%);
-        border-radius: 10px;
-        margin: 15px 0;
-        position: relative;
-    }}
-    
-    .risk-marker {{
-        position: absolute;
-        top: -5px;
-        width: 4px;
-        height: 30px;
-        background: black;
-        transform: translateX(-50%);
-    }}
-    </style>
-    """
-    st.markdown(style, unsafe_allow_html=True)
-
-# Set background
-set_background()
+# Function to record an Approve/Review/Block decision and move to step 3
+def record_decision(action):
+    data = st.session_state.transaction_data
+    start = clock()
+    get_decision_log().append(data['id'], action, data['risk_score'], data['amount'], data.get('card_id'))
+    INSTRUMENTATION.since("log", start)
+    INSTRUMENTATION.inc(f"decisions_{action}", help=f"Transactions {action} by an analyst.")
+    get_live_metrics().record_decision(action, data['amount'], data['risk_score'], get_risk_table())
+    job = st.session_state.get('triage_job')
+    if 'triage_row' in data and job is not None:
+        job.mark_decided(data['triage_row'], action)
+    st.session_state.current_step = 3
+    st.session_state.action = action
+
+# Function to load the riskiest undecided flagged row of the triage job into the Approve/Review/Block flow
+def review_next_flagged():
+    job = st.session_state.get('triage_job')
+    row = job.next_flagged() if job is not None else None
+    if row is None:
+        return False
+    data = job.transaction(row)
+    features = get_feature_store().read(data['card_id'], data['amount'])
+    data['v21'] = features["V21"]
+    data['v22'] = features["V22"]
+    st.session_state.transaction_data = data
+    st.session_state.current_step = 2
+    return True
+
+# Function to show the background triage job's progress, polling once a second without rerunning the page
+@st.fragment(run_every=1)
+def render_triage_progress():
+    job = st.session_state.triage_job
+    if job.done:
+        st.rerun()
+    st.progress(job.progress, text=f"Scoring {job.name}: {job.rows:,} rows in {job.elapsed:.1f}s")
+    if st.button("✖️ Cancel", key="triage_cancel"):
+        job.cancel()
+
+# Function to render bulk CSV triage: upload, background scoring and the paginated results grid
+def render_triage():
+    uploaded = st.file_uploader("Transactions CSV", type=["csv"],
+        help="Needs amount, v14 and v17 columns; payment_method, merchant, device_type, timestamp, id and "
+             "card_id are used when present.")
+    if uploaded is not None and st.button("🚀 Score File", type="primary"):
+        previous = st.session_state.get('triage_job')
+        if previous is not None:
+            previous.cancel()
+        st.session_state.triage_job = TriageJob(uploaded, table=get_risk_table(), name=uploaded.name).start()
+        st.session_state.triage_page = 1
+
+    job = st.session_state.get('triage_job')
+    if job is None:
+        st.info("Upload a CSV of transactions to score them in bulk and work through the flagged ones.")
+        return
+    if not job.done:
+        render_triage_progress()
+        return
+    if job.status == "failed":
+        st.error(f"Could not score {job.name}: {job.error}")
+        return
+    if job.status == "cancelled":
+        st.warning(f"Scoring of {job.name} was cancelled after {job.rows:,} rows.")
+        return
+
+    pending = len(job.pending_flagged())
+    col_sum1, col_sum2, col_sum3 = st.columns(3)
+    col_sum1.metric("Rows Scored", f"{job.rows:,}", help=f"{job.name} in {job.elapsed:.1f}s")
+    col_sum2.metric("Flagged", f"{len(job.flagged):,}")
+    col_sum3.metric("Awaiting Decision", f"{pending:,}")
+    if pending and st.button(f"🔍 Review Next Flagged ({pending:,} left)", type="primary"):
+        review_next_flagged()
+        st.rerun()
+
+    columns = list(job.results.columns)
+    col_opt1, col_opt2, col_opt3, col_opt4 = st.columns([2, 1, 1, 1])
+    with col_opt1:
+        sort_by = st.selectbox("Sort by", columns, index=columns.index("risk_score"))
+    with col_opt2:
+        descending = st.toggle("Descending", value=True)
+    with col_opt3:
+        page_size = st.selectbox("Rows per page", TRIAGE_PAGE_SIZES, index=TRIAGE_PAGE_SIZES.index(DEFAULT_PAGE_SIZE))
+    pages = job.pages(page_size)
+    with col_opt4:
+        page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages,
+            value=min(st.session_state.get('triage_page', 1), pages), step=1)
+    st.session_state.triage_page = page
+
+    # Only the visible page is sliced out and sent to the browser
+    with INSTRUMENTATION.stage("triage_page"):
+        visible = job.page(page - 1, page_size, sort_by, descending)
+    st.dataframe(visible, hide_index=True, use_container_width=True)
+
+# Function to render the transaction inputs and live risk preview; editing an input reruns only this fragment
+@st.fragment
+def render_transaction_input():
+    render_start = clock()
+    if 'transaction_id' not in st.session_state:
+        st.session_state.transaction_id = f"TXN-{np.random.randint(100000, 999999)}"
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown('<div class="simple-card">', unsafe_allow_html=True)
+        st.markdown("**Transaction Information**")
+
+        transaction_id = st.text_input("Transaction ID", key="transaction_id")
+
+        card_id = st.text_input("Card / Customer ID", value="CARD-0001")
+
+        amount = st.number_input("Amount (USD)",
+            min_value=0.0,
+            max_value=100000.0,
+            value=500.0,
+            step=100.0)
+
+        merchant = st.selectbox("Merchant",
+            ["Amazon", "Apple", "Netflix", "Uber", "Airbnb", "Walmart", "Target", "Best Buy", "Other"],
+            index=0)
+
+        device_type = st.selectbox("Device Type",
+            ["Desktop", "Mobile", "Tablet", "Unknown"],
+            index=0)
+
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    with col2:
+        st.markdown('<div class="simple-card">', unsafe_allow_html=True)
+        st.markdown("**Risk Parameters**")
+
+        st.markdown("**V14 - Structural Analysis**")
+        v14 = st.slider("V14 Score", 0.0, 1.0, 0.35, 0.01, label_visibility="collapsed")
+
+        st.markdown("**V17 - Behavioral Analysis**")
+        v17 = st.slider("V17 Score", 0.0, 1.0, 0.25, 0.01, label_visibility="collapsed")
+
+        payment_method = st.selectbox("Payment Method",
+            ["Credit Card", "Debit Card", "Digital Wallet", "Bank Transfer", "Cryptocurrency"],
+            index=0)
+
+        # Live risk calculation
+        live_risk, _ = timed_score(card_id, amount, v14, v17, payment_method, merchant, device_type, record=False)
+        start = clock()
+        risk_level, risk_color, _ = get_risk_level(live_risk, get_risk_table())
+        INSTRUMENTATION.since("classify", start)
+
+        st.markdown("---")
+        st.markdown("**Live Risk Preview**")
+
+        col_preview1, col_preview2 = st.columns([2, 1])
+        with col_preview1:
+            st.markdown(f"**Risk Level:** {risk_level}  \n**Score:** {(live_risk * 100):.1f}%")
+
+        with col_preview2:
+            st.markdown(f"""
+            <div class="risk-gauge-wrap">
+                <div class="risk-gauge"></div>
+                <div class="risk-marker" style="left: {live_risk * 100}%;"></div>
+            </div>
+            """, unsafe_allow_html=True)
+
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    INSTRUMENTATION.since("render_input", render_start)
+    if st.button("🚀 Analyze Transaction", type="primary", use_container_width=True):
+        risk_score, features, contributions = timed_score(card_id, amount, v14, v17, payment_method,
+            merchant, device_type, explain=True)
+        st.session_state.transaction_data = {
+            "id": transaction_id,
+            "card_id": card_id,
+            "amount": amount,
+            "merchant": merchant,
+            "v14": v14,
+            "v17": v17,
+            "payment_method": payment_method,
+            "device_type": device_type,
+            "v21": features["V21"],
+            "v22": features["V22"],
+            "contributions": contributions,
+            "timestamp": datetime.now().strftime("%H:%M:%S"),
+            "risk_score": risk_score
+        }
+        st.session_state.current_step = 2
+        # Leaving step 1 needs the whole page, not just this fragment
+        st.rerun(scope="app")
+
+# Function to format the share of decisions that followed the risk level
+def format_agreement(agreement):
+    return "—" if agreement is None else f"{agreement * 100:.1f}%"
+
+# Function to format a dollar amount compactly ($950, $24.7K, $1.2M)
+def format_money(amount):
+    if amount >= 1_000_000:
+        return f"${amount / 1_000_000:.1f}M"
+    if amount >= 1_000:
+        return f"${amount / 1_000:.1f}K"
+    return f"${amount:,.0f}"
+
+# Function to read and minify the dashboard stylesheet once per server process
+@st.cache_data
+def get_stylesheet():
+    with open(CSS_PATH, encoding="utf-8") as f:
+        css = re.sub(r"/\*.*?\*/", "", f.read(), flags=re.S)
+    css = re.sub(r"\s*([{};:,>])\s*", r"\1", re.sub(r"\s+", " ", css))
+    return f"<style>{css.strip()}</style>"
+
+# Function to apply the stylesheet; style-only HTML goes to the event container and takes no layout space
+def load_styles():
+    st.html(get_stylesheet())
+
+# Load styles
+load_styles()
 
 # Main app
 def main():
+    start_instrumentation()
+    render_start = clock()
+    render_step = st.session_state.current_step
+    
     # Main container
     st.markdown('<div class="main-container">', unsafe_allow_html=True)
     
@@ -221,15 +343,9 @@ def main():
     
     st.markdown(f"""
     <div class="header">
-        <h1 style="color: white; margin-bottom: 10px; font-size: 2.5rem;">
-            🛡️ FraudGuard™ Enterprise
-        </h1>
-        <h3 style="color: black(255, 255, 255, 0.95); margin: 5px 0; font-weight: 400;">
-            Live Transaction Security Dashboard
-        </h3>
-        <p style="color: black(255, 255, 255, 0.85); margin: 5px 0 0 0; font-size: 0.9rem;">
-            Real-time risk assessment • Updated: {current_time}
-        </p>
+        <h1>🛡️ FraudGuard™ Enterprise</h1>
+        <h3>Live Transaction Security Dashboard</h3>
+        <p>Real-time risk assessment • Updated: {current_time}</p>
     </div>
     """, unsafe_allow_html=True)
     
@@ -245,94 +361,21 @@ def main():
     # Step indicator
     if st.session_state.current_step == 1:
         st.markdown("### 📝 Transaction Analysis")
+        st.session_state.analysis_mode = st.radio("Mode", ANALYSIS_MODES,
+            index=ANALYSIS_MODES.index(st.session_state.analysis_mode), horizontal=True, label_visibility="collapsed")
     elif st.session_state.current_step == 2:
         st.markdown("### 🔍 Analysis Results")
     elif st.session_state.current_step == 3:
         st.markdown("### ✅ Action Completed")
     
+    # Step 1: Bulk CSV triage
+    if st.session_state.current_step == 1 and st.session_state.analysis_mode == "Bulk triage":
+        render_triage()
+    
     # Step 1: Transaction Input
-    if st.session_state.current_step == 1:
+    elif st.session_state.current_step == 1:
         st.markdown("Enter transaction details for live fraud analysis:")
-        
-        with st.form("transaction_input"):
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown('<div class="simple-card">', unsafe_allow_html=True)
-                st.markdown("**Transaction Information**")
-                
-                transaction_id = st.text_input("Transaction ID", value=f"TXN-{np.random.randint(100000, 999999)}")
-                
-                amount = st.number_input("Amount (USD)", 
-                    min_value=0.0, 
-                    max_value=100000.0, 
-                    value=500.0,
-                    step=100.0)
-                
-                merchant = st.selectbox("Merchant", 
-                    ["Amazon", "Apple", "Netflix", "Uber", "Airbnb", "Walmart", "Target", "Best Buy", "Other"],
-                    index=0)
-                
-                device_type = st.selectbox("Device Type",
-                    ["Desktop", "Mobile", "Tablet", "Unknown"],
-                    index=0)
-                
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            with col2:
-                st.markdown('<div class="simple-card">', unsafe_allow_html=True)
-                st.markdown("**Risk Parameters**")
-                
-                st.markdown("**V14 - Structural Analysis**")
-                v14 = st.slider("V14 Score", 0.0, 1.0, 0.35, 0.01, label_visibility="collapsed")
-                
-                st.markdown("**V17 - Behavioral Analysis**")
-                v17 = st.slider("V17 Score", 0.0, 1.0, 0.25, 0.01, label_visibility="collapsed")
-                
-                payment_method = st.selectbox("Payment Method", 
-                    ["Credit Card", "Debit Card", "Digital Wallet", "Bank Transfer", "Cryptocurrency"],
-                    index=0)
-                
-                # Live risk calculation
-                if st.form_submit_button:
-                    live_risk = calculate_risk_score(amount, v14, v17, payment_method, merchant, device_type)
-                    risk_level, risk_color, _ = get_risk_level(live_risk)
-                    
-                    st.markdown("---")
-                    st.markdown("**Live Risk Preview**")
-                    
-                    col_preview1, col_preview2 = st.columns([2, 1])
-                    with col_preview1:
-                        st.markdown(f"**Risk Level:** {risk_level}")
-                        st.markdown(f"**Score:** {(live_risk * 100):.1f}%")
-                    
-                    with col_preview2:
-                        risk_percent = live_risk * 100
-                        st.markdown(f"""
-                        <div style="position: relative; width: 100%; margin: 10px 0;">
-                            <div class="risk-gauge"></div>
-                            <div class="risk-marker" style="left: {risk_percent}%;"></div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            submitted = st.form_submit_button("🚀 Analyze Transaction", type="primary", use_container_width=True)
-            
-            if submitted:
-                st.session_state.transaction_data = {
-                    "id": transaction_id,
-                    "amount": amount,
-                    "merchant": merchant,
-                    "v14": v14,
-                    "v17": v17,
-                    "payment_method": payment_method,
-                    "device_type": device_type,
-                    "timestamp": datetime.now().strftime("%H:%M:%S"),
-                    "risk_score": calculate_risk_score(amount, v14, v17, payment_method, merchant, device_type)
-                }
-                st.session_state.current_step = 2
-                st.rerun()
+        render_transaction_input()
     
     # Step 2: Analysis Results
     elif st.session_state.current_step == 2:
@@ -341,7 +384,10 @@ def main():
         # Get risk details
         risk_score = data['risk_score']
         risk_percent = risk_score * 100
-        risk_level, risk_color, _ = get_risk_level(risk_score)
+        start = clock()
+        risk_level, risk_color, _ = get_risk_level(risk_score, get_risk_table())
+        risk_tier, tier_color, tier_icon = RISK_TIERS[get_risk_table().tiers.classify_one(risk_score)]
+        INSTRUMENTATION.since("classify", start)
         
         # Display results
         st.markdown("### 📊 Analysis Results")
@@ -353,15 +399,11 @@ def main():
             st.markdown("**Risk Assessment**")
             
             st.markdown(f"""
-            <div style="text-align: center; margin: 20px 0;">
-                <div style="font-size: 3.5rem; font-weight: 800; color: {risk_color}; margin-bottom: 10px;">
-                    {risk_percent:.1f}%
-                </div>
-                <div style="font-size: 1.5rem; color: {risk_color}; font-weight: 700; margin: 15px 0;">
-                    {risk_level} RISK
-                </div>
-                
-                <div style="position: relative; width: 80%; margin: 20px auto;">
+            <div class="risk-assessment">
+                <div class="risk-percent" style="color: {risk_color};">{risk_percent:.1f}%</div>
+                <div class="risk-level" style="color: {risk_color};">{risk_level} RISK</div>
+                <div class="risk-tier" style="color: {tier_color};">{tier_icon} Model tier: {risk_tier}</div>
+                <div class="risk-gauge-wrap">
                     <div class="risk-gauge"></div>
                     <div class="risk-marker" style="left: {risk_percent}%;"></div>
                 </div>
@@ -376,38 +418,30 @@ def main():
             # Risk factors
             st.markdown("**Risk Factors:**")
             
-            factors = [
-                ("Amount", min(data['amount'] / 10000, 0.25) * 100, "#667eea"),
-                ("V14 Score", data['v14'] * 25, "#8b5cf6"),
-                ("V17 Score", data['v17'] * 20, "#ec4899"),
-                ("Payment Method", 15 if data['payment_method'] == "Cryptocurrency" else 8 if data['payment_method'] == "Bank Transfer" else 5, "#10b981"),
-                ("Merchant", 15 if data['merchant'] == "Other" else 12 if data['merchant'] == "Airbnb" else 5, "#f59e0b"),
-                ("Device", 20 if data['device_type'] == "Unknown" else 5, "#3b82f6")
-            ]
-            
-            for factor, value, color in factors:
-                st.markdown(f"""
-                <div style="margin: 10px 0;">
-                    <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
-                        <span style="font-weight: 500;">{factor}</span>
-                        <span style="color: {color}; font-weight: 600;">{value:.1f}%</span>
-                    </div>
-                    <div style="width: 100%; height: 8px; background: #e5e7eb; border-radius: 4px;">
-                        <div style="width: {min(value, 100)}%; height: 100%; background: {color}; border-radius: 4px;"></div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+            # Contributions come from the scorer itself, so they add up to the score (before the 95% cap);
+            # all bars go out as one element rather than one per factor
+            bars = []
+            for factor, (label, color) in FACTOR_DISPLAY.items():
+                value = data['contributions'][factor] * 100
+                bars.append(f'<div class="factor"><div class="factor-label"><span>{label}</span>'
+                            f'<span style="color: {color};">{value:.1f}%</span></div>'
+                            f'<div class="factor-track"><div class="factor-fill" '
+                            f'style="width: {min(value, 100):.1f}%; background: {color};"></div></div></div>')
+            st.markdown("".join(bars), unsafe_allow_html=True)
             
             # Transaction info
             st.markdown("---")
             st.markdown("**Transaction Info:**")
             st.markdown(f"""
-            <div style="margin: 10px 0;">
+            <div class="transaction-info">
                 <strong>ID:</strong> {data['id']}<br>
+                <strong>Card:</strong> {data['card_id']}<br>
                 <strong>Amount:</strong> ${data['amount']:,.2f}<br>
                 <strong>Merchant:</strong> {data['merchant']}<br>
                 <strong>Payment:</strong> {data['payment_method']}<br>
                 <strong>Device:</strong> {data['device_type']}<br>
+                <strong>Velocity (V21):</strong> {data['v21']:.1f} txns/hour<br>
+                <strong>Amount Deviation (V22):</strong> {data['v22']:+.2f}σ<br>
                 <strong>Time:</strong> {data['timestamp']}
             </div>
             """, unsafe_allow_html=True)
@@ -418,20 +452,17 @@ def main():
             
             with col_btn1:
                 if st.button("✅ Approve", use_container_width=True):
-                    st.session_state.current_step = 3
-                    st.session_state.action = "approved"
+                    record_decision("approved")
                     st.rerun()
             
             with col_btn2:
                 if st.button("⚠️ Review", use_container_width=True):
-                    st.session_state.current_step = 3
-                    st.session_state.action = "flagged"
+                    record_decision("flagged")
                     st.rerun()
             
             with col_btn3:
                 if st.button("🛑 Block", use_container_width=True):
-                    st.session_state.current_step = 3
-                    st.session_state.action = "blocked"
+                    record_decision("blocked")
                     st.rerun()
             
             st.markdown('</div>', unsafe_allow_html=True)
@@ -481,27 +512,35 @@ def main():
         st.markdown("**System Status**")
         
         col_stat1, col_stat2, col_stat3 = st.columns(3)
+        metrics = get_live_metrics().snapshot()
         
         with col_stat1:
             st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-value">99.9%</div>', unsafe_allow_html=True)
-            st.markdown("Accuracy")
+            st.markdown(f'<div class="metric-value">{format_agreement(metrics["agreement"])}</div>', unsafe_allow_html=True)
+            st.markdown("Agreement")
             st.markdown('</div>', unsafe_allow_html=True)
         
         with col_stat2:
             st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-value">48ms</div>', unsafe_allow_html=True)
-            st.markdown("Response Time")
+            st.markdown(f'<div class="metric-value">{format_latency(metrics["latency_p99"])}</div>', unsafe_allow_html=True)
+            st.markdown("Response Time (p99)")
             st.markdown('</div>', unsafe_allow_html=True)
         
         with col_stat3:
             st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-value">$24.7K</div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="metric-value">{format_money(metrics["blocked_amount"])}</div>', unsafe_allow_html=True)
             st.markdown("Saved Today")
             st.markdown('</div>', unsafe_allow_html=True)
         
         st.markdown('</div>', unsafe_allow_html=True)
         
+        # Next flagged row of a bulk triage file
+        job = st.session_state.get('triage_job')
+        if 'triage_row' in data and job is not None and job.next_flagged() is not None:
+            if st.button("➡️ Next Flagged Transaction", type="primary", use_container_width=True):
+                review_next_flagged()
+                st.rerun()
+        
         # New analysis button
         if st.button("🔄 Start New Analysis", type="primary", use_container_width=True):
             st.session_state.current_step = 1
@@ -514,30 +553,43 @@ def main():
         st.markdown("### 🎛️ Control Panel")
         
         col_ctl1, col_ctl2, col_ctl3, col_ctl4 = st.columns(4)
+        metrics = get_live_metrics().snapshot()
         
         with col_ctl1:
             st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-value">1,247</div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="metric-value">{metrics["decisions"]:,}</div>', unsafe_allow_html=True)
             st.markdown("Today")
             st.markdown('</div>', unsafe_allow_html=True)
         
         with col_ctl2:
             st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-value">99.9%</div>', unsafe_allow_html=True)
-            st.markdown("Accuracy")
+            st.markdown(f'<div class="metric-value">{format_agreement(metrics["agreement"])}</div>', unsafe_allow_html=True)
+            st.markdown("Agreement")
             st.markdown('</div>', unsafe_allow_html=True)
         
         with col_ctl3:
             st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-value">$24.7K</div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="metric-value">{format_money(metrics["blocked_amount"])}</div>', unsafe_allow_html=True)
             st.markdown("Saved")
             st.markdown('</div>', unsafe_allow_html=True)
         
         with col_ctl4:
             st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-value">42ms</div>', unsafe_allow_html=True)
-            st.markdown("Live Speed")
+            st.markdown(f'<div class="metric-value">{format_latency(metrics["latency_p50"])}</div>', unsafe_allow_html=True)
+            st.markdown("Live Speed (p50)")
             st.markdown('</div>', unsafe_allow_html=True)
+        
+        # Input drift against the model's reference profile
+        monitor = get_drift_monitor()
+        if monitor is not None:
+            drift = monitor.snapshot()["features"]
+            for name, level in monitor.active():
+                message = (f"Drift on **{name}**: PSI {drift[name]['psi']:.2f}, KS {drift[name]['ks']:.2f}, "
+                           f"{drift[name]['anomaly_rate']:.1%} out of reference range")
+                if level == "alert":
+                    st.error(f"🚨 {message}")
+                else:
+                    st.warning(f"⚠️ {message}")
     
     # Footer
     st.markdown("---")
@@ -545,19 +597,16 @@ def main():
     
     st.markdown(f"""
     <div class="footer">
-        <p style="margin: 0; font-weight: 700; color: #111827;">
-            🛡️ FraudGuard™ Enterprise
-        </p>
-        <p style="margin: 10px 0; color: #6b7280;">
-            Live Transaction Security System • Updated: {current_time}
-        </p>
-        <p style="margin: 0; color: #9ca3af; font-size: 0.85rem;">
+        <p class="footer-title">🛡️ FraudGuard™ Enterprise</p>
+        <p>Live Transaction Security System • Updated: {current_time}</p>
+        <p class="footer-legal">
             © 2026 FraudGuard Security | Real-time Risk Assessment by Mubashir Arshad and Fellows
         </p>
     </div>
     """, unsafe_allow_html=True)
     
     st.markdown('</div>', unsafe_allow_html=True)
+    INSTRUMENTATION.since(RENDER_STAGES[render_step], render_start)
 
 if __name__ == "__main__":
     main()
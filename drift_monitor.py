@@ -0,0 +1,420 @@
+# drift_monitor.py
+"""Online drift and anomaly monitor for scored transactions.
+
+    python drift_monitor.py profile --model model.fgm --synthetic 284807
+    python drift_monitor.py profile --model model.fgm --csv reference_transactions.csv
+    python drift_monitor.py replay --model model.fgm transactions.csv
+
+A reference profile gives every monitored feature (amount, v14, v17 and the
+risk score) DEFAULT_BINS quantile bins of its reference data and the share
+of reference rows in each bin. It is stored in the model artifact as
+drift_edges_<feature> / drift_reference_<feature> arrays, so the monitor
+always compares against the data the deployed model was built for.
+A reference or replayed CSV must have the scorer's 0-1 v14/v17 columns: the
+training data's raw V14/V17 PCA components are on another scale and would
+drift-alert against every scored transaction.
+
+DriftMonitor keeps a count-based rolling window of the last `window` events,
+split into `slices` per-bin count arrays like live_metrics.LatencySketch: an
+event is one bisect and one increment per feature, and when a slice ages out
+its counts are subtracted from the window totals. Every check_every events
+the window is compared to the reference with PSI and (binned) KS, and the
+share of missing or out-of-reference-range values is checked; both cost a
+fixed number of bins, so memory and per-event work do not grow with traffic.
+
+A feature whose level rises (ok -> warn -> alert) produces an alert dict,
+kept in a bounded deque, counted as the drift_alerts metric and passed to
+on_alert.
+"""
+import argparse
+import collections
+import sys
+import threading
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+from instrumentation import INSTRUMENTATION
+from model_artifact import load_artifact, update_artifact
+
+MONITORED_FEATURES = ("amount", "v14", "v17", "risk_score")
+
+DEFAULT_BINS = 20
+DEFAULT_WINDOW = 10_000
+DEFAULT_SLICES = 10
+DEFAULT_CHECK_EVERY = 500
+DEFAULT_MIN_EVENTS = 1_000
+DEFAULT_MAX_ALERTS = 100
+
+# Population stability index: < 0.1 stable, 0.1-0.25 shifting, > 0.25 drifted
+PSI_WARN = 0.10
+PSI_ALERT = 0.25
+KS_ALERT = 0.15
+# Share of window values that are missing or outside the reference range
+ANOMALY_ALERT = 0.01
+
+# Bin shares are floored at this before taking logs (empty bins)
+PSI_EPSILON = 1e-4
+
+LEVELS = ("ok", "warn", "alert")
+
+
+class FeatureProfile:
+    """Reference bins of one feature: interior quantile edges, bin shares and range"""
+
+    def __init__(self, edges, reference, low, high):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.reference = np.asarray(reference, dtype=np.float64)
+        self.low = float(low)
+        self.high = float(high)
+        # bisect on a list is several times faster than np.searchsorted for one value
+        self.edge_list = self.edges.tolist()
+
+    @property
+    def n_bins(self):
+        return len(self.edges) + 1
+
+    def bin(self, value):
+        return bisect_right(self.edge_list, value)
+
+    def bins(self, values):
+        return np.searchsorted(self.edges, values, side="right")
+
+
+# Function to build a feature's reference bins from its reference values
+def build_feature_profile(values, bins=DEFAULT_BINS):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        raise ValueError("no reference values")
+    # Repeated quantiles (e.g. many zero scores) collapse into one edge
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+    counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+    return FeatureProfile(edges, counts / len(values), values.min(), values.max())
+
+
+# Function to build the reference profile of every monitored feature from a mapping of columns
+def build_profile(columns, bins=DEFAULT_BINS, features=MONITORED_FEATURES):
+    return {name: build_feature_profile(columns[name], bins) for name in features}
+
+
+# Function to build the reference profile from a scorer-input DataFrame (risk_score is computed if absent)
+def build_profile_from_frame(frame, bins=DEFAULT_BINS, table=None):
+    from score_file import SCORING_COLUMNS, score_chunk
+
+    columns = {name: frame[name].to_numpy() for name in MONITORED_FEATURES if name in frame}
+    if "risk_score" not in columns:
+        # Only the lower-case scorer columns (synthetic_data frames also carry the raw V14/V17 components)
+        inputs = frame[[name for name in frame.columns if name in SCORING_COLUMNS]]
+        columns["risk_score"] = score_chunk(inputs, table)["risk_score"].to_numpy()
+    return build_profile(columns, bins)
+
+
+# Function to rename a frame's columns to the scorer's; v14/v17 must already be on the scorer's 0-1 scale
+def to_scorer_columns(frame):
+    from score_file import resolve_columns
+
+    columns = resolve_columns(frame.columns)
+    raw = [name for name in ("v14", "v17") if columns.get(name) != name]
+    if raw:
+        raise ValueError(f"needs the scorer's 0-1 {' and '.join(raw)} columns (not the raw V14/V17 components)")
+    frame = frame.rename(columns={name: key for key, name in columns.items()})
+    duplicated = sorted(set(frame.columns[frame.columns.duplicated()]))
+    if duplicated:
+        raise ValueError(f"several columns named {', '.join(map(str, duplicated))}")
+    return frame
+
+
+# Function to get the artifact metadata and arrays that store a profile
+def profile_to_artifact(profile):
+    metadata = {
+        "drift_features": list(profile),
+        "drift_ranges": {name: [feature.low, feature.high] for name, feature in profile.items()},
+    }
+    arrays = {}
+    for name, feature in profile.items():
+        arrays[f"drift_edges_{name}"] = feature.edges
+        arrays[f"drift_reference_{name}"] = feature.reference
+    return metadata, arrays
+
+
+# Function to read the profile stored in a .fgm artifact (None when it has none)
+def load_profile(path):
+    artifact = load_artifact(path)
+    try:
+        names = artifact.metadata.get("drift_features")
+        if not names:
+            return None
+        ranges = artifact.metadata["drift_ranges"]
+        return {
+            name: FeatureProfile(np.array(artifact[f"drift_edges_{name}"]),
+                                 np.array(artifact[f"drift_reference_{name}"]), *ranges[name])
+            for name in names
+        }
+    finally:
+        artifact.close()
+
+
+# Function to check whether two profiles (or None) have the same features, bins, reference shares and ranges
+def same_profile(a, b):
+    if a is None or b is None:
+        return a is b
+    return list(a) == list(b) and all(
+        np.array_equal(a[name].edges, b[name].edges) and np.array_equal(a[name].reference, b[name].reference)
+        and (a[name].low, a[name].high) == (b[name].low, b[name].high) for name in a)
+
+
+# Function to store a profile in an existing artifact (watchers reload it like a threshold change)
+def save_profile(path, profile):
+    metadata, arrays = profile_to_artifact(profile)
+    update_artifact(path, metadata, arrays)
+
+
+# Function to get the population stability index of observed vs reference bin shares
+def psi(observed, reference):
+    observed = np.maximum(observed, PSI_EPSILON)
+    reference = np.maximum(reference, PSI_EPSILON)
+    return float(np.sum((observed - reference) * np.log(observed / reference)))
+
+
+# Function to get the Kolmogorov-Smirnov distance of two binned distributions
+def binned_ks(observed, reference):
+    return float(np.max(np.abs(np.cumsum(observed) - np.cumsum(reference))))
+
+
+class DriftMonitor:
+    """Rolling-window PSI/KS drift and range anomaly checks against a reference profile.
+
+    observe() takes one event and observe_batch() a batch of column arrays;
+    both are safe to call from several threads.
+    """
+
+    def __init__(self, profile, window=DEFAULT_WINDOW, slices=DEFAULT_SLICES, check_every=DEFAULT_CHECK_EVERY,
+                 min_events=DEFAULT_MIN_EVENTS, psi_warn=PSI_WARN, psi_alert=PSI_ALERT, ks_alert=KS_ALERT,
+                 anomaly_alert=ANOMALY_ALERT, max_alerts=DEFAULT_MAX_ALERTS, on_alert=None):
+        if window < slices:
+            raise ValueError("window must hold at least one event per slice")
+        missing = [name for name in MONITORED_FEATURES if name not in profile]
+        if missing:
+            raise ValueError(f"profile has no reference bins for {', '.join(missing)}")
+        self.profile = profile
+        self.features = MONITORED_FEATURES
+        self.slice_events = window // slices
+        self.window = self.slice_events * slices
+        self.check_every = check_every
+        self.min_events = min(min_events, self.window)
+        self.psi_warn = psi_warn
+        self.psi_alert = psi_alert
+        self.ks_alert = ks_alert
+        self.anomaly_alert = anomaly_alert
+        self.on_alert = on_alert
+        # Per feature: n_bins + 1 counts per slice, the last one counting anomalies, and the totals of the
+        # closed slices (the open slice is added when checking). Plain int lists: one increment is far
+        # cheaper than on a numpy array
+        self._slices = {name: [[0] * (profile[name].n_bins + 1) for _ in range(slices)] for name in self.features}
+        self._totals = {name: [0] * (profile[name].n_bins + 1) for name in self.features}
+        self._state = [(profile[name].edge_list, profile[name].low, profile[name].high, self._slices[name])
+                       for name in self.features]
+        self._slice_sizes = [0] * slices
+        self._position = 0
+        self._in_window = 0
+        self.events = 0
+        self.levels = dict.fromkeys(self.features, "ok")
+        self.stats = {name: {"psi": 0.0, "ks": 0.0, "anomaly_rate": 0.0} for name in self.features}
+        self.alerts = collections.deque(maxlen=max_alerts)
+        self.alert_count = 0
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_artifact(cls, path, **kwargs):
+        """Monitor for the profile stored in a .fgm artifact, or None when it has none"""
+        profile = load_profile(path)
+        return None if profile is None else cls(profile, **kwargs)
+
+    def _rotate(self):
+        # Close the open slice into the totals, then drop the oldest one and reuse its row for new events
+        closed = self._position
+        self._position = (self._position + 1) % len(self._slice_sizes)
+        for name in self.features:
+            slices = self._slices[name]
+            oldest = slices[self._position]
+            self._totals[name] = [total + new - old for total, new, old in zip(self._totals[name], slices[closed],
+                                                                                 oldest)]
+            slices[self._position] = [0] * len(oldest)
+        self._in_window -= self._slice_sizes[self._position]
+        self._slice_sizes[self._position] = 0
+
+    def observe(self, amount, v14, v17, risk_score):
+        """Add one scored transaction (O(1): a bisect and an increment per feature)"""
+        with self._lock:
+            if self._slice_sizes[self._position] == self.slice_events:
+                self._rotate()
+            position = self._position
+            for (edges, low, high, slices), value in zip(self._state, (amount, v14, v17, risk_score)):
+                counts = slices[position]
+                if value != value:
+                    # Missing: only counted as an anomaly
+                    counts[-1] += 1
+                    continue
+                counts[bisect_right(edges, value)] += 1
+                if value < low or value > high:
+                    counts[-1] += 1
+            self._slice_sizes[position] += 1
+            self._in_window += 1
+            self.events += 1
+            due = self.events % self.check_every == 0
+        if due:
+            self.check()
+
+    def observe_batch(self, **columns):
+        """Add a batch given as arrays named after the monitored features"""
+        columns = {name: np.asarray(columns[name], dtype=np.float64) for name in self.features}
+        n = len(columns[self.features[0]])
+        start = 0
+        due = False
+        with self._lock:
+            while start < n:
+                if self._slice_sizes[self._position] == self.slice_events:
+                    self._rotate()
+                stop = min(n, start + self.slice_events - self._slice_sizes[self._position])
+                for name in self.features:
+                    self._observe_values(name, columns[name][start:stop])
+                taken = stop - start
+                self._slice_sizes[self._position] += taken
+                self._in_window += taken
+                due = due or (self.events + taken) // self.check_every > self.events // self.check_every
+                self.events += taken
+                start = stop
+        if due:
+            self.check()
+
+    def _observe_values(self, name, values):
+        feature = self.profile[name]
+        missing = np.isnan(values)
+        present = values[~missing] if missing.any() else values
+        counts = np.bincount(feature.bins(present), minlength=feature.n_bins + 1)
+        counts[-1] = int(missing.sum()) + int(np.count_nonzero((present < feature.low) | (present > feature.high)))
+        current = self._slices[name][self._position]
+        self._slices[name][self._position] = [a + b for a, b in zip(current, counts.tolist())]
+
+    def check(self):
+        """Compare the window with the reference now; returns the alerts raised"""
+        raised = []
+        with self._lock:
+            if self._in_window < self.min_events:
+                return raised
+            for name in self.features:
+                totals = np.add(self._totals[name], self._slices[name][self._position], dtype=np.float64)
+                binned = totals[:-1].sum()
+                observed = totals[:-1] / binned if binned else np.zeros(len(totals) - 1)
+                reference = self.profile[name].reference
+                stats = {
+                    "psi": psi(observed, reference),
+                    "ks": binned_ks(observed, reference),
+                    "anomaly_rate": float(totals[-1]) / self._in_window,
+                }
+                self.stats[name] = stats
+                level = self._level(stats)
+                previous = self.levels[name]
+                self.levels[name] = level
+                if LEVELS.index(level) > LEVELS.index(previous):
+                    raised.append(dict(stats, feature=name, level=level, events=self.events, time=time.time()))
+            self.checked_at = time.time()
+            self.alerts.extend(raised)
+            self.alert_count += len(raised)
+        for alert in raised:
+            INSTRUMENTATION.inc("drift_alerts", help="Feature drift or anomaly alerts raised.")
+            if self.on_alert is not None:
+                self.on_alert(alert)
+        return raised
+
+    def _level(self, stats):
+        if (stats["psi"] >= self.psi_alert or stats["ks"] >= self.ks_alert
+                or stats["anomaly_rate"] >= self.anomaly_alert):
+            return "alert"
+        if stats["psi"] >= self.psi_warn:
+            return "warn"
+        return "ok"
+
+    def active(self):
+        """Features currently at warn or alert level, worst first"""
+        with self._lock:
+            flagged = [(name, level) for name, level in self.levels.items() if level != "ok"]
+        return sorted(flagged, key=lambda item: -LEVELS.index(item[1]))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "events": self.events,
+                "window": self._in_window,
+                "checked_at": self.checked_at,
+                "features": {name: dict(self.stats[name], level=self.levels[name]) for name in self.features},
+                "alerts": self.alert_count,
+                "recent_alerts": list(self.alerts)[-10:],
+            }
+
+
+# Function to print an alert on one line
+def print_alert(alert):
+    print(f"[{alert['level'].upper()}] {alert['feature']}: psi {alert['psi']:.3f} ks {alert['ks']:.3f} "
+          f"anomalies {alert['anomaly_rate']:.2%} after {alert['events']:,} events", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reference profiles and offline replays for the drift monitor.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    profile = commands.add_parser("profile", help="store a reference profile in a model artifact")
+    source = profile.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="reference transactions with the scorer's columns (0-1 v14/v17)")
+    source.add_argument("--synthetic", type=int, help="use this many synthetic_data rows")
+    profile.add_argument("--bins", type=int, default=DEFAULT_BINS)
+    profile.add_argument("--model", default="model.fgm")
+    replay = commands.add_parser("replay", help="stream a transactions file through the monitor")
+    replay.add_argument("input")
+    replay.add_argument("--model", default="model.fgm")
+    replay.add_argument("--window", type=int, default=DEFAULT_WINDOW)
+    replay.add_argument("--chunk-size", type=int, default=1_000)
+    args = parser.parse_args(argv)
+
+    if args.command == "profile":
+        import pandas as pd
+
+        from synthetic_data import generate_dataset
+
+        if args.csv:
+            try:
+                frame = to_scorer_columns(pd.read_csv(args.csv))
+            except ValueError as exc:
+                parser.error(f"{args.csv}: {exc}")
+        else:
+            frame = generate_dataset(args.synthetic)
+        built = build_profile_from_frame(frame, args.bins)
+        save_profile(args.model, built)
+        print(f"stored a {len(frame):,}-row reference profile of {', '.join(built)} in {args.model}")
+        return 0
+
+    from score_file import iter_chunks, score_chunk
+
+    monitor = DriftMonitor.from_artifact(args.model, window=args.window, on_alert=print_alert)
+    if monitor is None:
+        print(f"{args.model} has no reference profile; run `python drift_monitor.py profile` first")
+        return 1
+    for chunk in iter_chunks(args.input, args.chunk_size):
+        try:
+            chunk = to_scorer_columns(chunk)
+        except ValueError as exc:
+            parser.error(f"{args.input}: {exc}")
+        scores = score_chunk(chunk)["risk_score"].to_numpy()
+        monitor.observe_batch(amount=chunk["amount"].to_numpy(), v14=chunk["v14"].to_numpy(),
+                              v17=chunk["v17"].to_numpy(), risk_score=scores)
+    monitor.check()
+    for name, stats in monitor.snapshot()["features"].items():
+        print(f"{name:>10}: psi {stats['psi']:.3f} ks {stats['ks']:.3f} anomalies {stats['anomaly_rate']:.2%} "
+              f"[{stats['level']}]")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
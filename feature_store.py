@@ -0,0 +1,172 @@
+# feature_store.py
+"""In-process per-entity velocity features.
+
+For every card/customer id the store keeps exponentially decayed transaction
+counts, amount sums and amount sums of squares over 1m/1h/24h windows. An
+update or read touches one fixed-size state list, so both are O(1), and
+entities idle for longer than idle_ttl (or beyond max_entities, least recently
+seen first) are evicted as new transactions arrive.
+
+The derived features fill the model's V21 ("Transaction Velocity") and V22
+("Amount Deviation") slots.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from instrumentation import INSTRUMENTATION, clock
+
+# Window name -> decay time constant in seconds
+WINDOWS = {"1m": 60.0, "1h": 3600.0, "24h": 86400.0}
+
+DEFAULT_IDLE_TTL = 2 * 86400.0
+DEFAULT_MAX_ENTITIES = 1_000_000
+
+# Extra risk added by score_with_features when velocity/deviation saturate
+VELOCITY_RISK_WEIGHT = 0.10
+VELOCITY_CAP = 20.0
+DEVIATION_RISK_WEIGHT = 0.05
+DEVIATION_CAP = 4.0
+
+
+class VelocityFeatureStore:
+    """Decayed rolling counts, sums and amount mean/variance per entity"""
+
+    def __init__(self, windows=None, idle_ttl=DEFAULT_IDLE_TTL, max_entities=DEFAULT_MAX_ENTITIES,
+                 velocity_window="1h", profile_window="24h"):
+        self.windows = dict(WINDOWS if windows is None else windows)
+        if velocity_window not in self.windows or profile_window not in self.windows:
+            raise ValueError("velocity_window and profile_window must be names of windows")
+        self.window_names = tuple(self.windows)
+        self.taus = tuple(self.windows.values())
+        self.velocity_window = velocity_window
+        self.profile_window = profile_window
+        self.idle_ttl = idle_ttl
+        self.max_entities = max_entities
+        # entity id -> [last_time, count, sum, sum_sq] + [count, sum, sum_sq] per extra window
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._states)
+
+    def update(self, entity_id, amount, timestamp=None):
+        """Record a transaction and return the entity's features including it"""
+        now = time.time() if timestamp is None else float(timestamp)
+        with self._lock:
+            state = self._states.get(entity_id)
+            if state is None:
+                state = [now] + [0.0] * (3 * len(self.taus))
+                self._states[entity_id] = state
+            else:
+                self._states.move_to_end(entity_id)
+                self._decay(state, now)
+            for i in range(len(self.taus)):
+                base = 1 + 3 * i
+                state[base] += 1.0
+                state[base + 1] += amount
+                state[base + 2] += amount * amount
+            self._evict(now)
+            return self._features(state, amount)
+
+    def read(self, entity_id, amount=None, timestamp=None):
+        """Features for an entity at timestamp without recording a transaction"""
+        now = time.time() if timestamp is None else float(timestamp)
+        with self._lock:
+            state = self._states.get(entity_id)
+            if state is None:
+                state = [now] + [0.0] * (3 * len(self.taus))
+            else:
+                state = list(state)
+                self._decay(state, now)
+            return self._features(state, amount)
+
+    def _decay(self, state, now):
+        elapsed = now - state[0]
+        if elapsed > 0:
+            for i, tau in enumerate(self.taus):
+                factor = math.exp(-elapsed / tau)
+                base = 1 + 3 * i
+                state[base] *= factor
+                state[base + 1] *= factor
+                state[base + 2] *= factor
+            state[0] = now
+
+    def _evict(self, now):
+        # Oldest-seen entities sit at the front, so each pass stops at the first live one
+        states = self._states
+        while states:
+            entity_id, state = next(iter(states.items()))
+            if len(states) <= self.max_entities and now - state[0] <= self.idle_ttl:
+                break
+            del states[entity_id]
+            self.evictions += 1
+
+    def _features(self, state, amount):
+        features = {}
+        for i, name in enumerate(self.window_names):
+            count, total, total_sq = state[1 + 3 * i:4 + 3 * i]
+            mean = total / count if count > 0 else 0.0
+            variance = max(total_sq / count - mean * mean, 0.0) if count > 0 else 0.0
+            features[f"count_{name}"] = count
+            features[f"sum_{name}"] = total
+            features[f"mean_{name}"] = mean
+            features[f"std_{name}"] = math.sqrt(variance)
+
+        # V21: recent transaction count; V22: z-score of the amount against the longer profile
+        features["V21"] = features[f"count_{self.velocity_window}"]
+        std = features[f"std_{self.profile_window}"]
+        if amount is None or std == 0.0:
+            features["V22"] = 0.0
+        else:
+            features["V22"] = (amount - features[f"mean_{self.profile_window}"]) / std
+        return features
+
+
+# Function to get the extra risk implied by velocity features
+def velocity_risk(features):
+    velocity = min(features["V21"] / VELOCITY_CAP, 1.0)
+    deviation = min(max(features["V22"], 0.0) / DEVIATION_CAP, 1.0)
+    return VELOCITY_RISK_WEIGHT * velocity + DEVIATION_RISK_WEIGHT * deviation
+
+
+# Function to score a transaction after pulling its entity's velocity features
+def score_with_features(store, entity_id, amount, v14, v17, payment_method, merchant, device_type="Desktop",
+                        timestamp=None, table=None, record=True, explain=False):
+    """Returns (risk_score, features), or (risk_score, features, contributions) with explain=True.
+
+    The rule-table score gets velocity_risk(features) added on top, capped at
+    0.95 like calculate_risk_score. With record=False the store is only read
+    (for previews), otherwise the transaction is recorded first. contributions
+    maps each scoring_engine.FACTORS term plus "velocity" to its share of the
+    score, computed for the same hour and table.
+    """
+    from scoring_engine import DEFAULT_RISK_TABLE, explain_risk_score, get_hour, get_unix_seconds
+
+    # Sampled stage timing (see instrumentation.py); start is 0 on untimed calls
+    start = clock() if next(INSTRUMENTATION.sample) else 0
+    table = DEFAULT_RISK_TABLE if table is None else table
+    when = get_unix_seconds(timestamp)
+    if record:
+        features = store.update(entity_id, amount, when)
+    else:
+        features = store.read(entity_id, amount, when)
+    if start:
+        start = INSTRUMENTATION.since("fetch", start)
+    hour = get_hour(timestamp)
+    payment_id = table.payment_ids.get(payment_method, len(table.payment_methods))
+    merchant_id = table.merchant_ids.get(merchant, len(table.merchants))
+    device_id = table.device_ids.get(device_type, len(table.device_types))
+    if start:
+        start = INSTRUMENTATION.since("encode", start)
+    score = table.score_encoded(amount, v14, v17, payment_id, merchant_id, device_id, hour)
+    score = min(score + velocity_risk(features), 0.95)
+    if start:
+        INSTRUMENTATION.since("score", start)
+    if explain:
+        contributions = explain_risk_score(amount, v14, v17, payment_method, merchant, device_type, table, hour=hour)
+        contributions["velocity"] = velocity_risk(features)
+        return score, features, contributions
+    return score, features
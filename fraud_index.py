@@ -0,0 +1,273 @@
+# fraud_index.py
+"""Nearest-known-fraud lookup over the V1-V28 components.
+
+    python fraud_index.py build --csv creditcard.csv --output fraud_index.fgm
+    python fraud_index.py build --synthetic 300000 --all --output reference_index.fgm
+
+FraudIndex is an inverted-file (IVF) index: k-means splits the reference
+vectors into nlist cells and stores them grouped by cell, so every cell is
+one contiguous block. A query ranks the centroids, takes the nprobe closest
+cells and computes exact distances only for their rows (about nprobe / nlist
+of the set). Sets under BRUTE_FORCE_ROWS use a single cell, i.e. an exact
+scan, which is what the 492 fraud cases of the training data need.
+
+The index is saved as a .fgm artifact (see model_artifact), so loading it
+memory-maps the vectors instead of reading them, and processes serving the
+same file share its pages.
+
+pattern_risk() turns the distances to the k nearest known frauds into a
+0-1 similarity, scaled by how far indexed frauds typically are from their
+own nearest neighbours, as an extra risk signal next to the score;
+score_file.py --fraud-index adds it to every row of a file with V1-V28.
+"""
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+from model_artifact import FEATURE_ORDER, load_artifact, save_artifact
+
+# Embedding columns indexed (V1-V28)
+COMPONENTS = FEATURE_ORDER[:28]
+
+INDEX_KIND = "fraud_pattern_index"
+DEFAULT_K = 10
+BRUTE_FORCE_ROWS = 20_000
+KMEANS_ITERATIONS = 8
+KMEANS_SAMPLE_PER_LIST = 16
+ASSIGN_CHUNK_ROWS = 2048
+CALIBRATION_ROWS = 256
+
+
+class FraudIndex:
+    """IVF index of reference vectors grouped by k-means cell"""
+
+    def __init__(self, centroids, offsets, vectors, norms, ids, metadata):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.vectors = vectors
+        self.norms = norms
+        self.ids = ids
+        self.metadata = metadata
+        self.nlist = len(centroids)
+        self.nprobe = metadata.get("nprobe", self.nlist)
+        self.distance_scale = metadata.get("distance_scale")
+        self._centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+        self._artifact = None
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @classmethod
+    def load(cls, path):
+        """Open a saved index; the vectors stay memory-mapped"""
+        artifact = load_artifact(path)
+        if artifact.metadata.get("kind") != INDEX_KIND:
+            artifact.close()
+            raise ValueError(f"{path} is not a fraud pattern index")
+        index = cls(artifact["centroids"], artifact["offsets"], artifact["vectors"], artifact["norms"],
+                    artifact["ids"], artifact.metadata)
+        index._artifact = artifact
+        return index
+
+    def save(self, path):
+        save_artifact(path, self.metadata, {
+            "centroids": self.centroids, "offsets": self.offsets, "vectors": self.vectors,
+            "norms": self.norms, "ids": self.ids,
+        })
+
+    def close(self):
+        if self._artifact is not None:
+            self._artifact.close()
+            self._artifact = None
+
+    def search(self, query, k=DEFAULT_K, nprobe=None):
+        """(distances, ids) of the k nearest reference vectors, closest first"""
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        if nprobe >= self.nlist:
+            candidates = None
+            vectors, norms = self.vectors, self.norms
+        else:
+            closeness = self._centroid_norms - 2 * (self.centroids @ query)
+            cells = np.argpartition(closeness, nprobe - 1)[:nprobe]
+            starts = self.offsets[cells]
+            sizes = self.offsets[cells + 1] - starts
+            ends = np.cumsum(sizes)
+            # Row numbers of the probed cells in one vectorized step (each cell is a contiguous block)
+            candidates = np.arange(ends[-1]) + np.repeat(starts - (ends - sizes), sizes)
+            vectors, norms = np.take(self.vectors, candidates, axis=0), np.take(self.norms, candidates)
+        squared = norms - 2 * (vectors @ query) + query @ query
+        return self._nearest(squared, candidates, k)
+
+    def brute_force(self, query, k=DEFAULT_K):
+        """Exact search over every vector (the reference for recall)"""
+        query = np.asarray(query, dtype=np.float32)
+        return self._nearest(self.norms - 2 * (self.vectors @ query) + query @ query, None, k)
+
+    def _nearest(self, squared, candidates, k):
+        k = min(k, len(squared))
+        if k == 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        nearest = np.argpartition(squared, k - 1)[:k] if k < len(squared) else np.arange(k)
+        nearest = nearest[np.argsort(squared[nearest], kind="stable")]
+        rows = nearest if candidates is None else candidates[nearest]
+        return np.sqrt(np.maximum(squared[nearest], 0)), self.ids[rows]
+
+    def search_batch(self, queries, k=DEFAULT_K, nprobe=None):
+        """search() for each row of queries; (n, k) arrays padded with inf / -1"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, query in enumerate(queries):
+            found_distances, found_ids = self.search(query, k, nprobe)
+            distances[row, :len(found_ids)] = found_distances
+            ids[row, :len(found_ids)] = found_ids
+        return distances, ids
+
+    def pattern_risk(self, query, k=DEFAULT_K, nprobe=None):
+        """Nearest known frauds of a V1-V28 vector and a 0-1 similarity to them"""
+        distances, ids = self.search(query, k, nprobe)
+        mean_distance = float(distances.mean()) if len(distances) else math.inf
+        scale = self.distance_scale or 1.0
+        return {
+            "ids": ids.tolist(),
+            "distances": distances.tolist(),
+            "mean_distance": mean_distance,
+            "similarity": math.exp(-mean_distance / scale),
+        }
+
+    def pattern_risks(self, queries, k=DEFAULT_K, nprobe=None):
+        """pattern_risk() for each row of queries: (mean_distance, similarity) arrays"""
+        distances, _ = self.search_batch(queries, min(k, len(self)) or 1, nprobe)
+        mean_distances = distances.mean(axis=1)
+        return mean_distances, np.exp(-mean_distances / (self.distance_scale or 1.0))
+
+
+# Function to pick the number of cells for n vectors (one cell = exact scan for small sets)
+def default_nlist(n):
+    if n < BRUTE_FORCE_ROWS:
+        return 1
+    return 2 ** round(math.log2(8 * math.sqrt(n)))
+
+
+# Function to get the closest centroid of every row, a chunk at a time
+def nearest_centroids(vectors, centroids):
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    cells = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_CHUNK_ROWS):
+        chunk = vectors[start:start + ASSIGN_CHUNK_ROWS]
+        cells[start:start + len(chunk)] = np.argmin(centroid_norms - 2 * (chunk @ centroids.T), axis=1)
+    return cells
+
+
+# Function to train nlist k-means centroids on a sample of the vectors
+def train_centroids(vectors, nlist, seed=0, iterations=KMEANS_ITERATIONS):
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * KMEANS_SAMPLE_PER_LIST)
+    sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(iterations):
+        cells = nearest_centroids(sample, centroids)
+        counts = np.bincount(cells, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, cells, sample)
+        filled = counts > 0
+        # Empty cells keep their previous centroid
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+# Function to build an index over reference vectors (rows of V1-V28)
+def build_index(vectors, ids=None, nlist=None, nprobe=None, seed=0):
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if vectors.ndim != 2 or vectors.shape[1] != len(COMPONENTS):
+        raise ValueError(f"expected an (n, {len(COMPONENTS)}) array of {COMPONENTS[0]}-{COMPONENTS[-1]}")
+    ids = np.arange(len(vectors), dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+    nlist = min(nlist or default_nlist(len(vectors)), len(vectors))
+    if nlist > 1:
+        centroids = train_centroids(vectors, nlist, seed)
+        cells = nearest_centroids(vectors, centroids)
+    else:
+        centroids = vectors.mean(axis=0, keepdims=True)
+        cells = np.zeros(len(vectors), dtype=np.int64)
+
+    order = np.argsort(cells, kind="stable")
+    grouped = vectors[order]
+    offsets = np.searchsorted(cells[order], np.arange(nlist + 1)).astype(np.int64)
+    metadata = {
+        "kind": INDEX_KIND,
+        "components": list(COMPONENTS),
+        "rows": len(vectors),
+        "nlist": nlist,
+        "nprobe": nprobe or max(1, nlist // 32),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    index = FraudIndex(centroids, offsets, grouped, np.einsum("ij,ij->i", grouped, grouped), ids[order], metadata)
+    index.distance_scale = index.metadata["distance_scale"] = calibrate(index, seed)
+    return index
+
+
+# Function to get the typical mean distance from an indexed vector to its k nearest other vectors
+def calibrate(index, seed=0, k=DEFAULT_K):
+    if len(index) < 2:
+        return None
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(index), min(len(index), CALIBRATION_ROWS), replace=False)
+    means = [index.search(index.vectors[row], k + 1)[0][1:].mean() for row in sample.tolist()]
+    return float(np.median(means))
+
+
+# Function to read V1-V28 (and Class) from a CSV in the training data's layout
+def read_reference(path, frauds_only=True):
+    import pandas as pd
+
+    frame = pd.read_csv(path, usecols=lambda name: name in COMPONENTS or name == "Class")
+    if frauds_only:
+        if "Class" not in frame:
+            raise ValueError(f"{path} has no Class column to select fraud cases with")
+        frame = frame[frame["Class"] == 1]
+    return frame[list(COMPONENTS)].to_numpy(np.float32), frame.index.to_numpy(np.int64)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a nearest-known-fraud index over V1-V28.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build an index file")
+    source = build.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="CSV with V1-V28 and Class columns (e.g. the training data)")
+    source.add_argument("--synthetic", type=int, help="use this many synthetic_data rows")
+    build.add_argument("--all", action="store_true", help="index every row, not only Class == 1")
+    build.add_argument("--nlist", type=int, default=None, help="k-means cells (default scales with the rows)")
+    build.add_argument("--nprobe", type=int, default=None, help="cells searched per query (default nlist/32)")
+    build.add_argument("--output", default="fraud_index.fgm")
+    info = commands.add_parser("info", help="describe an index file")
+    info.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        index = FraudIndex.load(args.path)
+        print({key: value for key, value in index.metadata.items() if key != "components"})
+        index.close()
+        return 0
+
+    start = time.perf_counter()
+    if args.csv:
+        vectors, ids = read_reference(args.csv, frauds_only=not args.all)
+    else:
+        from synthetic_data import generate_feature_matrix
+
+        X, y = generate_feature_matrix(args.synthetic)
+        rows = np.arange(len(X)) if args.all else np.flatnonzero(y)
+        vectors, ids = X[rows, :len(COMPONENTS)], rows
+    index = build_index(vectors, ids, args.nlist, args.nprobe)
+    index.save(args.output)
+    print(f"indexed {len(index):,} vectors in {index.nlist:,} cells (nprobe {index.nprobe}) "
+          f"in {time.perf_counter() - start:.1f}s -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+# instrumentation.py
+"""Stage timing, counters and an opt-in sampling profiler for the scoring pipeline.
+
+Stages are timed with chained perf_counter_ns reads: since(stage, start)
+records the time since start and returns "now", which becomes the start of
+the next stage, so N stages cost N + 1 clock reads. Histograms use power of
+two nanosecond buckets picked with int.bit_length(), which keeps an
+observation at one list increment. Updates take no lock; under heavy thread
+contention a count can occasionally be lost, which is fine for monitoring.
+
+A stage observation costs a few hundred nanoseconds, which is too much for
+per-transaction paths that only take ~10 us. Those time one call in
+sample_every and skip the rest with a single iterator step:
+
+    start = clock() if next(INSTRUMENTATION.sample) else 0
+    ...
+    if start:
+        start = INSTRUMENTATION.since("fetch", start)
+
+so their histograms hold a 1-in-sample_every sample of the calls. Coarse
+stages (a dashboard render, a whole batch) call since() every time.
+
+render_prometheus() produces the Prometheus text exposition format, served on
+GET /metrics by MetricsServer (dashboard) and by score_server.
+
+The sampling profiler is off unless started (FRAUDGUARD_PROFILE_INTERVAL or
+start_profiler()). It runs in its own thread and reads sys._current_frames()
+every interval, so the scoring threads pay nothing between samples.
+"""
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Histogram buckets are 2**k nanoseconds for k in this range (256 ns .. ~17 s)
+MIN_BUCKET_BIT = 8
+MAX_BUCKET_BIT = 34
+
+METRIC_PREFIX = "fraudguard"
+DEFAULT_SAMPLE_EVERY = 64
+DEFAULT_METRICS_PORT = 9108
+DEFAULT_PROFILE_INTERVAL = 0.01
+DEFAULT_PROFILE_DEPTH = 32
+
+clock = time.perf_counter_ns
+
+
+class StageHistogram:
+    """Count, total and power-of-two bucket counts of one stage's durations"""
+
+    __slots__ = ("buckets", "count", "total_ns")
+
+    def __init__(self):
+        self.buckets = [0] * (MAX_BUCKET_BIT + 1)
+        self.count = 0
+        self.total_ns = 0
+
+
+class Instrumentation:
+    """Per-stage timing histograms and monotonic event counters"""
+
+    def __init__(self, enabled=True, sample_every=DEFAULT_SAMPLE_EVERY):
+        self.stages = {}
+        self.counters = {}
+        self.help = {}
+        self.configure(enabled, sample_every)
+
+    def configure(self, enabled=None, sample_every=None):
+        """Turn timing on/off or change how many hot-path calls share one timed sample"""
+        if enabled is not None:
+            self.enabled = enabled
+        if sample_every is not None:
+            if sample_every < 1:
+                raise ValueError("sample_every must be at least 1")
+            self.sample_every = sample_every
+        # Yields True once every sample_every steps; never while disabled
+        if self.enabled:
+            self.sample = itertools.cycle((True,) + (False,) * (self.sample_every - 1))
+        else:
+            self.sample = itertools.repeat(False)
+
+    def observe(self, stage, elapsed_ns):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages.setdefault(stage, StageHistogram())
+        bit = elapsed_ns.bit_length()
+        if bit < MIN_BUCKET_BIT:
+            bit = MIN_BUCKET_BIT
+        elif bit > MAX_BUCKET_BIT:
+            bit = MAX_BUCKET_BIT
+        histogram.buckets[bit] += 1
+        histogram.count += 1
+        histogram.total_ns += elapsed_ns
+
+    def since(self, stage, start_ns):
+        """Record the time from start_ns to now under stage; returns now for the next stage"""
+        now = clock()
+        if self.enabled:
+            self.observe(stage, now - start_ns)
+        return now
+
+    def stage(self, name):
+        """Context manager timing a block as one stage"""
+        return _StageTimer(self, name)
+
+    def inc(self, name, amount=1, help=None):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+            if help is not None and name not in self.help:
+                self.help[name] = help
+
+    def reset(self):
+        self.stages.clear()
+        self.counters.clear()
+
+    def summary(self):
+        """Count, mean and total seconds per stage"""
+        return {
+            stage: {"count": h.count, "mean_seconds": h.total_ns / h.count / 1e9 if h.count else 0.0,
+                    "total_seconds": h.total_ns / 1e9}
+            for stage, h in self.stages.items()
+        }
+
+    def render_prometheus(self):
+        name = f"{METRIC_PREFIX}_stage_seconds"
+        lines = [f"# HELP {name} Time spent in each scoring pipeline stage.", f"# TYPE {name} histogram"]
+        for stage, histogram in sorted(self.stages.items()):
+            cumulative = 0
+            for bit in range(MIN_BUCKET_BIT, MAX_BUCKET_BIT):
+                cumulative += histogram.buckets[bit]
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{2 ** bit / 1e9:.6g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.total_ns / 1e9:.9f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        for counter, value in sorted(self.counters.items()):
+            metric = f"{METRIC_PREFIX}_{counter}_total"
+            if counter in self.help:
+                lines.append(f"# HELP {metric} {self.help[counter]}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class _StageTimer:
+    __slots__ = ("instrumentation", "name", "start")
+
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.start = clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.instrumentation.since(self.name, self.start)
+
+
+class SamplingProfiler:
+    """Background sampler that counts collapsed Python stacks of other threads"""
+
+    def __init__(self, interval=DEFAULT_PROFILE_INTERVAL, max_depth=DEFAULT_PROFILE_DEPTH):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="fraudguard-profiler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Stacks in collapsed format ("a;b;c count" per line), the input of flamegraph tools"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit=20):
+        """Innermost frames ordered by how often they were on CPU when sampled"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+
+INSTRUMENTATION = Instrumentation(
+    enabled=os.environ.get("FRAUDGUARD_INSTRUMENTATION", "1") != "0",
+    sample_every=int(os.environ.get("FRAUDGUARD_SAMPLE_EVERY", DEFAULT_SAMPLE_EVERY)),
+)
+PROFILER = None
+
+
+# Function to start the shared sampling profiler (the opt-in profiling hook)
+def start_profiler(interval=DEFAULT_PROFILE_INTERVAL):
+    global PROFILER
+    if PROFILER is None:
+        PROFILER = SamplingProfiler(interval)
+    return PROFILER.start()
+
+
+# Function to start the profiler when FRAUDGUARD_PROFILE_INTERVAL (seconds) is set
+def start_profiler_from_env():
+    interval = os.environ.get("FRAUDGUARD_PROFILE_INTERVAL")
+    return start_profiler(float(interval)) if interval else None
+
+
+class MetricsServer:
+    """Local HTTP endpoint: GET /metrics (Prometheus text) and GET /profile (collapsed stacks)"""
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_METRICS_PORT, instrumentation=None):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        instrumentation = INSTRUMENTATION if instrumentation is None else instrumentation
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, status = instrumentation.render_prometheus(), 200
+                elif self.path == "/profile":
+                    body = PROFILER.collapsed() if PROFILER is not None else "profiler not running\n"
+                    status = 200
+                else:
+                    body, status = "not found\n", 404
+                data = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fraudguard-metrics", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,188 @@
+# live_metrics.py
+"""Incrementally maintained dashboard metrics.
+
+LiveMetrics keeps today's counters (transactions scored per risk level,
+decisions per action, blocked amount, decisions that followed the score's
+risk level) and a rolling LatencySketch of scoring latency. Every record_*
+call is O(1); snapshot() reads the counters plus a fixed number of sketch
+buckets, so rendering the panel costs the same after ten transactions or ten
+million.
+"""
+import math
+import threading
+import time
+from datetime import date
+
+from decision_log import ACTIONS
+from scoring_engine import RISK_LEVELS, get_risk_level_code
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MIN_LATENCY = 1e-6
+DEFAULT_MAX_LATENCY = 100.0
+DEFAULT_WINDOW = 300.0
+DEFAULT_SLICES = 10
+
+
+class LatencySketch:
+    """Streaming quantile sketch over the last `window` seconds.
+
+    Values fall into logarithmic buckets of ratio gamma = (1 + a) / (1 - a),
+    so every quantile is within relative error a of a value actually seen.
+    The window is split into `slices` sparse sub-histograms; when a slice
+    ages out its counts are subtracted from the running total, so add() and
+    quantile() never touch more than a fixed number of buckets.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, min_value=DEFAULT_MIN_LATENCY,
+                 max_value=DEFAULT_MAX_LATENCY, window=DEFAULT_WINDOW, slices=DEFAULT_SLICES, clock=time.monotonic):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.n_buckets = int(math.ceil(math.log(max_value / min_value) / self._log_gamma)) + 1
+        self.slice_seconds = window / slices
+        self.clock = clock
+        self._totals = [0] * self.n_buckets
+        self._slices = [{} for _ in range(slices)]
+        self._slice_ids = [None] * slices
+        self.count = 0
+
+    def _bucket(self, value):
+        if value <= self.min_value:
+            return 0
+        return min(int(math.log(value / self.min_value) / self._log_gamma), self.n_buckets - 1)
+
+    def _current_slice(self):
+        slice_id = int(self.clock() // self.slice_seconds)
+        position = slice_id % len(self._slices)
+        if self._slice_ids[position] != slice_id:
+            # The slot still holds a slice from a window ago: drop it from the totals
+            for bucket, count in self._slices[position].items():
+                self._totals[bucket] -= count
+                self.count -= count
+            self._slices[position] = {}
+            self._slice_ids[position] = slice_id
+        return self._slices[position]
+
+    def _expire(self):
+        now_id = int(self.clock() // self.slice_seconds)
+        for position, slice_id in enumerate(self._slice_ids):
+            if slice_id is not None and now_id - slice_id >= len(self._slices):
+                for bucket, count in self._slices[position].items():
+                    self._totals[bucket] -= count
+                    self.count -= count
+                self._slices[position] = {}
+                self._slice_ids[position] = None
+
+    def add(self, value):
+        bucket = self._bucket(value)
+        counts = self._current_slice()
+        counts[bucket] = counts.get(bucket, 0) + 1
+        self._totals[bucket] += 1
+        self.count += 1
+
+    def quantiles(self, qs):
+        """Estimates for each q in qs (None while the window is empty)"""
+        self._expire()
+        if self.count == 0:
+            return [None] * len(qs)
+        ranks = sorted((q * (self.count - 1), i) for i, q in enumerate(qs))
+        results = [None] * len(qs)
+        seen = 0
+        position = 0
+        for bucket, count in enumerate(self._totals):
+            seen += count
+            while position < len(ranks) and ranks[position][0] < seen:
+                results[ranks[position][1]] = self.min_value * self.gamma ** bucket * (1 + self.gamma) / 2
+                position += 1
+            if position == len(ranks):
+                break
+        return results
+
+    def quantile(self, q):
+        return self.quantiles((q,))[0]
+
+
+class LiveMetrics:
+    """Today's scoring/decision counters and rolling scoring latency, updated in O(1)"""
+
+    def __init__(self, window=DEFAULT_WINDOW, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, today=date.today):
+        self.today = today
+        self.latency = LatencySketch(relative_accuracy, window=window)
+        self._lock = threading.Lock()
+        self._reset(today())
+
+    def _reset(self, day):
+        self.day = day
+        self.scored = [0] * len(RISK_LEVELS)
+        self.decisions = [0] * len(ACTIONS)
+        self.blocked_amount = 0.0
+        self.agreed = 0
+
+    def _roll_day(self):
+        day = self.today()
+        if day != self.day:
+            self._reset(day)
+
+    def seed(self, summary):
+        """Start today's decision counters from a DecisionLog.summary() of today"""
+        with self._lock:
+            self._roll_day()
+            self.decisions = [summary["counts"][action] for action in ACTIONS]
+            self.blocked_amount = summary["blocked_amount"]
+            self.agreed = summary.get("agreed", 0)
+
+    def record_score(self, risk_score, latency=None, table=None):
+        """Count a scored transaction by risk level (of table's thresholds); latency in seconds"""
+        with self._lock:
+            self._roll_day()
+            self.scored[get_risk_level_code(risk_score, table)] += 1
+            if latency is not None:
+                self.latency.add(latency)
+
+    def record_latency(self, latency):
+        """Add a scoring latency that is not a new transaction (e.g. a preview)"""
+        with self._lock:
+            self.latency.add(latency)
+
+    def record_decision(self, action, amount, risk_score, table=None):
+        with self._lock:
+            self._roll_day()
+            code = ACTIONS.index(action)
+            self.decisions[code] += 1
+            if code == ACTIONS.index("blocked"):
+                self.blocked_amount += amount
+            if code == get_risk_level_code(risk_score, table):
+                self.agreed += 1
+
+    def snapshot(self):
+        with self._lock:
+            self._roll_day()
+            p50, p95, p99 = self.latency.quantiles((0.50, 0.95, 0.99))
+            decided = sum(self.decisions)
+            return {
+                "day": self.day.isoformat(),
+                "scored": sum(self.scored),
+                "levels": {RISK_LEVELS[code][0]: count for code, count in enumerate(self.scored)},
+                "decisions": sum(self.decisions),
+                "actions": dict(zip(ACTIONS, self.decisions)),
+                "blocked_amount": self.blocked_amount,
+                "agreement": self.agreed / decided if decided else None,
+                "latency_p50": p50,
+                "latency_p95": p95,
+                "latency_p99": p99,
+                "latency_samples": self.latency.count,
+            }
+
+
+# Function to format a latency in seconds for a metric card
+def format_latency(seconds):
+    if seconds is None:
+        return "—"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f}µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f}ms"
+    return f"{seconds:.2f}s"
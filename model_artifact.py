@@ -0,0 +1,277 @@
+# model_artifact.py
+"""FraudGuard model artifact (.fgm) reader and writer.
+
+Layout of a .fgm file:
+
+    8 bytes   magic b"FGMODEL\\0"
+    4 bytes   format version (uint32, little endian)
+    4 bytes   header length in bytes (uint32, little endian)
+    header    UTF-8 JSON: model metadata plus an "arrays" index of
+              {name: {"dtype", "shape", "offset"}}
+    data      raw little-endian arrays, each starting on a 64-byte boundary
+
+Loading never executes code (unlike pickle) and the arrays are NumPy views on
+a read-only memory map, so every process that loads the same file shares one
+copy of its pages through the OS page cache.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+MAGIC = b"FGMODEL\0"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+PREAMBLE = struct.Struct("<8sII")
+
+# Only plain numeric dtypes may be stored (no object arrays)
+ALLOWED_DTYPES = {"<f4", "<f8", "<i2", "<i4", "<i8", "|i1", "|u1", "<u2", "<u4", "<u8", "|b1"}
+
+# Feature order used by the model (V1-V28, Amount, Time)
+FEATURE_ORDER = tuple(f"V{i}" for i in range(1, 29)) + ("Amount", "Time")
+
+# Threshold names in ascending order
+THRESHOLD_NAMES = ("low_risk", "medium_risk", "high_risk", "critical")
+
+
+class ModelArtifact:
+    """A loaded .fgm file: JSON metadata plus memory-mapped arrays"""
+
+    def __init__(self, metadata, arrays, path=None, buffer=None):
+        self.metadata = metadata
+        self.arrays = arrays
+        self.path = path
+        self._buffer = buffer
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __contains__(self, name):
+        return name in self.arrays
+
+    @property
+    def version(self):
+        return self.metadata.get("version")
+
+    @property
+    def feature_order(self):
+        return tuple(self.metadata["feature_order"])
+
+    @property
+    def feature_importance(self):
+        return dict(zip(self.feature_order, self.arrays["feature_importance"].tolist()))
+
+    @property
+    def thresholds(self):
+        names = self.metadata.get("threshold_names", THRESHOLD_NAMES)
+        return dict(zip(names, self.arrays["thresholds"].tolist()))
+
+    def risk_table(self):
+        """Build a RiskTable from the risk tables stored in the artifact"""
+        from scoring_engine import RiskTable
+
+        config = {"thresholds": self.thresholds}
+        tables = self.metadata.get("risk_tables", {})
+        for key, names in tables.items():
+            config[key] = dict(zip(names, self.arrays[key].tolist()))
+        if "unknown_risk" in self.metadata:
+            config["unknown_risk"] = self.metadata["unknown_risk"]
+        if "hour_risk" in self.arrays:
+            config["hour_risk"] = self.arrays["hour_risk"].tolist()
+        return RiskTable.from_config(config)
+
+    def close(self):
+        self.arrays = {}
+        if self._buffer is not None:
+            try:
+                self._buffer.close()
+            except BufferError:
+                # Arrays handed out earlier still reference the map; it is
+                # released when the last of them is garbage collected
+                pass
+            self._buffer = None
+
+
+# Function to write metadata and arrays to a .fgm file
+def save_artifact(path, metadata, arrays):
+    index = {}
+    offset = 0
+    blobs = []
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype.byteorder == ">":
+            array = array.astype(array.dtype.newbyteorder("<"))
+        if array.dtype.str not in ALLOWED_DTYPES:
+            raise ValueError(f"array {name!r} has unsupported dtype {array.dtype}")
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        index[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        blobs.append((offset, array))
+        offset += array.nbytes
+
+    header = json.dumps(dict(metadata, arrays=index)).encode("utf-8")
+    data_start = -(-(PREAMBLE.size + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    # Write to a temporary file first so readers never see a half-written artifact
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for blob_offset, array in blobs:
+            f.seek(data_start + blob_offset)
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+# Function to load a .fgm file with memory-mapped arrays
+def load_artifact(path):
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < PREAMBLE.size:
+            raise ValueError(f"{path} is not a FraudGuard model artifact")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, header_length = PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        buffer.close()
+        raise ValueError(f"{path} is not a FraudGuard model artifact")
+    if version > FORMAT_VERSION:
+        buffer.close()
+        raise ValueError(f"{path} uses artifact format {version}, this reader supports up to {FORMAT_VERSION}")
+
+    header_end = PREAMBLE.size + header_length
+    metadata = json.loads(bytes(buffer[PREAMBLE.size:header_end]).decode("utf-8"))
+    data_start = -(-header_end // ALIGNMENT) * ALIGNMENT
+
+    arrays = {}
+    for name, spec in metadata.pop("arrays").items():
+        if spec["dtype"] not in ALLOWED_DTYPES:
+            buffer.close()
+            raise ValueError(f"array {name!r} has unsupported dtype {spec['dtype']}")
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        start = data_start + spec["offset"]
+        if start + count * dtype.itemsize > size:
+            buffer.close()
+            raise ValueError(f"array {name!r} runs past the end of {path}")
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=start).reshape(spec["shape"])
+    return ModelArtifact(metadata, arrays, path, buffer)
+
+
+# Function to convert create_model.py's metadata dict into artifact metadata and arrays
+def model_data_to_artifact(model_data, risk_table=None):
+    from scoring_engine import DEFAULT_RISK_TABLE
+
+    risk_table = DEFAULT_RISK_TABLE if risk_table is None else risk_table
+    features = model_data.get("features", {})
+    feature_order = [name for name in FEATURE_ORDER if name in features] or list(FEATURE_ORDER)
+    thresholds = model_data.get("thresholds", {})
+    threshold_names = [name for name in THRESHOLD_NAMES if name in thresholds]
+
+    metadata = {key: value for key, value in model_data.items() if key not in ("features", "thresholds")}
+    metadata.update({
+        "feature_order": feature_order,
+        "feature_descriptions": [features.get(name, {}).get("description", "") for name in feature_order],
+        "threshold_names": threshold_names,
+        "risk_tables": {
+            "payment_risks": list(risk_table.payment_methods),
+            "merchant_risks": list(risk_table.merchants),
+            "device_risks": list(risk_table.device_types),
+        },
+        "unknown_risk": risk_table.unknown_risk,
+    })
+    arrays = {
+        "feature_importance": np.array([features.get(name, {}).get("importance", 0.0) for name in feature_order]),
+        "thresholds": np.array([thresholds[name] for name in threshold_names], dtype=np.float64),
+        "payment_risks": np.array(risk_table.payment_risk[:-1]),
+        "merchant_risks": np.array(risk_table.merchant_risk[:-1]),
+        "device_risks": np.array(risk_table.device_risk[:-1]),
+        "hour_risk": np.array(risk_table.hour_risk),
+    }
+    return metadata, arrays
+
+
+# Function to save create_model.py's metadata dict as a .fgm artifact
+def save_model_artifact(path, model_data, risk_table=None, extra_arrays=None):
+    metadata, arrays = model_data_to_artifact(model_data, risk_table)
+    arrays.update(extra_arrays or {})
+    save_artifact(path, metadata, arrays)
+
+
+# Function to rewrite an artifact with metadata and arrays added or replaced (atomically, like save_artifact)
+def update_artifact(path, metadata=None, arrays=None):
+    artifact = load_artifact(path)
+    try:
+        merged_metadata = dict(artifact.metadata, **(metadata or {}))
+        merged_arrays = {name: np.array(array) for name, array in artifact.arrays.items()}
+    finally:
+        artifact.close()
+    merged_arrays.update(arrays or {})
+    save_artifact(path, merged_metadata, merged_arrays)
+
+
+# Function to rewrite an artifact with new tier thresholds (readers pick it up through ArtifactWatcher)
+def update_thresholds(path, thresholds):
+    from scoring_engine import RiskTiers
+
+    names = [name for name in THRESHOLD_NAMES if name in thresholds]
+    values = RiskTiers([thresholds[name] for name in names]).thresholds
+    update_artifact(path, {"threshold_names": names}, {"thresholds": np.array(values, dtype=np.float64)})
+
+
+class ArtifactWatcher:
+    """RiskTable of a .fgm file that is reloaded when the file is replaced.
+
+    current() stats the file at most once per check_interval seconds and
+    rebuilds the table (risk tables and tier thresholds) when its mtime, size
+    or inode changed; callers keep using the previous table until the new one
+    is complete, and a file that fails to load leaves the previous table in
+    place with the exception in .error. Without a loadable file the default
+    table is used.
+    """
+
+    def __init__(self, path, check_interval=1.0, clock=time.monotonic):
+        from scoring_engine import DEFAULT_RISK_TABLE
+
+        self.path = path
+        self.check_interval = check_interval
+        self.clock = clock
+        self.table = DEFAULT_RISK_TABLE
+        self.reloads = 0
+        self.error = None
+        self._signature = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.check()
+
+    def current(self):
+        if self.clock() >= self._next_check:
+            self.check()
+        return self.table
+
+    def check(self):
+        """Reload now if the file changed; returns the current table"""
+        with self._lock:
+            self._next_check = self.clock() + self.check_interval
+            try:
+                stat = os.stat(self.path)
+                signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+                if signature != self._signature:
+                    artifact = load_artifact(self.path)
+                    try:
+                        table = artifact.risk_table()
+                    finally:
+                        artifact.close()
+                    self.table = table
+                    self._signature = signature
+                    self.reloads += 1
+                    self.error = None
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, KeyError) as exc:
+                self.error = exc
+        return self.table
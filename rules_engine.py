@@ -0,0 +1,460 @@
+# rules_engine.py
+"""Allow/deny lists and per-merchant risks compiled into hashed lookups.
+
+    python rules_engine.py compile --deny-cards deny.csv --merchant-risk merchants.csv --output rules.fgm
+    python rules_engine.py info rules.fgm
+    python rules_engine.py lookup rules.fgm --card CARD-0001 --merchant "Corner Shop"
+
+Every list (LISTS) is compiled into a HashedKeys: the 64-bit hashes of its
+keys sorted into one array, a directory of offsets by the top hash bits (the
+expected bucket holds about one entry, so a lookup is O(1) however long the
+list is) and a Bloom filter in front. The filter is about 1.2 bytes per
+entry, small enough to stay in cache, so the common case - a card that is on
+no list - is answered from a few bit tests without touching the hash array.
+Lists with values (merchant_risk) store them in a parallel float64 array.
+Keys are never stored; two keys would have to share a 64-bit hash to be
+confused (about n / 2**64 per lookup).
+
+A compiled rule set is a .fgm artifact (see model_artifact), so opening it
+memory-maps the arrays and processes share their pages. RulesWatcher swaps
+in a new RuleSet only once the rewritten file has loaded completely; callers
+holding the previous one keep a valid map of the old file.
+
+Decisions: a card on allow_cards is never denied; otherwise a card, device
+or merchant on its deny list makes the action "deny" (scored as 0.95, the
+score cap). merchant_risk replaces the rule table's merchant term, so a
+merchant no longer has to fall back to "Other" to get a risk.
+"""
+import argparse
+import collections
+import math
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from model_artifact import load_artifact, save_artifact
+
+RULES_KIND = "rule_set"
+
+# List name -> whether its entries carry a risk value
+LISTS = {
+    "allow_cards": False,
+    "deny_cards": False,
+    "deny_devices": False,
+    "deny_merchants": False,
+    "merchant_risk": True,
+}
+
+DEFAULT_BLOOM_FALSE_POSITIVE_RATE = 0.01
+# Bloom bits are taken 6 at a time from the low hash bits and the word from the bits above them
+MAX_BLOOM_HASHES = 7
+BLOOM_WORD_SHIFT = 6 * MAX_BLOOM_HASHES
+DEFAULT_CHECK_INTERVAL = 1.0
+# Directory buckets per entry (rounded to a power of two)
+BUCKETS_PER_ENTRY = 0.5
+DENY_SCORE = 0.95
+
+HASH_MASK = 2 ** 64 - 1
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+FINALIZER_1 = 0xFF51AFD7ED558CCD
+FINALIZER_2 = 0xC4CEB9FE1A85EC53
+
+RuleVerdict = collections.namedtuple("RuleVerdict", "action reasons merchant_risk")
+
+
+# Function to get the 64-bit hash of a list key (stable across processes, unlike hash())
+def key_hash(key):
+    """Multiply-xorshift over the UTF-8 bytes 8 at a time, then the murmur3 finalizer.
+
+    Defined word by word so that key_hashes() computes the same values for a
+    whole column with NumPy.
+    """
+    data = str(key).encode("utf-8")
+    size = len(data)
+    value = size * HASH_MULTIPLIER & HASH_MASK
+    for word in memoryview(data.ljust(size + (-size & 7), b"\0")).cast("Q"):
+        value = (value ^ word) * HASH_MULTIPLIER & HASH_MASK
+        value ^= value >> 32
+    value = (value ^ (value >> 33)) * FINALIZER_1 & HASH_MASK
+    value = (value ^ (value >> 33)) * FINALIZER_2 & HASH_MASK
+    return value ^ (value >> 33)
+
+
+# Function to hash many keys into a uint64 array (vectorized key_hash)
+def key_hashes(keys):
+    data = _encode_keys(keys)
+    width = -(-max(data.dtype.itemsize, 1) // 8) * 8
+    data = data.astype(f"S{width}")
+    sizes = np.char.str_len(data).astype(np.uint64)
+    words = data.view("<u8").reshape(len(data), width // 8)
+    multiplier = np.uint64(HASH_MULTIPLIER)
+    values = sizes * multiplier
+    word_counts = (sizes + np.uint64(7)) // np.uint64(8)
+    for column in range(width // 8):
+        mixed = (values ^ words[:, column]) * multiplier
+        mixed ^= mixed >> np.uint64(32)
+        # Shorter keys stop mixing at their own last word
+        values = np.where(np.uint64(column) < word_counts, mixed, values)
+    shift = np.uint64(33)
+    values = (values ^ (values >> shift)) * np.uint64(FINALIZER_1)
+    values = (values ^ (values >> shift)) * np.uint64(FINALIZER_2)
+    return values ^ (values >> shift)
+
+
+# Function to get keys as a fixed-width UTF-8 bytes array
+def _encode_keys(keys):
+    array = np.asarray(keys)
+    if len(array) == 0:
+        return np.zeros(0, dtype="S8")
+    if array.dtype.kind == "S":
+        return array
+    array = array.astype(str)
+    codes = array.view(np.uint32).reshape(len(array), -1)
+    if codes.size == 0 or codes.max() < 128:
+        # ASCII: narrow the UCS-4 code points to bytes without a per-key encode
+        return codes.astype(np.uint8).view(f"S{max(codes.shape[1], 1)}").ravel()
+    return np.char.encode(array, "utf-8")
+
+
+class HashedKeys:
+    """Sorted 64-bit key hashes with a bucket directory, a Bloom filter and optional values"""
+
+    def __init__(self, hashes, directory, bloom, bloom_hashes, values=None):
+        self.hashes = hashes
+        self.directory = directory
+        self.bloom = bloom
+        self.bloom_hashes = bloom_hashes
+        self.values = values
+        self.shift = 64 - int(math.log2(len(directory) - 1))
+        self._bloom_shifts = tuple(range(0, 6 * bloom_hashes, 6))
+        # memoryviews index to plain ints several times faster than NumPy scalars
+        self._hash_view = memoryview(hashes).cast("B").cast("Q")
+        self._directory_view = memoryview(directory).cast("B").cast("I")
+        self._bloom_view = memoryview(bloom).cast("B").cast("Q")
+        self._value_view = None if values is None else memoryview(values).cast("B").cast("d")
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @classmethod
+    def build(cls, keys, values=None, false_positive_rate=DEFAULT_BLOOM_FALSE_POSITIVE_RATE):
+        hashes = key_hashes(keys)
+        order = np.argsort(hashes, kind="stable")
+        hashes = hashes[order]
+        if values is not None:
+            values = np.asarray(values, dtype=np.float64)[order]
+        # Duplicate keys: the last occurrence wins
+        last = np.append(hashes[1:] != hashes[:-1], True) if len(hashes) else np.zeros(0, dtype=bool)
+        if values is not None and len(hashes):
+            runs = np.concatenate(([0], np.flatnonzero(last[:-1]) + 1))
+            values = values[np.append(runs[1:], len(hashes)) - 1]
+        hashes = hashes[last]
+
+        n = len(hashes)
+        directory_bits = max(1, math.ceil(math.log2(max(n * BUCKETS_PER_ENTRY, 2))))
+        buckets = hashes >> np.uint64(64 - directory_bits)
+        directory = np.searchsorted(buckets, np.arange(2 ** directory_bits + 1, dtype=np.uint64)).astype(np.uint32)
+
+        bits_per_entry = -math.log(false_positive_rate) / math.log(2) ** 2
+        words = max(1, math.ceil(max(n, 1) * bits_per_entry / 64))
+        bloom_hashes = min(MAX_BLOOM_HASHES, max(1, round(bits_per_entry * math.log(2))))
+        bloom = np.zeros(words, dtype=np.uint64)
+        word_index, masks = _bloom_words(hashes, bloom_hashes, words)
+        np.bitwise_or.at(bloom, word_index, masks)
+        return cls(hashes, directory, bloom, bloom_hashes, values)
+
+    def find_hash(self, value):
+        """Row of a key_hash() value in the hash array, or -1"""
+        # Blocked Bloom filter: all bloom_hashes bits of a key sit in one 64-bit word; about half of a
+        # word's bits are set, so most absent keys fail within the first two tests
+        word = self._bloom_view[(value >> BLOOM_WORD_SHIFT) % len(self._bloom_view)]
+        for shift in self._bloom_shifts:
+            if not word >> (value >> shift & 63) & 1:
+                return -1
+        bucket = value >> self.shift
+        hashes = self._hash_view
+        for row in range(self._directory_view[bucket], self._directory_view[bucket + 1]):
+            if hashes[row] == value:
+                return row
+        return -1
+
+    def find(self, key):
+        """Row of key in the hash array, or -1"""
+        return self.find_hash(key_hash(key))
+
+    def __contains__(self, key):
+        return self.find(key) >= 0
+
+    def get(self, key, default=None):
+        row = self.find(key)
+        return default if row < 0 else self._value_view[row]
+
+    def get_hash(self, value, default=None):
+        row = self.find_hash(value)
+        return default if row < 0 else self._value_view[row]
+
+    def find_many(self, keys):
+        """find() for an array of keys; -1 where absent"""
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        if len(keys) and len(self.hashes):
+            hashes = key_hashes(keys)
+            word_index, masks = _bloom_words(hashes, self.bloom_hashes, len(self.bloom))
+            candidates = self.bloom[word_index] & masks == masks
+            found = np.searchsorted(self.hashes, hashes[candidates]).clip(max=len(self.hashes) - 1)
+            matched = self.hashes[found] == hashes[candidates]
+            rows[np.flatnonzero(candidates)[matched]] = found[matched]
+        return rows
+
+    def contains_many(self, keys):
+        return self.find_many(keys) >= 0
+
+    def get_many(self, keys, default=np.nan):
+        if self.values is None:
+            raise TypeError("this list has no values")
+        rows = self.find_many(keys)
+        result = np.full(len(rows), default, dtype=np.float64)
+        found = rows >= 0
+        result[found] = self.values[rows[found]]
+        return result
+
+    def memory(self):
+        """Bytes held by each part and per entry"""
+        parts = {"hashes": self.hashes.nbytes, "directory": self.directory.nbytes, "bloom": self.bloom.nbytes,
+                 "values": 0 if self.values is None else self.values.nbytes}
+        total = sum(parts.values())
+        return dict(parts, entries=len(self), total=total, per_entry=total / len(self) if len(self) else 0.0)
+
+
+# Function to get the Bloom filter word and bit mask of every hash (vectorized HashedKeys.find_hash)
+def _bloom_words(hashes, count, words):
+    masks = np.zeros(len(hashes), dtype=np.uint64)
+    bits = hashes.copy()
+    for _ in range(count):
+        masks |= np.uint64(1) << (bits & np.uint64(63))
+        bits >>= np.uint64(6)
+    return (hashes >> np.uint64(BLOOM_WORD_SHIFT)) % np.uint64(words), masks
+
+
+class RuleSet:
+    """Compiled LISTS, usually memory-mapped from a .fgm artifact"""
+
+    def __init__(self, lists, metadata=None):
+        self.lists = lists
+        self.metadata = dict(metadata or {})
+        self._artifact = None
+        for name in LISTS:
+            setattr(self, name, lists.get(name))
+
+    @classmethod
+    def build(cls, entries, false_positive_rate=DEFAULT_BLOOM_FALSE_POSITIVE_RATE):
+        """entries maps list names to keys (or, for merchant_risk, a {key: risk} mapping)"""
+        lists = {}
+        for name, keys in entries.items():
+            if name not in LISTS:
+                raise ValueError(f"unknown list {name!r}; expected one of {', '.join(LISTS)}")
+            if LISTS[name]:
+                lists[name] = HashedKeys.build(list(keys), list(keys.values()), false_positive_rate)
+            else:
+                lists[name] = HashedKeys.build(list(keys), None, false_positive_rate)
+        return cls(lists, {"kind": RULES_KIND, "created": time.strftime("%Y-%m-%dT%H:%M:%S")})
+
+    @classmethod
+    def load(cls, path):
+        artifact = load_artifact(path)
+        if artifact.metadata.get("kind") != RULES_KIND:
+            artifact.close()
+            raise ValueError(f"{path} is not a compiled rule set")
+        lists = {}
+        for name, spec in artifact.metadata["lists"].items():
+            lists[name] = HashedKeys(artifact[f"{name}_hashes"], artifact[f"{name}_directory"],
+                                     artifact[f"{name}_bloom"], spec["bloom_hashes"],
+                                     artifact[f"{name}_values"] if f"{name}_values" in artifact else None)
+        rules = cls(lists, artifact.metadata)
+        rules._artifact = artifact
+        return rules
+
+    def save(self, path):
+        metadata = dict(self.metadata, kind=RULES_KIND, lists={})
+        arrays = {}
+        for name, keys in self.lists.items():
+            metadata["lists"][name] = {"entries": len(keys), "bloom_hashes": keys.bloom_hashes}
+            arrays[f"{name}_hashes"] = keys.hashes
+            arrays[f"{name}_directory"] = keys.directory
+            arrays[f"{name}_bloom"] = keys.bloom
+            if keys.values is not None:
+                arrays[f"{name}_values"] = keys.values
+        save_artifact(path, metadata, arrays)
+
+    def evaluate(self, card_id=None, merchant=None, device_id=None):
+        """RuleVerdict(action "allow"/"deny"/None, matched list names, listed merchant risk or None)"""
+        # Each key is hashed once and looked up in every list that holds its kind of key
+        card_hash = None if card_id is None else key_hash(card_id)
+        merchant_hash = None if merchant is None else key_hash(merchant)
+        reasons = []
+        if card_hash is not None and self.allow_cards is not None and self.allow_cards.find_hash(card_hash) >= 0:
+            reasons.append("allow_cards")
+        else:
+            device_hash = None if device_id is None else key_hash(device_id)
+            for name, value in (("deny_cards", card_hash), ("deny_devices", device_hash),
+                                ("deny_merchants", merchant_hash)):
+                keys = self.lists.get(name)
+                if value is not None and keys is not None and keys.find_hash(value) >= 0:
+                    reasons.append(name)
+        merchant_risk = None
+        if merchant_hash is not None and self.merchant_risk is not None:
+            merchant_risk = self.merchant_risk.get_hash(merchant_hash)
+        action = None
+        if reasons:
+            action = "allow" if reasons[0] == "allow_cards" else "deny"
+        return RuleVerdict(action, reasons, merchant_risk)
+
+    def evaluate_many(self, card_ids=None, merchants=None, device_ids=None, size=None):
+        """(denied bool array, merchant risks with NaN where unlisted) for whole columns"""
+        size = len(next(keys for keys in (card_ids, merchants, device_ids) if keys is not None)) if size is None \
+            else size
+        denied = np.zeros(size, dtype=bool)
+        for name, keys in (("deny_cards", card_ids), ("deny_devices", device_ids), ("deny_merchants", merchants)):
+            if keys is not None and self.lists.get(name) is not None:
+                denied |= self.lists[name].contains_many(keys)
+        if card_ids is not None and self.allow_cards is not None:
+            denied &= ~self.allow_cards.contains_many(card_ids)
+        merchant_risks = np.full(size, np.nan)
+        if merchants is not None and self.merchant_risk is not None:
+            merchant_risks = self.merchant_risk.get_many(merchants)
+        return denied, merchant_risks
+
+    def memory(self):
+        """Per-list memory (see HashedKeys.memory) plus the total in bytes"""
+        lists = {name: keys.memory() for name, keys in self.lists.items()}
+        return {"lists": lists, "total": sum(part["total"] for part in lists.values())}
+
+    def close(self):
+        if self._artifact is not None:
+            self._artifact.close()
+            self._artifact = None
+
+
+class RulesWatcher:
+    """RuleSet of a compiled .fgm file that is reloaded when the file is replaced.
+
+    Works like model_artifact.ArtifactWatcher: current() stats the file at
+    most once per check_interval seconds, the new RuleSet replaces the old one
+    in a single assignment once it has loaded, and a file that fails to load
+    leaves the previous rules in place with the exception in .error.
+    """
+
+    def __init__(self, path, check_interval=DEFAULT_CHECK_INTERVAL, clock=time.monotonic):
+        self.path = path
+        self.check_interval = check_interval
+        self.clock = clock
+        self.rules = None
+        self.reloads = 0
+        self.error = None
+        self._signature = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.check()
+
+    def current(self):
+        if self.clock() >= self._next_check:
+            self.check()
+        return self.rules
+
+    def check(self):
+        """Reload now if the file changed; returns the current rules"""
+        with self._lock:
+            self._next_check = self.clock() + self.check_interval
+            try:
+                stat = os.stat(self.path)
+                signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+                if signature != self._signature:
+                    # The previous RuleSet is not closed: callers may still hold it, and
+                    # its map is released when the last of them lets go
+                    self.rules = RuleSet.load(self.path)
+                    self._signature = signature
+                    self.reloads += 1
+                    self.error = None
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, KeyError) as exc:
+                self.error = exc
+        return self.rules
+
+
+# Function to read a list file: one key per row in the first column (and a risk in the second for value lists)
+def read_list(path, with_values=False):
+    import pandas as pd
+
+    frame = pd.read_csv(path, dtype={0: str}, keep_default_na=False)
+    keys = frame.iloc[:, 0].astype(str).tolist()
+    if not with_values:
+        return keys
+    if frame.shape[1] < 2:
+        raise ValueError(f"{path} needs a second column with the risk of each key")
+    return dict(zip(keys, frame.iloc[:, 1].astype(float).tolist()))
+
+
+# Function to format a byte count
+def format_bytes(count):
+    for unit in ("B", "KiB", "MiB"):
+        if count < 1024:
+            return f"{count:,.1f} {unit}"
+        count /= 1024
+    return f"{count:,.1f} GiB"
+
+
+# Function to print a rule set's memory report
+def print_memory(rules):
+    report = rules.memory()
+    for name, part in report["lists"].items():
+        print(f"{name:>15}: {part['entries']:>11,} entries  {format_bytes(part['total']):>11}  "
+              f"({part['per_entry']:.1f} B/entry; bloom {format_bytes(part['bloom'])})")
+    print(f"{'total':>15}: {format_bytes(report['total'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile and inspect FraudGuard allow/deny lists.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compile_parser = commands.add_parser("compile", help="compile list files into a rule set")
+    for name, with_values in LISTS.items():
+        compile_parser.add_argument(f"--{name.replace('_', '-')}",
+                                    help="CSV of key,risk rows" if with_values else "CSV with one key per row")
+    compile_parser.add_argument("--false-positive-rate", type=float, default=DEFAULT_BLOOM_FALSE_POSITIVE_RATE,
+                                help="Bloom filter false positive rate")
+    compile_parser.add_argument("--output", default="rules.fgm")
+    info = commands.add_parser("info", help="describe a compiled rule set and its memory")
+    info.add_argument("path")
+    lookup = commands.add_parser("lookup", help="evaluate one transaction against a rule set")
+    lookup.add_argument("path")
+    lookup.add_argument("--card")
+    lookup.add_argument("--merchant")
+    lookup.add_argument("--device")
+    args = parser.parse_args(argv)
+
+    if args.command == "compile":
+        start = time.perf_counter()
+        entries = {name: read_list(getattr(args, name), with_values) for name, with_values in LISTS.items()
+                   if getattr(args, name)}
+        if not entries:
+            parser.error("give at least one list file")
+        rules = RuleSet.build(entries, args.false_positive_rate)
+        rules.save(args.output)
+        print(f"compiled {sum(len(keys) for keys in rules.lists.values()):,} entries in "
+              f"{time.perf_counter() - start:.1f}s -> {args.output}")
+        print_memory(rules)
+        return 0
+
+    rules = RuleSet.load(args.path)
+    if args.command == "info":
+        print_memory(rules)
+    else:
+        print(rules.evaluate(args.card, args.merchant, args.device))
+    rules.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# score_cache.py
+"""Bounded LRU/TTL cache for risk scores.
+
+Keys are normalized transaction inputs: exact floats, the category labels
+exactly as the scorer looks them up and the hour bucket of the timestamp (the
+only part of the time the formula uses), so retries of the same payload hit
+while any change that could move the score misses.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from scoring_engine import get_hour
+
+DEFAULT_MAXSIZE = 100_000
+DEFAULT_TTL = 300.0
+
+
+# Function to build a cache key from transaction inputs
+def make_key(amount, v14, v17, payment_method, merchant, device_type="Desktop", timestamp=None, hour=None):
+    return (
+        float(amount), float(v14), float(v17),
+        payment_method, merchant, device_type,
+        get_hour(timestamp) if hour is None else hour,
+    )
+
+
+# Function to build a cache key from a transaction dict (HTTP/stream payloads)
+def make_key_from_dict(transaction):
+    return make_key(
+        transaction["amount"], transaction["v14"], transaction["v17"],
+        transaction.get("payment_method"), transaction.get("merchant"), transaction.get("device_type", "Desktop"),
+        transaction.get("timestamp", transaction.get("Time")),
+    )
+
+
+class ScoreCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at >= self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,309 @@
+# score_file.py
+"""Score a transactions CSV or Parquet file offline.
+
+The input is streamed in fixed-size chunks and every chunk is scored with the
+vectorized risk formula, so peak memory depends on --chunk-size and not on the
+size of the file.
+
+    python score_file.py transactions.csv scores.csv --chunk-size 50000
+
+Time-of-day risk comes from the timestamp column, or the model's Time column
+(seconds offset), of each row. Files with neither are scored with --hour,
+which defaults to the hour at which the run started, so every chunk and shard
+of a run uses the same value.
+
+Every row gets a risk_tier binned by the model's four thresholds (--model,
+default: the built-in thresholds) and the dashboard risk_level
+(LOW/MEDIUM/HIGH) its tier belongs to; both are written as categorical codes,
+not per-row strings.
+--explain adds one contribution_<factor> column per term of the score, taken
+from the same vectorized pass that computes it.
+--fraud-index adds pattern_distance and pattern_similarity columns: the mean
+distance of each row's V1-V28 to its nearest known frauds in a fraud_index.py
+index and the 0-1 similarity derived from it, an extra signal next to the
+score (the score itself is unchanged). The file then needs V1-V28 columns.
+
+With --workers N the chunks (CSV line blocks or Parquet row groups) are parsed
+and scored by a pool of N processes and written back in input order. Parallel
+CSV mode splits on line boundaries, so quoted fields must not contain newlines.
+"""
+import argparse
+import collections
+import io
+import itertools
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from fraud_index import COMPONENTS, FraudIndex
+from scoring_engine import (DEFAULT_RISK_TABLE, FACTORS, RISK_LEVELS, RiskTable, calculate_risk_scores,
+                            get_risk_level_codes)
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+# Input columns understood by the scorer (matched case-insensitively, so the
+# Amount/V14/V17/Time columns of the training data work as-is; an exact-case
+# match is preferred, so a frame with both v14 and V14 is scored on v14)
+SCORING_COLUMNS = ("amount", "v14", "v17", "payment_method", "merchant", "device_type", "timestamp", "time")
+
+# Columns copied to the output when present
+ID_COLUMNS = ("id", "transaction_id")
+
+RISK_LEVEL_LABELS = [level[0] for level in RISK_LEVELS]
+
+
+# Function to check whether a path is a Parquet file
+def is_parquet(path):
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+# Function to read a CSV or Parquet file chunk by chunk
+def iter_chunks(path, chunk_size):
+    if is_parquet(path):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+# Function to split a file into shards that worker processes parse themselves
+def iter_shards(path, chunk_size):
+    if is_parquet(path):
+        import pyarrow.parquet as pq
+
+        for index in range(pq.ParquetFile(path).num_row_groups):
+            yield ("parquet", path, index)
+    else:
+        with open(path, newline="") as f:
+            header = f.readline()
+            while True:
+                lines = list(itertools.islice(f, chunk_size))
+                if not lines:
+                    break
+                yield ("csv", header, "".join(lines))
+
+
+# Function to load one shard from iter_shards as a DataFrame
+def read_shard(shard):
+    kind, source, part = shard
+    if kind == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(source).read_row_group(part).to_pandas()
+    return pd.read_csv(io.StringIO(source + part))
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV or Parquet output file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet_writer = None
+        self.rows = 0
+
+    def write(self, frame):
+        if isinstance(frame, str):
+            # Pre-rendered CSV text (header line included) from a worker process
+            _, _, body = frame.partition("\n")
+            with open(self.path, "w" if self.rows == 0 else "a", newline="") as f:
+                f.write(frame if self.rows == 0 else body)
+            self.rows += body.count("\n")
+            return
+        if is_parquet(self.path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self.parquet_writer is None:
+                self.parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self.parquet_writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="w" if self.rows == 0 else "a", header=self.rows == 0, index=False)
+        self.rows += len(frame)
+
+    def close(self):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+
+
+# Function to map input column names onto the scorer's argument names
+def resolve_columns(columns):
+    """An exact-case column wins (v14 over the training data's V14); otherwise exactly one case-insensitive match"""
+    names = [str(name) for name in columns]
+    by_lower = collections.defaultdict(list)
+    for name, original in zip(names, columns):
+        by_lower[name.lower()].append(original)
+    resolved = {}
+    for key in SCORING_COLUMNS:
+        if key in names:
+            resolved[key] = columns[names.index(key)]
+        elif len(by_lower[key]) > 1:
+            raise ValueError(f"ambiguous {key} column: {', '.join(map(str, by_lower[key]))}")
+        elif by_lower[key]:
+            resolved[key] = by_lower[key][0]
+    return resolved
+
+
+# Function to score one chunk and build the output frame
+def score_chunk(chunk, table=None, hour=None, explain=False, fraud_index=None):
+    columns = resolve_columns(chunk.columns)
+    missing = [name for name in ("amount", "v14", "v17") if name not in columns]
+    if missing:
+        raise ValueError(f"input is missing required columns: {', '.join(missing)}")
+
+    def column(name, default=None):
+        return chunk[columns[name]].to_numpy() if name in columns else default
+
+    result = calculate_risk_scores(
+        column("amount"),
+        column("v14"),
+        column("v17"),
+        column("payment_method"),
+        column("merchant"),
+        column("device_type", "Desktop"),
+        column("timestamp", column("time")),
+        table=table,
+        hour=hour,
+        explain=explain,
+    )
+    scores, contributions = result if explain else (result, None)
+    table = DEFAULT_RISK_TABLE if table is None else table
+
+    output = pd.DataFrame({name: chunk[name].to_numpy() for name in ID_COLUMNS if name in chunk.columns})
+    output["risk_score"] = scores
+    output["risk_level"] = pd.Categorical.from_codes(get_risk_level_codes(scores, table), RISK_LEVEL_LABELS)
+    output["risk_tier"] = table.tiers.labels(table.tiers.classify(scores))
+    if explain:
+        for index, factor in enumerate(FACTORS):
+            output[f"contribution_{factor}"] = contributions[:, index]
+    if fraud_index is not None:
+        missing = [name for name in COMPONENTS if name not in chunk.columns]
+        if missing:
+            raise ValueError(f"--fraud-index needs V1-V28 columns; input is missing {', '.join(missing)}")
+        distances, similarities = fraud_index.pattern_risks(chunk[list(COMPONENTS)].to_numpy(np.float32))
+        output["pattern_distance"] = distances
+        output["pattern_similarity"] = similarities
+    return output
+
+
+# Compiled risk table, fallback hour, explain flag and fraud index of a worker process, sent once by the pool
+# initializer (the index as a path, memory-mapped by each worker)
+_worker_table = None
+_worker_hour = None
+_worker_explain = False
+_worker_index = None
+
+
+def _init_worker(table, hour, explain=False, fraud_index_path=None):
+    global _worker_table, _worker_hour, _worker_explain, _worker_index
+    _worker_table = table
+    _worker_hour = hour
+    _worker_explain = explain
+    _worker_index = FraudIndex.load(fraud_index_path) if fraud_index_path else None
+
+
+def _score_shard(shard, csv_output):
+    output = score_chunk(read_shard(shard), _worker_table, _worker_hour, _worker_explain, _worker_index)
+    return output.to_csv(index=False) if csv_output else output
+
+
+# Function to get the peak resident memory of this process in MB
+def peak_memory_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# Function to score shards on a process pool, yielding results in input order
+def _iter_parallel(input_path, output_path, chunk_size, workers, table, hour, explain=False, fraud_index_path=None):
+    csv_output = not is_parquet(output_path)
+    initargs = (table, hour, explain, fraud_index_path)
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs) as pool:
+        # Bounded number of shards in flight keeps memory flat
+        pending = collections.deque()
+        for shard in iter_shards(input_path, chunk_size):
+            pending.append(pool.submit(_score_shard, shard, csv_output))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def score_file(input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE, quiet=False, workers=1, table=None,
+               hour=None, explain=False, fraud_index_path=None):
+    """Stream input_path through the scorer into output_path and return the row count"""
+    table = DEFAULT_RISK_TABLE if table is None else table
+    hour = datetime.now().hour if hour is None else hour
+    fraud_index = None
+    if workers > 1:
+        results = _iter_parallel(input_path, output_path, chunk_size, workers, table, hour, explain, fraud_index_path)
+    else:
+        fraud_index = FraudIndex.load(fraud_index_path) if fraud_index_path else None
+        results = (score_chunk(chunk, table, hour, explain, fraud_index)
+                   for chunk in iter_chunks(input_path, chunk_size))
+
+    writer = ChunkWriter(output_path)
+    start = time.perf_counter()
+    try:
+        for result in results:
+            writer.write(result)
+            if not quiet:
+                elapsed = time.perf_counter() - start
+                print(f"  {writer.rows:,} rows  {writer.rows / elapsed:,.0f} rows/s", file=sys.stderr)
+    finally:
+        writer.close()
+        if fraud_index is not None:
+            fraud_index.close()
+
+    elapsed = time.perf_counter() - start
+    if not quiet:
+        print(f"✅ Scored {writer.rows:,} rows in {elapsed:.2f}s "
+              f"({writer.rows / max(elapsed, 1e-9):,.0f} rows/s, peak memory {peak_memory_mb():.0f} MB)")
+    return writer.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a transactions CSV/Parquet file with the FraudGuard risk formula.")
+    parser.add_argument("input", help="transactions file (.csv or .parquet)")
+    parser.add_argument("output", help="where to write scores (.csv or .parquet)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per chunk")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes for parallel scoring (0 = one per CPU)")
+    parser.add_argument("--hour", type=int, choices=range(24), metavar="0-23",
+                        help="hour of day for rows without a timestamp/Time column (default: now)")
+    parser.add_argument("--model", help="model artifact (.fgm) whose risk tables and thresholds to use")
+    parser.add_argument("--explain", action="store_true", help="add a contribution column per score factor")
+    parser.add_argument("--fraud-index", help="fraud_index.py index (.fgm) to add pattern similarity columns from")
+    parser.add_argument("--quiet", action="store_true", help="only print errors")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.input):
+        parser.error(f"input file not found: {args.input}")
+    if args.chunk_size <= 0:
+        parser.error("--chunk-size must be positive")
+    if args.workers < 0:
+        parser.error("--workers must be 0 or positive")
+    if args.model and not os.path.exists(args.model):
+        parser.error(f"model file not found: {args.model}")
+    if args.fraud_index and not os.path.exists(args.fraud_index):
+        parser.error(f"fraud index file not found: {args.fraud_index}")
+    if args.fraud_index:
+        try:
+            FraudIndex.load(args.fraud_index).close()
+        except ValueError as error:
+            parser.error(str(error))
+    workers = args.workers or os.cpu_count() or 1
+    table = RiskTable.from_model(args.model) if args.model else None
+    score_file(args.input, args.output, args.chunk_size, args.quiet, workers, table, args.hour, args.explain,
+               args.fraud_index)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+# score_server.py
+"""Asyncio HTTP scoring service.
+
+    python score_server.py --port 8080 --window-ms 2 --max-batch 64
+
+POST /score with a JSON transaction (amount, v14, v17, payment_method,
+merchant, device_type and optionally timestamp or Time) returns
+{"risk_score": ..., "risk_level": ..., "risk_tier": ...}. Concurrent requests are collected into micro-batches and each batch is scored
+with one vectorized calculate_risk_scores call; repeated payloads (client
+retries) are answered from an LRU/TTL ScoreCache without being rescored.
+With --model the risk tables and tier thresholds come from a .fgm artifact
+that is watched for changes, so rewriting it (e.g. with
+model_artifact.update_thresholds) takes effect without a restart.
+If the artifact holds a drift reference profile (see drift_monitor.py),
+every scored batch also feeds a DriftMonitor whose alerts are printed and
+whose PSI/KS figures are part of GET /health. --rules loads compiled
+allow/deny lists and merchant risks (see rules_engine.py), also reloaded
+when the file is replaced; denied transactions get "rule": "deny".
+Malformed transactions (missing, non-numeric or non-finite amount/v14/v17,
+non-string labels) get a 400; if a batch still fails to score, its
+transactions are rescored one at a time, so only the failing one gets an
+error (a 500).
+--shadow NAME=PATH (repeatable) scores every batch with challenger artifacts
+as well, off the latency path (see shadow_scoring.py): responses carry only
+the champion's scores, and the challengers' are logged to --shadow-log.
+--shadow-sample-rate shadow-scores only that fraction of the batches, which
+caps what the challengers cost the champion's p99.
+GET /health reports batching and cache statistics, GET /metrics the stage
+timings and counters in Prometheus text format and GET /profile the sampling
+profiler's collapsed stacks (start it with --profile-interval).
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+
+import instrumentation
+from drift_monitor import DriftMonitor, load_profile, print_alert, same_profile
+from instrumentation import INSTRUMENTATION, clock, start_profiler
+from model_artifact import ArtifactWatcher
+from rules_engine import DENY_SCORE, RulesWatcher
+from score_cache import DEFAULT_TTL, ScoreCache, make_key_from_dict
+from shadow_scoring import (DEFAULT_MAX_PENDING, DEFAULT_SAMPLE_RATE, DEFAULT_WORKERS, ShadowScorer,
+                            parse_challengers)
+from scoring_engine import (DEFAULT_RISK_TABLE, RISK_LEVELS, RISK_TIERS, calculate_risk_scores, get_hour,
+                            get_risk_level_codes)
+
+DEFAULT_WINDOW_MS = 2.0
+DEFAULT_MAX_BATCH = 64
+DEFAULT_CACHE_SIZE = 100_000
+DEFAULT_SHADOW_LOG = "data/shadow.db"
+MAX_BODY_BYTES = 64 * 1024
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+# Categorical fields of a transaction; each must be a string or missing/null
+LABEL_FIELDS = ("payment_method", "merchant", "device_type", "card_id", "device_id")
+
+
+# Function to reject a transaction dict whose categorical fields are not strings (they are looked up and hashed)
+def check_labels(transaction):
+    for name in LABEL_FIELDS:
+        value = transaction.get(name)
+        if value is not None and not isinstance(value, str):
+            raise TypeError(f"{name} must be a string, got {type(value).__name__}")
+
+
+# Function to score a list of transaction dicts in one vectorized call (fed to the drift monitor when given)
+def score_transactions(transactions, table=None, monitor=None, rules=None):
+    """With a rules_engine.RuleSet, listed merchants get their own risk and denied rows score DENY_SCORE"""
+    start = clock()
+    amount = [float(txn["amount"]) for txn in transactions]
+    v14 = [float(txn["v14"]) for txn in transactions]
+    v17 = [float(txn["v17"]) for txn in transactions]
+    merchants = [txn.get("merchant") for txn in transactions]
+    denied = merchant_risks = None
+    if rules is not None:
+        denied, merchant_risks = rules.evaluate_many([str(txn.get("card_id", "")) for txn in transactions],
+                                                     [str(merchant) for merchant in merchants],
+                                                     [str(txn.get("device_id", "")) for txn in transactions])
+        start = INSTRUMENTATION.since("rules", start)
+    scores = calculate_risk_scores(
+        amount,
+        v14,
+        v17,
+        [txn.get("payment_method") for txn in transactions],
+        merchants,
+        [txn.get("device_type", "Desktop") for txn in transactions],
+        table=table,
+        hour=[get_hour(txn.get("timestamp", txn.get("Time"))) for txn in transactions],
+        merchant_risks=merchant_risks,
+    )
+    if denied is not None and denied.any():
+        scores[denied] = DENY_SCORE
+        INSTRUMENTATION.inc("rule_denied", int(denied.sum()), help="Transactions denied by an allow/deny list.")
+    start = INSTRUMENTATION.since("batch_score", start)
+    if monitor is not None:
+        monitor.observe_batch(amount=amount, v14=v14, v17=v17, risk_score=scores)
+        start = INSTRUMENTATION.since("drift", start)
+    codes = get_risk_level_codes(scores, table)
+    tiers = (DEFAULT_RISK_TABLE if table is None else table).tiers.classify(scores)
+    INSTRUMENTATION.since("classify", start)
+    INSTRUMENTATION.inc("scored", len(transactions), help="Transactions scored.")
+    results = [
+        {"risk_score": float(score), "risk_level": RISK_LEVELS[code][0], "risk_tier": RISK_TIERS[tier][0]}
+        for score, code, tier in zip(scores.tolist(), codes.tolist(), tiers.tolist())
+    ]
+    if denied is not None:
+        for row in denied.nonzero()[0].tolist():
+            results[row]["rule"] = "deny"
+    return results
+
+
+class MicroBatcher:
+    """Collects concurrent submissions and scores them together.
+
+    A batch is flushed when max_batch items are waiting or window_ms has passed
+    since the first item of the batch arrived, whichever comes first.
+    """
+
+    def __init__(self, score_batch=score_transactions, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH):
+        self.score_batch = score_batch
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.items = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            # Take whatever is already queued without waiting
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            remaining = deadline - time.monotonic()
+            if len(batch) >= self.max_batch or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _score_one(self, item):
+        try:
+            return self.score_batch([item])[0], None
+        except Exception as exc:
+            return None, exc
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+            try:
+                outcomes = [(result, None) for result in self.score_batch(items)]
+            except Exception as exc:
+                # Score the items one at a time, so a bad item fails only its own submission
+                outcomes = [self._score_one(item) for item in items] if len(items) > 1 else [(None, exc)]
+            for (_, future), (result, exc) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if exc is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(exc)
+            self.batches += 1
+            self.items += len(batch)
+
+
+class ScoringServer:
+    """Minimal HTTP/1.1 server (keep-alive, Content-Length bodies) around a MicroBatcher"""
+
+    def __init__(self, host="127.0.0.1", port=8080, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH,
+                 table=None, cache_size=DEFAULT_CACHE_SIZE, cache_ttl=DEFAULT_TTL, model_path=None, rules_path=None,
+                 shadow=None):
+        self.host = host
+        self.port = port
+        self.watcher = ArtifactWatcher(model_path) if model_path else None
+        self.rules_watcher = RulesWatcher(rules_path) if rules_path else None
+        self.table = DEFAULT_RISK_TABLE if table is None else table
+        self.rules = None if self.rules_watcher is None else self.rules_watcher.rules
+        self.monitor = DriftMonitor.from_artifact(model_path, on_alert=print_alert) if model_path else None
+        # A ShadowScorer with challenger engine versions; the server closes it
+        self.shadow = shadow
+        self.batcher = MicroBatcher(self._score_batch, window_ms, max_batch)
+        self.cache = ScoreCache(cache_size, cache_ttl) if cache_size > 0 else None
+        if self.watcher is not None:
+            self.table = self.watcher.table
+        self.server = None
+
+    def refresh_table(self):
+        """Pick up a reloaded model artifact; called before every cache lookup"""
+        table = self.watcher.current()
+        if table is not self.table:
+            self.table = table
+            # Only a new reference profile restarts the monitor; other reloads (e.g. threshold updates) keep its
+            # rolling window
+            profile = load_profile(self.watcher.path)
+            if not same_profile(profile, None if self.monitor is None else self.monitor.profile):
+                self.monitor = None if profile is None else DriftMonitor(profile, on_alert=print_alert)
+            if self.cache is not None:
+                # Cached results carry the old tables' scores and tiers
+                self.cache.clear()
+
+    def refresh_rules(self):
+        """Pick up a recompiled rule set; called before every cache lookup"""
+        rules = self.rules_watcher.current()
+        if rules is not self.rules:
+            self.rules = rules
+            if self.cache is not None:
+                self.cache.clear()
+
+    def _score_batch(self, items):
+        results = score_transactions(items, self.table, self.monitor, self.rules)
+        if self.shadow is not None:
+            # Only queued here; challengers score on the shadow pool after the champion's results are returned
+            self.shadow.submit(items, results, self.rules)
+        return results
+
+    async def start(self):
+        self.batcher.start()
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        await self.batcher.stop()
+        if self.shadow is not None:
+            self.shadow.close()
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = (request_line.decode("latin-1").split() + ["", "", ""])[:3]
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "invalid Content-Length"}, close=True)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "request body too large"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, payload = await self._route(method, path, body)
+                except Exception as exc:
+                    # Answer instead of dropping the connection; the client cannot tell a bug from a network error
+                    status, payload = 500, {"error": f"internal error: {type(exc).__name__}: {exc}"}
+                    INSTRUMENTATION.inc("server_errors", help="Requests answered with a 500.")
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, close=not keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body):
+        if path == "/score":
+            if method != "POST":
+                return 405, {"error": "use POST"}
+            start = clock() if next(INSTRUMENTATION.sample) else 0
+            try:
+                transaction = json.loads(body)
+                key = make_key_from_dict(transaction)
+                check_labels(transaction)
+                if not all(math.isfinite(value) for value in key[:3]):
+                    raise ValueError("amount, v14 and v17 must be finite numbers")
+                if self.rules_watcher is not None:
+                    # List verdicts depend on the card and device as well
+                    key += (transaction.get("card_id"), transaction.get("device_id"))
+            except (ValueError, TypeError, KeyError) as exc:
+                return 400, {"error": f"invalid transaction: {exc}"}
+            if start:
+                start = INSTRUMENTATION.since("parse", start)
+            if self.watcher is not None:
+                self.refresh_table()
+            if self.rules_watcher is not None:
+                self.refresh_rules()
+            if self.cache is None:
+                result = await self.batcher.submit(transaction)
+            else:
+                result = self.cache.get(key)
+                if result is None:
+                    result = await self.batcher.submit(transaction)
+                    self.cache.put(key, result)
+            if start:
+                INSTRUMENTATION.since("request", start)
+            return 200, result
+        if path == "/health":
+            batches = self.batcher.batches
+            return 200, {
+                "status": "ok",
+                "batches": batches,
+                "scored": self.batcher.items,
+                "mean_batch_size": self.batcher.items / batches if batches else 0.0,
+                "cache": self.cache.stats() if self.cache is not None else None,
+                "model": None if self.watcher is None else {
+                    "path": self.watcher.path,
+                    "reloads": self.watcher.reloads,
+                    "thresholds": list(self.watcher.table.tiers.thresholds),
+                    "error": None if self.watcher.error is None else str(self.watcher.error),
+                },
+                "drift": None if self.monitor is None else self.monitor.snapshot(),
+                "rules": None if self.rules_watcher is None else {
+                    "path": self.rules_watcher.path,
+                    "reloads": self.rules_watcher.reloads,
+                    "memory_bytes": None if self.rules is None else self.rules.memory()["total"],
+                    "error": None if self.rules_watcher.error is None else str(self.rules_watcher.error),
+                },
+                "shadow": None if self.shadow is None else self.shadow.snapshot(),
+            }
+        if path == "/metrics":
+            return 200, INSTRUMENTATION.render_prometheus()
+        if path == "/profile":
+            profiler = instrumentation.PROFILER
+            return 200, profiler.collapsed() if profiler is not None else "profiler not running\n"
+        return 404, {"error": f"unknown path {path}"}
+
+    async def _respond(self, writer, status, payload, close=False):
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload).encode(), "application/json"
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode() + body)
+        await writer.drain()
+
+
+async def serve(host, port, window_ms, max_batch, cache_size=DEFAULT_CACHE_SIZE, cache_ttl=DEFAULT_TTL,
+                model_path=None, rules_path=None, shadow=None):
+    server = await ScoringServer(host, port, window_ms, max_batch, cache_size=cache_size, cache_ttl=cache_ttl,
+                                 model_path=model_path, rules_path=rules_path, shadow=shadow).start()
+    print(f"🛡️ FraudGuard scoring service on http://{host}:{server.port}/score "
+          f"(window {window_ms} ms, max batch {max_batch})", flush=True)
+    if shadow is not None:
+        print(f"   shadow scoring with {', '.join(shadow.paths)} "
+              f"({'processes' if shadow.processes else 'threads'}), log {shadow.log.path if shadow.log else 'off'}", flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        if shadow is not None:
+            shadow.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the FraudGuard HTTP scoring service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_WINDOW_MS, help="micro-batch window")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="largest micro-batch")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="cached scores (0 disables)")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL, help="seconds a cached score stays valid")
+    parser.add_argument("--model", help="model artifact (.fgm) to score with; reloaded when the file changes")
+    parser.add_argument("--rules", help="compiled allow/deny lists (rules_engine.py compile); reloaded when replaced")
+    parser.add_argument("--shadow", action="append", default=[], metavar="NAME=PATH",
+                        help="challenger model artifact to shadow-score every batch with (repeatable)")
+    parser.add_argument("--shadow-log", default=DEFAULT_SHADOW_LOG,
+                        help="SQLite log of challenger scores (shadow_scoring.py report); empty to keep none")
+    parser.add_argument("--shadow-workers", type=int, default=DEFAULT_WORKERS, help="challenger pool size")
+    parser.add_argument("--shadow-processes", action="store_true",
+                        help="score challengers in worker processes instead of threads")
+    parser.add_argument("--shadow-max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                        help="batches waiting for the challengers before new ones are dropped")
+    parser.add_argument("--shadow-sample-rate", type=float, default=DEFAULT_SAMPLE_RATE,
+                        help="fraction of batches shadow-scored, to cap the challengers' CPU cost (0-1]")
+    parser.add_argument("--profile-interval", type=float, default=None,
+                        help="start the sampling profiler with this interval in seconds (GET /profile)")
+    args = parser.parse_args(argv)
+    try:
+        challengers = parse_challengers(args.shadow)
+    except ValueError as exc:
+        parser.error(str(exc))
+    for name, path in challengers.items():
+        if not os.path.exists(path):
+            parser.error(f"challenger {name} model file not found: {path}")
+    if args.shadow_max_pending < 1:
+        parser.error("--shadow-max-pending must be at least 1")
+    if not 0 < args.shadow_sample_rate <= 1:
+        parser.error("--shadow-sample-rate must be in (0, 1]")
+    if args.profile_interval:
+        start_profiler(args.profile_interval)
+    shadow = None
+    if challengers:
+        shadow = ShadowScorer(challengers, args.shadow_log or None, args.shadow_workers, args.shadow_processes,
+                              args.shadow_max_pending, args.shadow_sample_rate)
+    try:
+        asyncio.run(serve(args.host, args.port, args.window_ms, args.max_batch, args.cache_size, args.cache_ttl,
+                          args.model, args.rules, shadow))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
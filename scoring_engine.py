@@ -0,0 +1,481 @@
+# scoring_engine.py
+"""FraudGuard risk scoring engine.
+
+Shared by the Streamlit dashboard and offline/batch jobs. Importing this module
+only pulls in the standard library: NumPy is loaded on the first batch call, and
+streamlit/pandas are never imported here.
+"""
+import time
+import warnings
+from bisect import bisect_right
+from datetime import datetime
+
+# Risk tables
+PAYMENT_RISKS = {
+    "Credit Card": 0.05,
+    "Debit Card": 0.08,
+    "Digital Wallet": 0.12,
+    "Bank Transfer": 0.15,
+    "Cryptocurrency": 0.25
+}
+
+MERCHANT_RISKS = {
+    "Amazon": 0.05,
+    "Apple": 0.04,
+    "Netflix": 0.03,
+    "Uber": 0.08,
+    "Airbnb": 0.12,
+    "Walmart": 0.06,
+    "Target": 0.05,
+    "Best Buy": 0.06,
+    "Other": 0.15
+}
+
+DEVICE_RISKS = {
+    "Mobile": 0.05,
+    "Desktop": 0.03,
+    "Tablet": 0.06,
+    "Unknown": 0.20
+}
+
+# Risk used for payment methods, merchants and devices missing from the tables
+UNKNOWN_CATEGORY_RISK = 0.10
+
+
+# Function to get the time-of-day risk for an hour (0-23)
+def get_hour_risk(hour):
+    if 0 <= hour < 6:
+        return 0.15
+    elif 6 <= hour < 12:
+        return 0.05
+    elif 12 <= hour < 18:
+        return 0.04
+    else:
+        return 0.08
+
+
+class RiskTable:
+    """Risk tables compiled once and reused for every score.
+
+    Category names are interned to small integer ids (the id equal to the
+    number of categories means "unknown"), so the hot path is plain tuple
+    indexing with no dict building, string hashing or clock reads.
+    """
+
+    def __init__(self, payment_risks=None, merchant_risks=None, device_risks=None,
+                 unknown_risk=UNKNOWN_CATEGORY_RISK, thresholds=None, hour_risk=None):
+        payment_risks = PAYMENT_RISKS if payment_risks is None else payment_risks
+        merchant_risks = MERCHANT_RISKS if merchant_risks is None else merchant_risks
+        device_risks = DEVICE_RISKS if device_risks is None else device_risks
+
+        self.payment_methods = tuple(payment_risks)
+        self.merchants = tuple(merchant_risks)
+        self.device_types = tuple(device_risks)
+        self.payment_ids = {name: code for code, name in enumerate(self.payment_methods)}
+        self.merchant_ids = {name: code for code, name in enumerate(self.merchants)}
+        self.device_ids = {name: code for code, name in enumerate(self.device_types)}
+
+        self.unknown_risk = unknown_risk
+        self.payment_risk = tuple(payment_risks.values()) + (unknown_risk,)
+        self.merchant_risk = tuple(merchant_risks.values()) + (unknown_risk,)
+        self.device_risk = tuple(device_risks.values()) + (unknown_risk,)
+        self.hour_risk = tuple(get_hour_risk(hour) for hour in range(24)) if hour_risk is None else tuple(hour_risk)
+        if len(self.hour_risk) != 24:
+            raise ValueError("hour_risk must have one value per hour of the day")
+        self.thresholds = dict(thresholds or {})
+        self._arrays = None
+        self._tiers = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a table from a dict with optional payment_risks, merchant_risks,
+        device_risks, unknown_risk, thresholds and hour_risk keys."""
+        return cls(
+            payment_risks=config.get("payment_risks"),
+            merchant_risks=config.get("merchant_risks"),
+            device_risks=config.get("device_risks"),
+            unknown_risk=config.get("unknown_risk", UNKNOWN_CATEGORY_RISK),
+            thresholds=config.get("thresholds"),
+            hour_risk=config.get("hour_risk"),
+        )
+
+    @classmethod
+    def from_model(cls, model_data):
+        """Build a table from the model metadata written by create_model.py.
+
+        Accepts the metadata dict itself or a path to a .fgm model artifact.
+        """
+        if not isinstance(model_data, dict):
+            from model_artifact import load_artifact
+
+            artifact = load_artifact(model_data)
+            try:
+                return artifact.risk_table()
+            finally:
+                artifact.close()
+        return cls.from_config(model_data)
+
+    # Functions to intern category names to ids
+    def payment_id(self, payment_method):
+        return self.payment_ids.get(payment_method, len(self.payment_methods))
+
+    def merchant_id(self, merchant):
+        return self.merchant_ids.get(merchant, len(self.merchants))
+
+    def device_id(self, device_type):
+        return self.device_ids.get(device_type, len(self.device_types))
+
+    def score_encoded(self, amount, v14, v17, payment_id, merchant_id, device_id, hour, merchant_risk=None,
+                      device_risk=None):
+        """Fast-path scorer taking pre-encoded category ids and the hour of day.
+
+        merchant_risk / device_risk replace the table's value for the id (e.g.
+        an entry of a rules_engine merchant risk list).
+        """
+        amount_risk = amount / 10000
+        if amount_risk > 0.25:
+            amount_risk = 0.25
+        if merchant_risk is None:
+            merchant_risk = self.merchant_risk[merchant_id]
+        if device_risk is None:
+            device_risk = self.device_risk[device_id]
+        total_risk = (0.05 + amount_risk + v14 * 0.25 + v17 * 0.20
+                      + self.payment_risk[payment_id] + merchant_risk
+                      + device_risk + self.hour_risk[hour])
+        return 0.95 if total_risk > 0.95 else total_risk
+
+    def score(self, amount, v14, v17, payment_method, merchant, device_type, hour):
+        return self.score_encoded(
+            amount, v14, v17,
+            self.payment_ids.get(payment_method, len(self.payment_methods)),
+            self.merchant_ids.get(merchant, len(self.merchants)),
+            self.device_ids.get(device_type, len(self.device_types)),
+            hour,
+        )
+
+    def arrays(self):
+        """NumPy lookup arrays for the batch scorer, built on first use"""
+        if self._arrays is None:
+            import numpy as np
+
+            self._arrays = {
+                "payment": np.array(self.payment_risk),
+                "merchant": np.array(self.merchant_risk),
+                "device": np.array(self.device_risk),
+                "hour": np.array(self.hour_risk),
+            }
+        return self._arrays
+
+    @property
+    def tiers(self):
+        """RiskTiers built from this table's thresholds (the defaults when it has none)"""
+        if self._tiers is None:
+            self._tiers = RiskTiers(self.thresholds or DEFAULT_THRESHOLDS)
+        return self._tiers
+
+
+# Model thresholds (lower bounds of each tier above MINIMAL), as in create_model.py
+DEFAULT_THRESHOLDS = {"low_risk": 0.2, "medium_risk": 0.5, "high_risk": 0.8, "critical": 0.9}
+
+# Risk tiers as (label, color, icon); a score's tier code is the number of thresholds at or below it
+RISK_TIERS = (
+    ("MINIMAL", "#10b981", "🟢"),
+    ("LOW", "#84cc16", "🟢"),
+    ("MEDIUM", "#f59e0b", "🟡"),
+    ("HIGH", "#ef4444", "🔴"),
+    ("CRITICAL", "#991b1b", "⛔"),
+)
+
+
+class RiskTiers:
+    """Ascending score thresholds; classify() bins a whole score array with one searchsorted"""
+
+    def __init__(self, thresholds):
+        values = list(thresholds.values()) if isinstance(thresholds, dict) else list(thresholds)
+        if len(values) != len(RISK_TIERS) - 1:
+            raise ValueError(f"expected {len(RISK_TIERS) - 1} thresholds, got {len(values)}")
+        if any(low >= high for low, high in zip(values, values[1:])):
+            raise ValueError("thresholds must be strictly increasing")
+        self.thresholds = tuple(float(value) for value in values)
+        self._array = None
+
+    def classify(self, scores):
+        """uint8 tier codes (indexes into RISK_TIERS) for an array of scores"""
+        import numpy as np
+
+        if self._array is None:
+            self._array = np.array(self.thresholds)
+        return np.searchsorted(self._array, np.asarray(scores, dtype=np.float64), side="right").astype(np.uint8)
+
+    def classify_one(self, score):
+        """Tier code of a single score"""
+        return bisect_right(self.thresholds, score)
+
+    def labels(self, codes):
+        """Tier codes as a pandas Categorical (codes are stored, not per-row strings)"""
+        import pandas as pd
+
+        return pd.Categorical.from_codes(codes, [tier[0] for tier in RISK_TIERS])
+
+
+# Table used when no other table is passed in
+DEFAULT_RISK_TABLE = RiskTable()
+
+
+# Function to get the hour of day (0-23) of a transaction timestamp
+def get_hour(timestamp):
+    """Hour bucket of a timestamp.
+
+    Numbers are seconds, either the model's Time offset or a Unix time, and are
+    bucketed as (seconds // 3600) % 24 (UTC for Unix times). datetime objects
+    use their own hour and strings are parsed as ISO 8601. None means the
+    current wall-clock hour.
+    """
+    if timestamp is None:
+        return datetime.now().hour
+    if isinstance(timestamp, datetime):
+        return timestamp.hour
+    if isinstance(timestamp, str):
+        return datetime.fromisoformat(timestamp).hour
+    if type(timestamp).__name__ == "datetime64":
+        return int(get_hours([timestamp])[0])
+    return int(float(timestamp) // 3600) % 24
+
+
+# Function to turn a timestamp into Unix seconds (numbers are kept as they are; None means now)
+def get_unix_seconds(timestamp):
+    if timestamp is None:
+        return time.time()
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    if type(timestamp).__name__ == "datetime64":
+        return float(timestamp.astype("datetime64[s]").astype("int64"))
+    return float(timestamp)
+
+
+# Function to get hour-of-day buckets for an array of timestamps (vectorized get_hour)
+def get_hours(timestamps):
+    import numpy as np
+
+    values = np.asarray(timestamps)
+    if values.dtype.kind in "iuf":
+        if values.dtype.kind == "f" and np.isnan(values).any():
+            raise ValueError("timestamps contain missing values")
+        return (np.floor_divide(values, 3600) % 24).astype(np.int8)
+    try:
+        with warnings.catch_warnings():
+            # numpy shifts values with a UTC offset to UTC (and warns); get_hour uses their wall-clock hour
+            warnings.simplefilter("error", UserWarning)
+            seconds = values.astype("datetime64[s]")
+    except UserWarning:
+        flat = values.ravel().tolist()
+        if any(value is None for value in flat):
+            raise ValueError("timestamps contain missing values")
+        return np.array([get_hour(value) for value in flat], dtype=np.int8).reshape(values.shape)
+    if np.isnat(seconds).any():
+        raise ValueError("timestamps contain missing values")
+    return ((seconds.astype(np.int64) // 3600) % 24).astype(np.int8)
+
+
+# Terms of the risk score, in the order they are added up
+FACTORS = ("base", "amount", "v14", "v17", "payment_method", "merchant", "device_type", "time_of_day")
+
+
+# Function to calculate dynamic risk score
+def calculate_risk_score(amount, v14, v17, payment_method, merchant, device_type="Desktop", table=None,
+                         timestamp=None):
+    """Calculate dynamic risk score based on all parameters.
+
+    Pass the transaction's timestamp (or Time offset) to score by its own hour
+    of day; without one the current wall-clock hour is used.
+    """
+    table = DEFAULT_RISK_TABLE if table is None else table
+    return table.score(amount, v14, v17, payment_method, merchant, device_type, get_hour(timestamp))
+
+
+# Risk levels as (label, color, icon), lowest first
+RISK_LEVELS = (
+    ("✅ LOW", "#10b981", "🟢"),
+    ("⚠️ MEDIUM", "#f59e0b", "🟡"),
+    ("🚨 HIGH", "#ef4444", "🔴"),
+)
+
+
+# RISK_LEVELS index of each RISK_TIERS entry: levels follow the table's tier thresholds, so the two always agree
+TIER_LEVELS = (0, 0, 1, 2, 2)
+
+
+# Function to get the RISK_LEVELS index for a score
+def get_risk_level_code(risk_score, table=None):
+    table = DEFAULT_RISK_TABLE if table is None else table
+    return TIER_LEVELS[table.tiers.classify_one(risk_score)]
+
+
+# Function to get risk level and color
+def get_risk_level(risk_score, table=None):
+    return RISK_LEVELS[get_risk_level_code(risk_score, table)]
+
+
+# Function to get RISK_LEVELS indexes for a score array (vectorized get_risk_level)
+def get_risk_level_codes(risk_scores, table=None):
+    import numpy as np
+
+    table = DEFAULT_RISK_TABLE if table is None else table
+    return np.array(TIER_LEVELS, dtype=np.int8)[table.tiers.classify(risk_scores)]
+
+
+# Function to get the lowest score of each risk level above LOW (e.g. for SQL over stored scores)
+def get_risk_level_cutoffs(table=None):
+    table = DEFAULT_RISK_TABLE if table is None else table
+    thresholds = table.tiers.thresholds
+    return tuple(thresholds[TIER_LEVELS.index(level) - 1] for level in range(1, len(RISK_LEVELS)))
+
+
+# Function to turn a column of labels into integer codes (unknown labels get len(categories))
+def encode_categories(values, categories, size=None):
+    import numpy as np
+
+    categories = list(categories)
+    if isinstance(values, str) or values is None:
+        code = categories.index(values) if values in categories else len(categories)
+        return np.full(size, code, dtype=np.int8)
+    uniques, inverse = np.unique(np.asarray(values).astype(str), return_inverse=True)
+    index = {name: code for code, name in enumerate(categories)}
+    lookup = np.array([index.get(name, len(categories)) for name in uniques], dtype=np.int8)
+    return lookup[inverse.ravel()]
+
+
+# Function to calculate risk scores for a whole batch of transactions
+def calculate_risk_scores(amount, v14, v17, payment_method, merchant, device_type="Desktop", timestamp=None,
+                          table=None, hour=None, explain=False, merchant_risks=None, device_risks=None):
+    """Vectorized calculate_risk_score: returns one score per row as a float64 array.
+
+    Categorical arguments may be arrays or a single label applied to every row.
+    timestamp holds one value per row in any form get_hour accepts (Time
+    offsets, Unix seconds, datetimes or ISO strings) and is bucketed in one
+    vectorized pass. Without timestamps every row uses hour (a single hour or
+    an array of hours), falling back to the current hour like the scalar
+    function; pass a fixed hour when results must be reproducible.
+
+    With explain=True it returns (scores, contributions): contributions is an
+    (n, len(FACTORS)) array holding each factor's term of the sum, the same
+    terms the score is added up from, so a row's contributions sum to its
+    score before the 0.95 cap.
+
+    merchant_risks / device_risks are optional per-row risks that replace the
+    table's merchant / device term wherever they are not NaN (e.g. lookups in
+    a rules_engine merchant risk list).
+    """
+    import numpy as np
+
+    amount = np.asarray(amount, dtype=np.float64)
+    v14 = np.asarray(v14, dtype=np.float64)
+    v17 = np.asarray(v17, dtype=np.float64)
+    size = amount.shape[0]
+    table = DEFAULT_RISK_TABLE if table is None else table
+    lookups = table.arrays()
+
+    method_risk = lookups["payment"][encode_categories(payment_method, table.payment_methods, size)]
+    merchant_risk = lookups["merchant"][encode_categories(merchant, table.merchants, size)]
+    device_risk = lookups["device"][encode_categories(device_type, table.device_types, size)]
+    if merchant_risks is not None:
+        merchant_risks = np.asarray(merchant_risks, dtype=np.float64)
+        merchant_risk = np.where(np.isnan(merchant_risks), merchant_risk, merchant_risks)
+    if device_risks is not None:
+        device_risks = np.asarray(device_risks, dtype=np.float64)
+        device_risk = np.where(np.isnan(device_risks), device_risk, device_risks)
+
+    if timestamp is not None:
+        time_risk = lookups["hour"][get_hours(timestamp)]
+    elif hour is not None:
+        time_risk = lookups["hour"][hour]
+    else:
+        time_risk = lookups["hour"][datetime.now().hour]
+
+    if explain:
+        # Column-major so each factor is one contiguous column; the score is summed from these same columns
+        contributions = np.empty((size, len(FACTORS)), order="F")
+        terms = (0.05, np.minimum(amount / 10000, 0.25), v14 * 0.25, v17 * 0.20,
+                 method_risk, merchant_risk, device_risk, time_risk)
+        for column, term in enumerate(terms):
+            contributions[:, column] = term
+        total_risk = contributions[:, 0] + contributions[:, 1]
+        for column in range(2, len(FACTORS)):
+            total_risk += contributions[:, column]
+        return np.minimum(total_risk, 0.95), contributions
+
+    # Same summation order as calculate_risk_score so results match bit for bit
+    total_risk = 0.05 + np.minimum(amount / 10000, 0.25)
+    total_risk += v14 * 0.25
+    total_risk += v17 * 0.20
+    total_risk += method_risk
+    total_risk += merchant_risk
+    total_risk += device_risk
+    total_risk += time_risk
+    return np.minimum(total_risk, 0.95)
+
+
+# Function to calculate risk scores for columns that are already encoded (e.g. TransactionBuffer views)
+def calculate_risk_scores_encoded(amount, v14, v17, payment_ids, merchant_ids, device_ids, hours, table=None):
+    """calculate_risk_scores without the encoding pass.
+
+    payment_ids, merchant_ids and device_ids index the table's category lists
+    (len(list) meaning unknown, like RiskTable.payment_id) and hours are 0-23.
+    The arrays are read as given, so float64 views are scored without copying;
+    results match calculate_risk_scores bit for bit.
+    """
+    import numpy as np
+
+    table = DEFAULT_RISK_TABLE if table is None else table
+    lookups = table.arrays()
+    total_risk = 0.05 + np.minimum(amount / 10000, 0.25)
+    total_risk += v14 * 0.25
+    total_risk += v17 * 0.20
+    total_risk += lookups["payment"][payment_ids]
+    total_risk += lookups["merchant"][merchant_ids]
+    total_risk += lookups["device"][device_ids]
+    total_risk += lookups["hour"][hours]
+    return np.minimum(total_risk, 0.95)
+
+
+# Function to get the per-factor contributions behind one calculate_risk_score call
+def explain_risk_score(amount, v14, v17, payment_method, merchant, device_type="Desktop", table=None,
+                       timestamp=None, hour=None):
+    """Dict of FACTORS -> contribution, taken from the batch scorer's explain pass"""
+    hour = get_hour(timestamp) if hour is None else hour
+    _, contributions = calculate_risk_scores([amount], [v14], [v17], payment_method, merchant, device_type,
+                                             table=table, hour=hour, explain=True)
+    return dict(zip(FACTORS, contributions[0].tolist()))
+
+
+# Function to score a DataFrame with the columns used in st.session_state.transaction_data
+def calculate_risk_scores_frame(df, hour=None, explain=False):
+    """Uses the timestamp column, or the model's Time column, when present.
+
+    With explain=True returns (scores, contributions DataFrame with one column per factor).
+    """
+    if "timestamp" in df:
+        timestamp = df["timestamp"].to_numpy()
+    elif "Time" in df:
+        timestamp = df["Time"].to_numpy()
+    else:
+        timestamp = None
+    result = calculate_risk_scores(
+        df["amount"].to_numpy(),
+        df["v14"].to_numpy(),
+        df["v17"].to_numpy(),
+        df["payment_method"].to_numpy(),
+        df["merchant"].to_numpy(),
+        df["device_type"].to_numpy() if "device_type" in df else "Desktop",
+        timestamp,
+        hour=hour,
+        explain=explain,
+    )
+    if not explain:
+        return result
+    import pandas as pd
+
+    scores, contributions = result
+    return scores, pd.DataFrame(contributions, index=df.index, columns=list(FACTORS), copy=False)
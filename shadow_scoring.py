@@ -0,0 +1,358 @@
+# shadow_scoring.py
+"""Champion/challenger (shadow) scoring of live traffic.
+
+Challengers are other engine versions, each a .fgm model artifact (risk
+tables and tier thresholds), that score the same transactions as the
+champion without having any say in the decision:
+
+    python score_server.py --model model.fgm --shadow v2=model_v2.fgm --shadow-log data/shadow.db
+    python shadow_scoring.py report data/shadow.db
+
+The champion still scores inline. ShadowScorer.submit() puts the batch and
+the champion's results on a bounded queue and returns; when max_pending
+batches are already waiting the batch is dropped (and counted) instead, so
+a slow challenger can never back up the latency path. The queue bounds
+memory, not CPU: challengers scoring alongside the champion still compete
+with it for cores, which shows in its p99. sample_rate caps that cost by
+shadow-scoring only that fraction of the batches (picked at random). A
+dispatcher thread builds the score columns, evaluates the allow/deny rules
+once, scores the batch with every challenger concurrently on a thread or
+process pool and appends one row per transaction and challenger to a
+ShadowLog (SQLite, WAL) for offline comparison.
+
+Thread workers share the interpreter with the latency path; the scoring is
+vectorized NumPy, so they hold the GIL only briefly. With processes=True
+the challengers run in worker processes that load the artifacts
+themselves, and only the score columns are pickled across.
+bench_shadow_scoring.py measures the p99 cost of both and of sampling.
+
+A challenger whose artifact cannot be loaded fails its batches instead of
+scoring with the default tables; failures and reload errors are reported
+per challenger by snapshot(), and the other challengers are unaffected.
+"""
+import argparse
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from decision_log import connect
+from instrumentation import INSTRUMENTATION, clock
+from model_artifact import ArtifactWatcher
+from rules_engine import DENY_SCORE
+from scoring_engine import RISK_TIERS, TIER_LEVELS, calculate_risk_scores, get_hour
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 8
+DEFAULT_SAMPLE_RATE = 1.0
+
+# Tier labels as returned by score_server.score_transactions -> tier codes
+TIER_CODES = {tier[0]: code for code, tier in enumerate(RISK_TIERS)}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shadow_scores (
+    seq INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    transaction_id TEXT,
+    engine TEXT NOT NULL,
+    champion_score REAL NOT NULL,
+    champion_tier INTEGER NOT NULL,
+    score REAL NOT NULL,
+    tier INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS shadow_scores_engine_ts ON shadow_scores (engine, ts);
+"""
+
+INSERT = ("INSERT INTO shadow_scores (ts, transaction_id, engine, champion_score, champion_tier, score, tier) "
+          "VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+# Dashboard risk level code of a tier code column (each engine's levels follow its own thresholds)
+LEVEL_SQL = "CASE {0} " + " ".join(f"WHEN {tier} THEN {level}" for tier, level in enumerate(TIER_LEVELS)) + " END"
+
+_STOP = object()
+
+# Challenger watchers of a worker process (see load_challengers)
+_WORKER_WATCHERS = {}
+
+
+# Function to get the columns a challenger scores from a batch of transaction dicts
+def shadow_columns(transactions, rules=None, submitted_at=None):
+    """Rows without a timestamp use the hour the batch was submitted, as the champion did"""
+    now_hour = datetime.fromtimestamp(time.time() if submitted_at is None else submitted_at).hour
+    columns = {
+        "amount": np.array([float(txn["amount"]) for txn in transactions]),
+        "v14": np.array([float(txn["v14"]) for txn in transactions]),
+        "v17": np.array([float(txn["v17"]) for txn in transactions]),
+        "payment_method": [txn.get("payment_method") for txn in transactions],
+        "merchant": [txn.get("merchant") for txn in transactions],
+        "device_type": [txn.get("device_type", "Desktop") for txn in transactions],
+        "hour": np.array([now_hour if stamp is None else get_hour(stamp)
+                          for stamp in (txn.get("timestamp", txn.get("Time")) for txn in transactions)]),
+        "denied": None,
+        "merchant_risks": None,
+    }
+    if rules is not None:
+        columns["denied"], columns["merchant_risks"] = rules.evaluate_many(
+            [str(txn.get("card_id", "")) for txn in transactions],
+            [str(merchant) for merchant in columns["merchant"]],
+            [str(txn.get("device_id", "")) for txn in transactions])
+    return columns
+
+
+# Function to score shadow columns with one engine version; returns (scores, tier codes)
+def score_columns(columns, table):
+    scores = calculate_risk_scores(columns["amount"], columns["v14"], columns["v17"], columns["payment_method"],
+                                   columns["merchant"], columns["device_type"], table=table, hour=columns["hour"],
+                                   merchant_risks=columns["merchant_risks"])
+    if columns["denied"] is not None:
+        scores[columns["denied"]] = DENY_SCORE
+    return scores, table.tiers.classify(scores)
+
+
+# Function to score shadow columns with a challenger's watched artifact; returns (scores, tier codes, reload error)
+def score_with_watcher(columns, watcher):
+    """Raises instead of falling back to the default tables when the artifact never loaded"""
+    table = watcher.current()
+    if watcher.reloads == 0:
+        raise ValueError(f"challenger artifact {watcher.path} could not be loaded: {watcher.error or 'not found'}")
+    scores, tiers = score_columns(columns, table)
+    return scores, tiers, None if watcher.error is None else str(watcher.error)
+
+
+# Function to load the challenger artifacts once in a worker process
+def load_challengers(paths):
+    _WORKER_WATCHERS.update({name: ArtifactWatcher(path) for name, path in paths.items()})
+
+
+# Function to score shadow columns in a worker process with one of its challengers
+def score_in_worker(name, columns):
+    return score_with_watcher(columns, _WORKER_WATCHERS[name])
+
+
+# Function to parse NAME=PATH challenger specs (the --shadow option)
+def parse_challengers(specs):
+    challengers = {}
+    for spec in specs:
+        name, sep, path = spec.partition("=")
+        if not sep or not name or not path:
+            raise ValueError(f"challenger must be NAME=PATH, got {spec!r}")
+        if name in challengers:
+            raise ValueError(f"duplicate challenger name {name!r}")
+        challengers[name] = path
+    return challengers
+
+
+class ShadowLog:
+    """Append-only SQLite log of challenger scores next to the champion's"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = connect(path)
+        self._connection.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.committed = 0
+
+    def append(self, rows):
+        """Insert (ts, transaction_id, engine, champion_score, champion_tier, score, tier) rows in one commit"""
+        with self._lock, self._connection:
+            self._connection.executemany(INSERT, rows)
+        self.committed += len(rows)
+
+    def compare(self, since=None):
+        """Per challenger: rows, mean and largest score difference from the champion, and how often the tier
+        and risk level agreed, went up or went down, for rows logged at or after since"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT engine, COUNT(*), AVG(score - champion_score), AVG(ABS(score - champion_score)), "
+                "MAX(ABS(score - champion_score)), SUM(tier = champion_tier), SUM(tier > champion_tier), "
+                f"SUM(tier < champion_tier), SUM({LEVEL_SQL.format('tier')} != "
+                f"{LEVEL_SQL.format('champion_tier')}) "
+                "FROM shadow_scores WHERE ts >= ? GROUP BY engine ORDER BY engine",
+                (float("-inf") if since is None else since,),
+            ).fetchall()
+        return {
+            engine: {"rows": count, "mean_diff": mean_diff, "mean_abs_diff": mean_abs, "max_abs_diff": max_abs,
+                     "tier_agreement": same / count, "tier_up": up, "tier_down": down, "level_changes": levels}
+            for engine, count, mean_diff, mean_abs, max_abs, same, up, down, levels in rows
+        }
+
+    def close(self):
+        self._connection.close()
+
+
+class ShadowScorer:
+    """Scores submitted champion batches with challenger engine versions off the latency path"""
+
+    def __init__(self, challengers, log_path=None, workers=DEFAULT_WORKERS, processes=False,
+                 max_pending=DEFAULT_MAX_PENDING, sample_rate=DEFAULT_SAMPLE_RATE):
+        if not challengers:
+            raise ValueError("shadow scoring needs at least one challenger")
+        if max_pending < 1:
+            # queue.Queue(0) would be unbounded
+            raise ValueError("max_pending must be at least 1")
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate must be in (0, 1]")
+        missing = [f"{name}={path}" for name, path in challengers.items() if not os.path.exists(path)]
+        if missing:
+            raise ValueError(f"challenger artifact not found: {', '.join(missing)}")
+        self.paths = dict(challengers)
+        self.processes = processes
+        self.max_pending = max_pending
+        self.sample_rate = sample_rate
+        self.log = ShadowLog(log_path) if log_path else None
+        if processes:
+            self.watchers = None
+            self.executor = ProcessPoolExecutor(workers, initializer=load_challengers, initargs=(self.paths,))
+        else:
+            self.watchers = {name: ArtifactWatcher(path) for name, path in self.paths.items()}
+            self.executor = ThreadPoolExecutor(workers, thread_name_prefix="shadow-worker")
+        self.submitted = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.scored = 0
+        self.failed = 0
+        self.error = None
+        # Running totals per challenger for snapshot(): rows, sum of |score - champion|, same tier, failed
+        # batches, and the last failure or artifact reload error
+        self._totals = {name: [0, 0.0, 0] for name in self.paths}
+        self._failures = dict.fromkeys(self.paths, 0)
+        self._errors = dict.fromkeys(self.paths)
+        self._queue = queue.Queue(max_pending)
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="shadow-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, transactions, champion_results, rules=None):
+        """Queue a scored batch for the challengers without waiting; returns False when it was sampled out or
+        dropped"""
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return False
+        try:
+            self._queue.put_nowait((time.time(), transactions, champion_results, rules))
+        except queue.Full:
+            self.dropped += 1
+            INSTRUMENTATION.inc("shadow_dropped", help="Batches not shadow-scored because the queue was full.")
+            return False
+        self.submitted += 1
+        return True
+
+    def flush(self):
+        """Block until every queued batch has been scored and logged"""
+        self._queue.join()
+
+    def close(self):
+        """Score and log what is queued, then stop; safe to call more than once"""
+        if not self._dispatcher.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._dispatcher.join()
+        self.executor.shutdown()
+        if self.log is not None:
+            self.log.close()
+
+    def snapshot(self):
+        engines = {}
+        for name, (rows, abs_diff, same_tier) in self._totals.items():
+            engines[name] = {"rows": rows, "mean_abs_diff": abs_diff / rows if rows else 0.0,
+                             "tier_agreement": same_tier / rows if rows else None,
+                             "failed": self._failures[name], "error": self._errors[name]}
+        return {"challengers": self.paths, "processes": self.processes, "sample_rate": self.sample_rate,
+                "submitted": self.submitted, "sampled_out": self.sampled_out, "dropped": self.dropped,
+                "pending": self._queue.qsize(), "scored": self.scored,
+                "failed": self.failed, "error": None if self.error is None else str(self.error),
+                "engines": engines}
+
+    def _dispatch_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._score(*item)
+            except Exception as exc:
+                # A failing challenger must not stop shadow scoring (or the champion)
+                self.failed += 1
+                self.error = exc
+            finally:
+                self._queue.task_done()
+
+    def _score(self, submitted_at, transactions, champion_results, rules):
+        start = clock()
+        columns = shadow_columns(transactions, rules, submitted_at)
+        if self.watchers is None:
+            futures = {name: self.executor.submit(score_in_worker, name, columns) for name in self.paths}
+        else:
+            futures = {name: self.executor.submit(score_with_watcher, columns, watcher)
+                       for name, watcher in self.watchers.items()}
+        champion = np.array([result["risk_score"] for result in champion_results])
+        champion_tiers = np.array([TIER_CODES[result["risk_tier"]] for result in champion_results])
+        rows = []
+        if self.log is not None:
+            ids = [txn.get("id", txn.get("transaction_id")) for txn in transactions]
+            ids = [None if txn_id is None else str(txn_id) for txn_id in ids]
+            champion_rows = list(zip(ids, champion.tolist(), champion_tiers.tolist()))
+        for name, future in futures.items():
+            # Each challenger on its own: one failing leaves the others' totals and log rows intact
+            try:
+                scores, tiers, self._errors[name] = future.result()
+            except Exception as exc:
+                self._failures[name] += 1
+                self._errors[name] = str(exc)
+                self.failed += 1
+                self.error = exc
+                continue
+            totals = self._totals[name]
+            totals[0] += len(scores)
+            totals[1] += float(np.abs(scores - champion).sum())
+            totals[2] += int((tiers == champion_tiers).sum())
+            if self.log is not None:
+                rows.extend((submitted_at, txn_id, name, score, tier, challenger, challenger_tier)
+                            for (txn_id, score, tier), challenger, challenger_tier
+                            in zip(champion_rows, scores.tolist(), tiers.tolist()))
+        if rows:
+            self.log.append(rows)
+        self.scored += len(transactions)
+        INSTRUMENTATION.since("shadow", start)
+
+
+# Function to print the per-challenger comparison from a shadow log
+def print_report(comparison):
+    if not comparison:
+        print("no shadow scores logged")
+        return
+    print(f"{'engine':<16} {'rows':>10} {'mean diff':>10} {'mean |diff|':>12} {'max |diff|':>11} "
+          f"{'same tier':>10} {'tier up':>9} {'tier down':>10} {'level chg':>10}")
+    for engine, stats in comparison.items():
+        print(f"{engine:<16} {stats['rows']:>10,} {stats['mean_diff']:>+10.4f} {stats['mean_abs_diff']:>12.4f} "
+              f"{stats['max_abs_diff']:>11.4f} {stats['tier_agreement']:>10.1%} {stats['tier_up']:>9,} "
+              f"{stats['tier_down']:>10,} {stats['level_changes']:>10,}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare challenger engine versions with the champion.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report = commands.add_parser("report", help="summarize a shadow log per challenger")
+    report.add_argument("log", help="shadow log written by score_server.py --shadow-log")
+    report.add_argument("--hours", type=float, help="only rows logged in the last HOURS hours")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.log):
+        parser.error(f"no shadow log at {args.log}")
+    log = ShadowLog(args.log)
+    try:
+        print_report(log.compare(None if args.hours is None else time.time() - args.hours * 3600))
+    except sqlite3.Error as exc:
+        parser.error(f"could not read {args.log}: {exc}")
+    finally:
+        log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,512 @@
+# stream_consumer.py
+"""Asyncio consumer that scores a stream of transactions and logs a decision for each.
+
+    python stream_consumer.py --tail transactions.jsonl --batch-size 256 --concurrency 2
+    python stream_consumer.py --demo 200000
+
+Sources are stand-ins for a broker partition: an append-only log read from a
+position, with a committed offset that survives the consumer.
+
+- MemorySource keeps the log in process; produce() waits while `capacity`
+  records are uncommitted, so a producer cannot run away from the consumer
+- FileTailSource tails a JSON-lines file (offsets are byte positions) and
+  stores its committed offset next to it in <path>.offset
+
+The pipeline is fetch -> bounded record queue -> micro-batcher -> bounded
+batch queue -> `concurrency` workers. When the workers fall behind, the
+queues fill up and the fetcher stops reading, so memory stays bounded
+(backpressure). A batch is flushed at batch_size records or linger_ms after
+its first record. Workers score it with score_server.score_transactions, turn
+each risk level into its recommended action and append the decisions to the
+DecisionLog. Offsets are committed only after the log has flushed them, and
+only up to the oldest unfinished batch, so after a crash everything past the
+committed offset is consumed again (at-least-once: a decision can be logged
+twice, never lost). Messages the scorer cannot take (not a JSON object,
+non-numeric amount/v14/v17, non-string labels) are counted as invalid and
+skipped; if a batch still fails to score, its rows are scored one at a time
+and only the failing ones are skipped, so one bad message cannot stall the
+partition.
+
+Every report_interval seconds the consumer reports throughput, end-to-end lag
+(produce time to logged decision, p50/p99) and how far the committed offset
+is behind the end of the log.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque, namedtuple
+
+from decision_log import ACTIONS, DecisionLog
+from instrumentation import INSTRUMENTATION, clock
+from live_metrics import LatencySketch, format_latency
+from score_server import check_labels, score_transactions
+from scoring_engine import RISK_LEVELS
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_LINGER_MS = 5.0
+DEFAULT_CONCURRENCY = 2
+DEFAULT_QUEUE_SIZE = 4096
+DEFAULT_SOURCE_CAPACITY = 100_000
+DEFAULT_POLL_INTERVAL = 0.05
+DEFAULT_REPORT_INTERVAL = 5.0
+LAG_WINDOW = 60.0
+
+# Field holding the Unix time a message was produced (used for end-to-end lag)
+PRODUCED_AT = "produced_at"
+
+# Recommended action for each risk level label
+LEVEL_ACTIONS = {level[0]: action for level, action in zip(RISK_LEVELS, ACTIONS)}
+
+# One message: its offset, the offset to commit once it is processed, the decoded transaction (None if it
+# could not be decoded) and when it was produced
+Record = namedtuple("Record", "offset next_offset value timestamp")
+
+
+class MemorySource:
+    """In-process broker stand-in: an append-only log with a committed offset"""
+
+    lag_unit = "records"
+
+    def __init__(self, capacity=DEFAULT_SOURCE_CAPACITY, name="memory"):
+        self.capacity = capacity
+        self.name = name
+        self.position = 0
+        self.committed = 0
+        self._log = []
+        self._base = 0
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+
+    @property
+    def end_offset(self):
+        return self._base + len(self._log)
+
+    async def produce(self, value, timestamp=None):
+        """Append a transaction; waits while capacity records are uncommitted"""
+        while self.end_offset - self.committed >= self.capacity:
+            self._writable.clear()
+            await self._writable.wait()
+        offset = self.end_offset
+        self._log.append(Record(offset, offset + 1, value, time.time() if timestamp is None else timestamp))
+        self._readable.set()
+        return offset
+
+    async def fetch(self, max_records):
+        while self.position >= self.end_offset:
+            self._readable.clear()
+            await self._readable.wait()
+        start = self.position - self._base
+        records = self._log[start:start + max_records]
+        self.position += len(records)
+        return records
+
+    async def commit(self, offset):
+        self.committed = max(self.committed, offset)
+        # Committed records can be dropped; compact once they are half the list
+        done = self.committed - self._base
+        if done > len(self._log) // 2:
+            del self._log[:done]
+            self._base = self.committed
+        self._writable.set()
+
+    def rewind(self):
+        """Restart reading from the committed offset, as a restarted consumer would"""
+        self.position = self.committed
+
+    def lag(self):
+        return self.end_offset - self.committed
+
+
+class FileTailSource:
+    """Tails a JSON-lines file; offsets are byte positions, the committed one is kept in <path>.offset"""
+
+    lag_unit = "bytes"
+
+    def __init__(self, path, poll_interval=DEFAULT_POLL_INTERVAL, offset_path=None):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.poll_interval = poll_interval
+        self.offset_path = offset_path or path + ".offset"
+        self.committed = _read_offset(self.offset_path)
+        self.position = self.committed
+        self._file = None
+
+    async def fetch(self, max_records):
+        while True:
+            records = await asyncio.to_thread(self._read, max_records)
+            if records:
+                return records
+            await asyncio.sleep(self.poll_interval)
+
+    def _read(self, max_records):
+        if self._file is None:
+            if not os.path.exists(self.path):
+                return []
+            self._file = open(self.path, "rb")
+        self._file.seek(self.position)
+        records = []
+        now = time.time()
+        while len(records) < max_records:
+            line = self._file.readline()
+            if not line.endswith(b"\n"):
+                # Nothing more, or a line still being written
+                break
+            offset = self.position
+            self.position += len(line)
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+            except ValueError:
+                value = None
+            produced = value.get(PRODUCED_AT) if isinstance(value, dict) else None
+            try:
+                produced = now if produced is None else float(produced)
+                if not math.isfinite(produced):
+                    raise ValueError(produced)
+            except (TypeError, ValueError):
+                # A message with an unreadable produce time is skipped as invalid, like undecodable JSON
+                value, produced = None, now
+            records.append(Record(offset, self.position, value, produced))
+        return records
+
+    async def commit(self, offset):
+        if offset > self.committed:
+            self.committed = offset
+            await asyncio.to_thread(_write_offset, self.offset_path, offset)
+
+    def rewind(self):
+        self.position = self.committed
+
+    def lag(self):
+        try:
+            return os.path.getsize(self.path) - self.committed
+        except OSError:
+            return 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# Function to read a committed offset file (0 when there is none)
+def _read_offset(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+# Function to store a committed offset atomically
+def _write_offset(path, offset):
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        f.write(str(offset))
+    os.replace(temporary, path)
+
+
+# Function to append transactions to a file tailed by FileTailSource
+def append_transactions(path, transactions):
+    now = time.time()
+    with open(path, "a") as f:
+        for transaction in transactions:
+            f.write(json.dumps({**transaction, PRODUCED_AT: transaction.get(PRODUCED_AT, now)}) + "\n")
+
+
+# Function to check a decoded message has what the scorer needs
+def is_valid(value):
+    if not isinstance(value, dict):
+        return False
+    try:
+        check_labels(value)
+        return all(math.isfinite(float(value[name])) for name in ("amount", "v14", "v17"))
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+# Function to print one progress report
+def print_report(report):
+    print(f"[{report['source']}] {report['throughput']:>9,.0f} txn/s | lag p50 {format_latency(report['lag_p50'])} "
+          f"p99 {format_latency(report['lag_p99'])} | behind {report['consumer_lag']:,} {report['lag_unit']} | "
+          f"decided {report['decided']:,} invalid {report['invalid']:,} committed {report['committed']:,}",
+          flush=True)
+
+
+class _Batch:
+    __slots__ = ("records", "next_offset", "done")
+
+    def __init__(self, records):
+        self.records = records
+        self.next_offset = records[-1].next_offset
+        self.done = False
+
+
+class StreamConsumer:
+    """Micro-batching consumer with backpressure and at-least-once offset commits"""
+
+    def __init__(self, source, decision_log, table=None, batch_size=DEFAULT_BATCH_SIZE,
+                 linger_ms=DEFAULT_LINGER_MS, concurrency=DEFAULT_CONCURRENCY, queue_size=DEFAULT_QUEUE_SIZE,
+                 report_interval=DEFAULT_REPORT_INTERVAL, reporter=print_report):
+        self.source = source
+        self.log = decision_log
+        self.table = table
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000
+        self.concurrency = concurrency
+        self.report_interval = report_interval
+        self.reporter = reporter
+        self.lag = LatencySketch(window=LAG_WINDOW)
+        self.consumed = 0
+        self.decided = 0
+        self.invalid = 0
+        self.batches = 0
+        self.error = None
+        # Set when a fetch or worker task fails; the consumer stops and error holds the exception
+        self.failed = asyncio.Event()
+        self._records = asyncio.Queue(queue_size)
+        self._batches = asyncio.Queue(concurrency)
+        self._pending = deque()
+        self._commit_lock = asyncio.Lock()
+        self._last_report = (time.monotonic(), 0)
+        self._tasks = []
+        self._fetcher = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self._fetcher = loop.create_task(self._fetch_loop())
+        self._tasks = [loop.create_task(self._collect_loop())]
+        self._tasks += [loop.create_task(self._work_loop()) for _ in range(self.concurrency)]
+        if self.report_interval:
+            self._tasks.append(loop.create_task(self._report_loop()))
+        return self
+
+    async def stop(self, drain=True):
+        """Stop fetching; with drain, finish (and commit) everything already fetched first"""
+        await _cancel(self._fetcher)
+        if drain and self.error is None:
+            await self._records.join()
+            await self._batches.join()
+        for task in self._tasks:
+            await _cancel(task)
+        if self.reporter is not None:
+            self.reporter(self.report())
+
+    async def wait_for(self, offset, timeout=None):
+        """Wait until the committed offset reaches offset"""
+        async def committed():
+            while self.source.committed < offset:
+                if self.error is not None:
+                    raise RuntimeError("stream consumer failed") from self.error
+                await asyncio.sleep(0.01)
+        await asyncio.wait_for(committed(), timeout)
+
+    def _fail(self, exc):
+        self.error = exc
+        self.failed.set()
+
+    async def _fetch_loop(self):
+        try:
+            while True:
+                records = await self.source.fetch(self.batch_size)
+                for record in records:
+                    # Blocks while the pipeline is full, so nothing more is read from the source
+                    await self._records.put(record)
+        except Exception as exc:
+            # Nothing past the committed offset is lost: a restart reads it again
+            self._fail(exc)
+
+    async def _collect_loop(self):
+        while True:
+            batch = [await self._records.get()]
+            deadline = time.monotonic() + self.linger
+            while len(batch) < self.batch_size:
+                while len(batch) < self.batch_size and not self._records.empty():
+                    batch.append(self._records.get_nowait())
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._records.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Batches are queued in offset order, which is the order commits must follow
+            pending = _Batch(batch)
+            self._pending.append(pending)
+            await self._batches.put(pending)
+            for _ in batch:
+                self._records.task_done()
+
+    async def _work_loop(self):
+        while True:
+            batch = await self._batches.get()
+            try:
+                await self._process(batch)
+            except Exception as exc:
+                # Stop committing past this batch; its records are consumed again after a restart
+                self._fail(exc)
+                await _cancel(self._fetcher)
+                return
+            finally:
+                self._batches.task_done()
+
+    async def _process(self, batch):
+        start = clock()
+        records = [record for record in batch.records if is_valid(record.value)]
+        self.invalid += len(batch.records) - len(records)
+        if records:
+            transactions = [record.value for record in records]
+            # Scoring runs off the event loop so fetching continues meanwhile
+            try:
+                results = await asyncio.to_thread(score_transactions, transactions, self.table)
+            except Exception:
+                # A message the checks let through must not stop the partition: score the rows one at a time
+                scored, results = await asyncio.to_thread(self._score_one_by_one, records)
+                self.invalid += len(records) - len(scored)
+                records = scored
+            for record, result in zip(records, results):
+                value = record.value
+                self.log.append(value.get("id", value.get("transaction_id", f"{self.source.name}:{record.offset}")),
+                                LEVEL_ACTIONS[result["risk_level"]], result["risk_score"], float(value["amount"]),
+                                value.get("card_id"))
+            await asyncio.to_thread(self.log.flush)
+            now = time.time()
+            for record in records:
+                self.lag.add(max(now - record.timestamp, 0.0))
+        batch.done = True
+        await self._commit()
+        self.consumed += len(batch.records)
+        self.decided += len(records)
+        self.batches += 1
+        INSTRUMENTATION.since("stream_batch", start)
+        INSTRUMENTATION.inc("stream_records", len(batch.records), help="Stream messages consumed.")
+
+    def _score_one_by_one(self, records):
+        scored, results = [], []
+        for record in records:
+            try:
+                results.append(score_transactions([record.value], self.table)[0])
+            except Exception as exc:
+                print(f"[{self.source.name}] skipping message at offset {record.offset}: {type(exc).__name__}: {exc}")
+                continue
+            scored.append(record)
+        return scored, results
+
+    async def _commit(self):
+        async with self._commit_lock:
+            offset = None
+            while self._pending and self._pending[0].done:
+                offset = self._pending.popleft().next_offset
+            if offset is not None:
+                await self.source.commit(offset)
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.reporter(self.report())
+
+    def report(self):
+        """Throughput since the previous report, end-to-end lag and how far commits are behind the log"""
+        now = time.monotonic()
+        last_time, last_decided = self._last_report
+        self._last_report = (now, self.decided)
+        elapsed = now - last_time
+        p50, p99 = self.lag.quantiles((0.50, 0.99))
+        return {
+            "source": self.source.name,
+            "throughput": (self.decided - last_decided) / elapsed if elapsed > 0 else 0.0,
+            "lag_p50": p50,
+            "lag_p99": p99,
+            "consumer_lag": self.source.lag(),
+            "lag_unit": self.source.lag_unit,
+            "consumed": self.consumed,
+            "decided": self.decided,
+            "invalid": self.invalid,
+            "batches": self.batches,
+            "committed": self.source.committed,
+        }
+
+
+# Function to cancel a task and wait for it to finish
+async def _cancel(task):
+    if task is None or task.done():
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+# Function to produce n synthetic transactions into a MemorySource (demo load)
+async def produce_synthetic(source, n, seed=42, rate=None):
+    from synthetic_data import generate_columns
+
+    columns = generate_columns(n, seed)
+    seconds = (columns["timestamp"] - columns["timestamp"][0]).astype("timedelta64[s]").astype(float)
+    rows = zip(columns["id"].tolist(), columns["amount"].tolist(), columns["v14"].tolist(), columns["v17"].tolist(),
+               columns["payment_method"].tolist(), columns["merchant"].tolist(), columns["device_type"].tolist(),
+               seconds.tolist())
+    start = time.monotonic()
+    for i, (txn, amount, v14, v17, method, merchant, device, offset) in enumerate(rows):
+        await source.produce({"id": txn, "card_id": f"CARD-{i % 10_000:04d}", "amount": amount, "v14": v14,
+                              "v17": v17, "payment_method": method, "merchant": merchant, "device_type": device,
+                              "Time": offset})
+        if rate and i % 100 == 0:
+            await asyncio.sleep(max(start + i / rate - time.monotonic(), 0))
+        elif i % 1000 == 0:
+            # Let the consumer run between bursts
+            await asyncio.sleep(0)
+
+
+async def consume(args):
+    decision_log = DecisionLog(args.log)
+    if args.tail:
+        source = FileTailSource(args.tail, args.poll_interval)
+    else:
+        source = MemorySource(args.capacity)
+    consumer = await StreamConsumer(source, decision_log, None, args.batch_size, args.linger_ms, args.concurrency,
+                                    args.queue_size, args.report_interval).start()
+    try:
+        if args.tail:
+            print(f"🛡️ Consuming {args.tail} from byte {source.committed:,}", flush=True)
+            await consumer.failed.wait()
+            raise RuntimeError("stream consumer failed") from consumer.error
+        else:
+            await produce_synthetic(source, args.demo, rate=args.rate)
+            await consumer.wait_for(source.end_offset)
+    finally:
+        await consumer.stop()
+        decision_log.close()
+        if args.tail:
+            source.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a stream of transactions and log a decision for each.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--tail", help="JSON-lines file to tail (committed offset kept in <file>.offset)")
+    source.add_argument("--demo", type=int, help="consume this many synthetic transactions from an in-memory source")
+    parser.add_argument("--log", default=os.path.join("data", "decisions.db"), help="decision log database")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="largest micro-batch")
+    parser.add_argument("--linger-ms", type=float, default=DEFAULT_LINGER_MS, help="micro-batch window")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="batches in flight")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="records buffered before fetching pauses")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_SOURCE_CAPACITY,
+                        help="uncommitted records the in-memory source holds before the producer waits")
+    parser.add_argument("--rate", type=float, default=None, help="demo producer rate in transactions/s")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL, help="file tail poll interval")
+    parser.add_argument("--report-interval", type=float, default=DEFAULT_REPORT_INTERVAL, help="seconds between reports")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(consume(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# synthetic_data.py
+"""Seeded synthetic transactions for benchmarks and local model training.
+
+generate_dataset() follows the `features` schema of create_model.py: the 30
+numeric columns V1-V28 (scaled like the training data's PCA components),
+Amount and Time plus a Class label at the training data's 492 / 284,807
+(~0.17%) fraud rate, together with the columns the dashboard scorer reads
+(amount, v14, v17, payment_method, merchant, device_type, timestamp).
+Everything is derived from one seed, so a benchmark run is reproducible.
+"""
+import numpy as np
+
+from model_artifact import FEATURE_ORDER
+from scoring_engine import DEFAULT_RISK_TABLE
+
+# Size and fraud count of the training data described in create_model.py
+REFERENCE_ROWS = 284_807
+REFERENCE_FRAUD_CASES = 492
+
+REFERENCE_FRAUD_RATE = REFERENCE_FRAUD_CASES / REFERENCE_ROWS
+
+# Bumped whenever the same seed starts producing different data (2: V1-V28 scaled by COMPONENT_SCALES), so
+# benchmark reports can tell that their datasets are not comparable
+GENERATOR_VERSION = 2
+
+# Standard deviations of V1-V28 in the training data (PCA components, largest first)
+COMPONENT_SCALES = (1.958, 1.651, 1.516, 1.416, 1.380, 1.332, 1.237, 1.194, 1.099, 1.089, 1.021, 0.999, 0.995,
+                    0.959, 0.915, 0.876, 0.849, 0.838, 0.814, 0.771, 0.735, 0.726, 0.624, 0.606, 0.521, 0.482,
+                    0.404, 0.330)
+
+# How far fraud rows are shifted on the most informative components
+FRAUD_SHIFTS = {"V14": -2.5, "V17": -2.2, "V15": 1.2, "V16": -1.0, "V18": -0.9, "V19": 0.7, "V20": 0.6,
+                "V1": -0.6, "V2": 0.6, "V3": -0.8, "V4": 1.0}
+
+
+# Function to generate n synthetic transactions as a dict of column arrays
+def generate_columns(n, seed=42):
+    rng = np.random.default_rng(seed)
+    table = DEFAULT_RISK_TABLE
+    start = np.datetime64("2023-01-01T00:00:00")
+    return {
+        "id": np.char.add("TXN-", np.arange(n).astype(str)),
+        "amount": np.round(rng.lognormal(4.0, 1.3, n), 2),
+        "v14": rng.random(n),
+        "v17": rng.random(n),
+        "payment_method": np.array(table.payment_methods, dtype=object)[rng.integers(0, len(table.payment_methods), n)],
+        "merchant": np.array(table.merchants, dtype=object)[rng.integers(0, len(table.merchants), n)],
+        "device_type": np.array(table.device_types, dtype=object)[rng.integers(0, len(table.device_types), n)],
+        "timestamp": start + np.sort(rng.integers(0, 365 * 24 * 3600, n)).astype("timedelta64[s]"),
+    }
+
+
+# Function to generate n synthetic transactions as a DataFrame
+def generate_transactions(n, seed=42):
+    import pandas as pd
+
+    return pd.DataFrame(generate_columns(n, seed))
+
+
+# Function to generate a model feature matrix (columns in FEATURE_ORDER) and fraud labels
+def generate_feature_matrix(n, seed=42, fraud_rate=REFERENCE_FRAUD_RATE):
+    rng = np.random.default_rng(seed)
+    y = (rng.random(n) < fraud_rate).astype(np.int8)
+    X = rng.standard_normal((n, len(FEATURE_ORDER)))
+    X[:, :len(COMPONENT_SCALES)] *= COMPONENT_SCALES
+    for name, shift in FRAUD_SHIFTS.items():
+        column = FEATURE_ORDER.index(name)
+        X[y == 1, column] += shift
+    X[:, FEATURE_ORDER.index("Amount")] = np.round(rng.lognormal(4.0, 1.3, n) * np.where(y == 1, 1.5, 1.0), 2)
+    X[:, FEATURE_ORDER.index("Time")] = np.sort(rng.uniform(0, 2 * 24 * 3600, n))
+    return X, y
+
+
+# Function to generate n labelled transactions with model features and scorer inputs
+def generate_dataset(n, seed=42, fraud_rate=REFERENCE_FRAUD_RATE):
+    import pandas as pd
+
+    X, y = generate_feature_matrix(n, seed, fraud_rate)
+    frame = pd.DataFrame(X, columns=FEATURE_ORDER)
+    frame["Class"] = y
+
+    # The scorer's 0-1 V14/V17 sliders grow with risk, so map the (fraud-negative) components through a logistic
+    columns = generate_columns(n, seed + 1)
+    columns["amount"] = frame["Amount"].to_numpy()
+    columns["v14"] = 1 / (1 + np.exp(frame["V14"].to_numpy()))
+    columns["v17"] = 1 / (1 + np.exp(frame["V17"].to_numpy()))
+    columns["timestamp"] = np.datetime64("2023-01-01T00:00:00") + frame["Time"].to_numpy().astype("timedelta64[s]")
+
+    # Fraud leans towards the riskier categories
+    rng = np.random.default_rng(seed + 2)
+    fraud = np.flatnonzero(y)
+    risky = fraud[rng.random(len(fraud)) < 0.5]
+    columns["payment_method"][risky] = "Cryptocurrency"
+    columns["merchant"][risky] = "Other"
+    columns["device_type"][risky] = "Unknown"
+    return pd.concat([pd.DataFrame(columns), frame], axis=1)
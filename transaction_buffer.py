@@ -0,0 +1,263 @@
+# transaction_buffer.py
+"""Compact columnar storage for queues of transactions.
+
+A transaction kept as a dict of Python objects (the shape of the dashboard's
+transaction_data) costs well over a kilobyte. TransactionBuffer keeps one
+NumPy array per field instead:
+
+- id as fixed-width ASCII bytes, card_id as a uint32 code into an interned list
+- payment_method, merchant and device_type as uint8 codes into per-buffer
+  vocabularies
+- amount, v14, v17 and risk_score as float64 (so scores match the dict path
+  bit for bit) or, with float_dtype=np.float32, as float32 (scores then
+  differ from the dict path by float32 rounding, ~1e-7)
+- timestamp as float64 Unix seconds plus the int8 hour of day worked out on
+  append
+
+which is 64 bytes per transaction (48 with float32) against ~500 for a dict.
+Arrays grow by doubling, so
+append() is amortized O(1). Slicing returns a buffer over views of the same
+arrays, and column() hands out views, so score() passes the numeric columns
+straight to calculate_risk_scores_encoded without copying them.
+"""
+import time
+from datetime import datetime
+
+import numpy as np
+
+from scoring_engine import (DEFAULT_RISK_TABLE, calculate_risk_scores_encoded, get_hour, get_hours,
+                            get_unix_seconds)
+
+DEFAULT_CAPACITY = 1024
+DEFAULT_ID_WIDTH = 16
+
+CATEGORY_FIELDS = ("payment_method", "merchant", "device_type")
+# Stored as float_dtype; timestamp is always float64
+FLOAT_FIELDS = ("amount", "v14", "v17", "risk_score")
+
+
+class TransactionBuffer:
+    """Growable struct-of-arrays of transactions"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, id_width=DEFAULT_ID_WIDTH, float_dtype=np.float64):
+        self.id_width = id_width
+        self.float_dtype = np.dtype(float_dtype)
+        self._size = 0
+        self._columns = _allocate(max(capacity, 1), id_width, self.float_dtype)
+        # Interned labels: code -> label list and label -> code dict per categorical field
+        self.vocabularies = {name: [] for name in CATEGORY_FIELDS + ("card_id",)}
+        self._codes = {name: {} for name in self.vocabularies}
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return len(self._columns["amount"])
+
+    @property
+    def nbytes(self):
+        """Bytes held by the column arrays (allocated capacity, not just the used rows)"""
+        return sum(column.nbytes for column in self._columns.values())
+
+    @property
+    def row_nbytes(self):
+        """Bytes one transaction takes across the columns"""
+        return sum(column.itemsize for column in self._columns.values())
+
+    def column(self, name):
+        """View of the used part of a column (category fields are codes; see vocabularies)"""
+        return self._columns[name][:self._size]
+
+    def _reserve(self, size):
+        if size <= self.capacity:
+            return
+        # A buffer over an empty slice has capacity 0
+        capacity = max(self.capacity, 1)
+        while capacity < size:
+            capacity *= 2
+        columns = _allocate(capacity, self.id_width, self.float_dtype)
+        for name, column in self._columns.items():
+            columns[name][:self._size] = column[:self._size]
+        self._columns = columns
+
+    def _intern(self, field, label):
+        label = _label(label)
+        codes = self._codes[field]
+        code = codes.get(label)
+        if code is None:
+            code = len(self.vocabularies[field])
+            if code > np.iinfo(self._columns[field].dtype).max:
+                raise OverflowError(f"too many distinct {field} values")
+            codes[label] = code
+            self.vocabularies[field].append(label)
+        return code
+
+    def _intern_many(self, field, labels):
+        labels = np.asarray(labels)
+        try:
+            uniques, inverse = np.unique(labels, return_inverse=True)
+            uniques = uniques.tolist()
+        except TypeError:
+            # Unorderable mix (e.g. None among strings): factorize the normalized labels in Python
+            codes = {}
+            inverse = np.array([codes.setdefault(_label(label), len(codes)) for label in labels.tolist()],
+                               dtype=np.int64)
+            uniques = list(codes)
+        # _intern normalizes each unique, so 7 and "7" (or None and NaN) share a code, as they do in append()
+        lookup = np.array([self._intern(field, label) for label in uniques], dtype=np.int64)
+        return lookup[inverse.ravel()]
+
+    def append(self, transaction_id, amount, v14, v17, payment_method, merchant, device_type="Desktop",
+               card_id=None, timestamp=None, risk_score=None):
+        """Add one transaction; timestamp is anything get_hour accepts (None means now)"""
+        row = self._size
+        self._reserve(row + 1)
+        encoded = str(transaction_id).encode("ascii")
+        if len(encoded) > self.id_width:
+            raise ValueError(f"transaction id longer than {self.id_width} characters: {transaction_id!r}")
+        columns = self._columns
+        columns["id"][row] = encoded
+        columns["card_id"][row] = self._intern("card_id", card_id)
+        columns["amount"][row] = amount
+        columns["v14"][row] = v14
+        columns["v17"][row] = v17
+        columns["payment_method"][row] = self._intern("payment_method", payment_method)
+        columns["merchant"][row] = self._intern("merchant", merchant)
+        columns["device_type"][row] = self._intern("device_type", device_type)
+        columns["timestamp"][row] = get_unix_seconds(timestamp)
+        columns["hour"][row] = get_hour(timestamp)
+        columns["risk_score"][row] = np.nan if risk_score is None else risk_score
+        self._size = row + 1
+        return row
+
+    def extend(self, columns):
+        """Add many transactions from a mapping of field -> array (e.g. a DataFrame)
+
+        Needs id, amount, v14, v17, payment_method and merchant; device_type,
+        card_id, timestamp (Unix or Time-offset seconds, datetime64 or ISO
+        strings) and risk_score are optional.
+        """
+        count = len(columns["amount"])
+        start = self._size
+        self._reserve(start + count)
+        end = start + count
+        target = self._columns
+
+        ids = np.asarray(columns["id"]).astype(np.bytes_)
+        if ids.dtype.itemsize > self.id_width:
+            raise ValueError(f"transaction ids longer than {self.id_width} characters")
+        target["id"][start:end] = ids
+        for name in ("amount", "v14", "v17"):
+            target[name][start:end] = columns[name]
+        for name in CATEGORY_FIELDS:
+            values = columns[name] if name in columns else np.full(count, "Desktop")
+            target[name][start:end] = self._intern_many(name, values)
+        if "card_id" in columns:
+            target["card_id"][start:end] = self._intern_many("card_id", columns["card_id"])
+        else:
+            target["card_id"][start:end] = self._intern("card_id", None)
+        if "timestamp" in columns:
+            timestamps = np.asarray(columns["timestamp"])
+            target["hour"][start:end] = get_hours(timestamps)
+            if timestamps.dtype.kind == "M":
+                # datetime64 of any unit (e.g. a pandas datetime64[ns] column) to seconds
+                timestamps = timestamps.astype("datetime64[s]").astype(np.int64)
+            elif timestamps.dtype.kind not in "iuf":
+                timestamps = [get_unix_seconds(timestamp) for timestamp in timestamps.tolist()]
+            target["timestamp"][start:end] = timestamps
+        else:
+            now = time.time()
+            target["timestamp"][start:end] = now
+            target["hour"][start:end] = get_hour(datetime.fromtimestamp(now))
+        target["risk_score"][start:end] = columns["risk_score"] if "risk_score" in columns else np.nan
+        self._size = end
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._view(key)
+        row = range(self._size)[key]
+        columns = self._columns
+        card_id = self.vocabularies["card_id"][columns["card_id"][row]]
+        score = float(columns["risk_score"][row])
+        return {
+            "id": columns["id"][row].decode("ascii"),
+            "card_id": card_id,
+            "amount": float(columns["amount"][row]),
+            "v14": float(columns["v14"][row]),
+            "v17": float(columns["v17"][row]),
+            "payment_method": self.vocabularies["payment_method"][columns["payment_method"][row]],
+            "merchant": self.vocabularies["merchant"][columns["merchant"][row]],
+            "device_type": self.vocabularies["device_type"][columns["device_type"][row]],
+            "timestamp": float(columns["timestamp"][row]),
+            "hour": int(columns["hour"][row]),
+            "risk_score": None if np.isnan(score) else score,
+        }
+
+    def _view(self, key):
+        """Buffer over views of the selected rows; appending to it copies it first"""
+        view = TransactionBuffer.__new__(TransactionBuffer)
+        view.id_width = self.id_width
+        view.float_dtype = self.float_dtype
+        view._columns = {name: column[:self._size][key] for name, column in self._columns.items()}
+        view._size = len(view._columns["amount"])
+        view.vocabularies = self.vocabularies
+        view._codes = self._codes
+        return view
+
+    def table_ids(self, field, table=None):
+        """Category codes of field as ids into the table's category list, without a copy when they line up"""
+        table = DEFAULT_RISK_TABLE if table is None else table
+        lookup = {"payment_method": table.payment_id, "merchant": table.merchant_id,
+                  "device_type": table.device_id}[field]
+        translate = np.array([lookup(label) for label in self.vocabularies[field]], dtype=np.intp)
+        codes = self.column(field)
+        if np.array_equal(translate, np.arange(len(translate))):
+            return codes
+        return translate[codes]
+
+    def score(self, table=None, store=True):
+        """Risk scores of every row from the column views; store=True also fills the risk_score column"""
+        table = DEFAULT_RISK_TABLE if table is None else table
+        scores = calculate_risk_scores_encoded(
+            self.column("amount"), self.column("v14"), self.column("v17"),
+            self.table_ids("payment_method", table), self.table_ids("merchant", table),
+            self.table_ids("device_type", table), self.column("hour"), table=table,
+        )
+        if store:
+            self.column("risk_score")[:] = scores
+        return scores
+
+    def to_frame(self):
+        """The buffer as a DataFrame with categorical label columns"""
+        import pandas as pd
+
+        frame = pd.DataFrame({"id": self.column("id").astype(str)})
+        for name in ("card_id",) + CATEGORY_FIELDS:
+            frame[name] = pd.Categorical(np.array(self.vocabularies[name], dtype=object)[self.column(name)])
+        for name in ("amount", "v14", "v17", "timestamp", "hour", "risk_score"):
+            frame[name] = self.column(name)
+        return frame
+
+
+# Function to allocate empty columns for capacity rows
+def _allocate(capacity, id_width, float_dtype):
+    columns = {
+        "id": np.zeros(capacity, dtype=f"S{id_width}"),
+        "card_id": np.zeros(capacity, dtype=np.uint32),
+        "payment_method": np.zeros(capacity, dtype=np.uint8),
+        "merchant": np.zeros(capacity, dtype=np.uint8),
+        "device_type": np.zeros(capacity, dtype=np.uint8),
+        "hour": np.zeros(capacity, dtype=np.int8),
+        "timestamp": np.zeros(capacity, dtype=np.float64),
+    }
+    for name in FLOAT_FIELDS:
+        columns[name] = np.zeros(capacity, dtype=float_dtype)
+    return columns
+
+
+# Function to normalize a category label: missing (None or NaN) stays None, anything else becomes its str()
+def _label(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return str(value)
@@ -0,0 +1,264 @@
+# tree_engine.py
+"""Tree-ensemble inference over the 30 model features (V1-V28, Amount, Time).
+
+Every tree of the forest is flattened into shared contiguous node arrays
+(feature, threshold, left, right, value). Leaves point back at themselves, so
+a whole batch can be pushed down all trees one level at a time with NumPy
+gathers instead of per-row Python recursion; (row, tree) pairs drop out of the
+working set as soon as they reach a leaf.
+
+Forests come from train_forest (a small histogram CART trainer, used on
+synthetic data by create_model.py), from a fitted scikit-learn forest, or from
+a .fgm model artifact.
+"""
+import numpy as np
+
+from model_artifact import FEATURE_ORDER
+
+# Rows evaluated together; bounds the (rows x trees) node-index working set
+DEFAULT_BLOCK_ROWS = 16_384
+
+# Prefix of the tree arrays inside a .fgm artifact
+ARTIFACT_PREFIX = "tree_"
+NODE_ARRAYS = ("feature", "threshold", "left", "right", "value")
+
+
+class TreeEnsemble:
+    """Flattened tree ensemble; predict_proba averages the leaf values of all trees"""
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, feature_order=FEATURE_ORDER,
+                 input_dtype="float64"):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.feature_order = tuple(feature_order)
+        # Inputs are rounded to this dtype before comparing (scikit-learn splits on float32)
+        self.input_dtype = np.dtype(input_dtype)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @classmethod
+    def from_trees(cls, trees, feature_order=FEATURE_ORDER, input_dtype="float64"):
+        """Flatten per-tree node arrays.
+
+        Each tree is a dict of feature, threshold, left, right and value arrays
+        indexed locally from 0 (the root); leaves have feature -1.
+        """
+        columns = {name: [] for name in NODE_ARRAYS}
+        roots = []
+        max_depth = 0
+        offset = 0
+        for tree in trees:
+            feature = np.asarray(tree["feature"], dtype=np.int32)
+            left = np.asarray(tree["left"], dtype=np.int32)
+            right = np.asarray(tree["right"], dtype=np.int32)
+            threshold = np.asarray(tree["threshold"], dtype=np.float64).copy()
+            own = np.arange(len(feature), dtype=np.int32)
+            leaf = feature < 0
+
+            # Leaves loop back on themselves so extra levels are no-ops
+            columns["feature"].append(np.where(leaf, 0, feature))
+            columns["threshold"].append(np.where(leaf, np.inf, threshold))
+            columns["left"].append(np.where(leaf, own, left) + offset)
+            columns["right"].append(np.where(leaf, own, right) + offset)
+            columns["value"].append(np.asarray(tree["value"], dtype=np.float64))
+            roots.append(offset)
+            max_depth = max(max_depth, _tree_depth(left, right, leaf))
+            offset += len(feature)
+        return cls(*(np.concatenate(columns[name]) for name in NODE_ARRAYS), roots, max_depth, feature_order,
+                   input_dtype)
+
+    @classmethod
+    def from_sklearn(cls, forest, feature_order=None):
+        """Convert a fitted scikit-learn RandomForestClassifier (positive class = last class)"""
+        trees = []
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            counts = tree.value[:, 0, :]
+            trees.append({
+                "feature": np.where(tree.children_left < 0, -1, tree.feature),
+                "threshold": tree.threshold,
+                "left": tree.children_left,
+                "right": tree.children_right,
+                "value": counts[:, -1] / counts.sum(axis=1),
+            })
+        if feature_order is None:
+            feature_order = getattr(forest, "feature_names_in_", FEATURE_ORDER)
+        return cls.from_trees(trees, [str(name) for name in feature_order], input_dtype="float32")
+
+    @classmethod
+    def from_artifact(cls, artifact):
+        """Load the tree arrays of a .fgm artifact (zero-copy views on its memory map)"""
+        spec = artifact.metadata["tree_ensemble"]
+        arrays = [artifact[ARTIFACT_PREFIX + name] for name in NODE_ARRAYS]
+        return cls(*arrays, artifact[ARTIFACT_PREFIX + "roots"], spec["max_depth"], spec["feature_order"],
+                   spec.get("input_dtype", "float64"))
+
+    def to_artifact(self):
+        """Metadata entry and arrays for save_artifact / save_model_artifact"""
+        arrays = {ARTIFACT_PREFIX + name: getattr(self, name) for name in NODE_ARRAYS}
+        arrays[ARTIFACT_PREFIX + "roots"] = self.roots
+        metadata = {"tree_ensemble": {
+            "n_trees": self.n_trees,
+            "n_nodes": self.n_nodes,
+            "max_depth": self.max_depth,
+            "feature_order": list(self.feature_order),
+            "input_dtype": self.input_dtype.name,
+        }}
+        return metadata, arrays
+
+    def predict_proba(self, X, block_rows=DEFAULT_BLOCK_ROWS):
+        """Fraud probability for each row of X (columns in feature_order)"""
+        X = _prepare_inputs(X, self.input_dtype)
+        n_rows, n_features = X.shape
+        if n_features != len(self.feature_order):
+            raise ValueError(f"expected {len(self.feature_order)} features, got {n_features}")
+
+        output = np.empty(n_rows)
+        for start in range(0, n_rows, block_rows):
+            block = X[start:start + block_rows]
+            flat = block.ravel()
+            # One slot per (row, tree) pair; only pairs not yet at a leaf are advanced
+            node = np.tile(self.roots, len(block))
+            row_base = np.repeat(np.arange(len(block), dtype=np.int64) * n_features, self.n_trees)
+            active = np.flatnonzero(self.left[node] != node)
+            while active.size:
+                current = node[active]
+                go_left = flat[row_base[active] + self.feature[current]] <= self.threshold[current]
+                current = np.where(go_left, self.left[current], self.right[current])
+                node[active] = current
+                active = active[self.left[current] != current]
+            output[start:start + len(block)] = self.value[node].reshape(len(block), self.n_trees).mean(axis=1)
+        return output
+
+    def predict_proba_naive(self, X):
+        """Per-row recursive traversal; reference implementation for tests and benchmarks"""
+        def walk(row, node):
+            if self.left[node] == node:
+                return self.value[node]
+            if row[self.feature[node]] <= self.threshold[node]:
+                return walk(row, self.left[node])
+            return walk(row, self.right[node])
+
+        return np.array([
+            sum(walk(row, root) for root in self.roots.tolist()) / self.n_trees
+            for row in _prepare_inputs(X, self.input_dtype)
+        ])
+
+
+# Function to round inputs to the dtype the splits were learned on, then widen for comparison
+def _prepare_inputs(X, input_dtype):
+    X = np.asarray(X)
+    if input_dtype != np.float64:
+        X = X.astype(input_dtype)
+    return np.ascontiguousarray(X, dtype=np.float64)
+
+
+# Function to get the depth of a tree from its local child arrays
+def _tree_depth(left, right, leaf):
+    depth = 0
+    level = [0]
+    while True:
+        level = [child for node in level if not leaf[node] for child in (left[node], right[node])]
+        if not level:
+            return depth
+        depth += 1
+
+
+# Function to train a small random forest with histogram-binned CART splits
+def train_forest(X, y, n_trees=25, max_depth=8, min_samples_leaf=20, n_bins=32, seed=0,
+                 feature_order=FEATURE_ORDER):
+    """Train a random forest for the positive class of y.
+
+    Splits use gini impurity over n_bins quantile bins per feature, each tree
+    sees a bootstrap sample and sqrt(n_features) random features per split, and
+    classes are re-weighted to balance the rare fraud class.
+    """
+    rng = np.random.default_rng(seed)
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n_rows, n_features = X.shape
+
+    edges = [np.unique(np.quantile(X[:, f], np.linspace(0, 1, n_bins + 1)[1:-1])) for f in range(n_features)]
+    binned = np.empty(X.shape, dtype=np.uint8)
+    for f in range(n_features):
+        binned[:, f] = np.searchsorted(edges[f], X[:, f], side="left")
+
+    positives = y.sum()
+    class_weight = np.where(y == 1, (n_rows - positives) / max(positives, 1), 1.0)
+    features_per_split = max(1, int(np.sqrt(n_features)))
+
+    trees = []
+    for _ in range(n_trees):
+        sample_weight = np.bincount(rng.integers(0, n_rows, n_rows), minlength=n_rows) * class_weight
+        rows = np.flatnonzero(sample_weight)
+        trees.append(_grow_tree(binned, edges, y, sample_weight, rows, rng, max_depth, min_samples_leaf,
+                                features_per_split))
+    return TreeEnsemble.from_trees(trees, feature_order)
+
+
+def _grow_tree(binned, edges, y, sample_weight, rows, rng, max_depth, min_samples_leaf, features_per_split):
+    nodes = {name: [] for name in NODE_ARRAYS}
+
+    def new_node():
+        for name in NODE_ARRAYS:
+            nodes[name].append(-1 if name in ("feature", "left", "right") else 0.0)
+        return len(nodes["feature"]) - 1
+
+    stack = [(new_node(), rows, 0)]
+    while stack:
+        node, rows, depth = stack.pop()
+        weight = sample_weight[rows]
+        weighted_y = weight * y[rows]
+        total, positive = weight.sum(), weighted_y.sum()
+        nodes["value"][node] = positive / total
+        if depth >= max_depth or len(rows) < 2 * min_samples_leaf or positive == 0 or positive == total:
+            continue
+
+        # Weighted gini impurity of a side is 2 * (pos - pos^2 / w); the factor 2 is dropped
+        best_impurity, best_feature, best_bin = positive - positive ** 2 / total, None, None
+        for f in rng.choice(binned.shape[1], features_per_split, replace=False):
+            bins = binned[rows, f]
+            size = len(edges[f]) + 1
+            left_count = np.cumsum(np.bincount(bins, minlength=size))[:-1]
+            left_weight = np.cumsum(np.bincount(bins, weights=weight, minlength=size))[:-1]
+            left_pos = np.cumsum(np.bincount(bins, weights=weighted_y, minlength=size))[:-1]
+            right_weight, right_pos = total - left_weight, positive - left_pos
+            valid = ((left_count >= min_samples_leaf) & (len(rows) - left_count >= min_samples_leaf)
+                     & (left_weight > 0) & (right_weight > 0))
+            if not valid.any():
+                continue
+            with np.errstate(divide="ignore", invalid="ignore"):
+                impurity = (left_pos - left_pos ** 2 / left_weight) + (right_pos - right_pos ** 2 / right_weight)
+            impurity = np.where(valid, impurity, np.inf)
+            split = int(np.argmin(impurity))
+            if impurity[split] < best_impurity - 1e-12:
+                best_impurity, best_feature, best_bin = impurity[split], int(f), split
+        if best_feature is None:
+            continue
+
+        goes_left = binned[rows, best_feature] <= best_bin
+        left, right = new_node(), new_node()
+        nodes["feature"][node] = best_feature
+        nodes["threshold"][node] = edges[best_feature][best_bin]
+        nodes["left"][node], nodes["right"][node] = left, right
+        stack.append((right, rows[~goes_left], depth + 1))
+        stack.append((left, rows[goes_left], depth + 1))
+    return nodes
+
+
+# Function to load a TreeEnsemble from a .fgm model artifact path
+def load_tree_ensemble(path):
+    from model_artifact import load_artifact
+
+    return TreeEnsemble.from_artifact(load_artifact(path))
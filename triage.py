@@ -0,0 +1,237 @@
+# triage.py
+"""Bulk CSV triage for the dashboard.
+
+A TriageJob scores an uploaded CSV in a background thread, chunk by chunk
+with the batch engine (score_file.score_chunk), so the Streamlit script only
+polls progress and never blocks on scoring. When the file is done the chunks
+are combined into one frame (category columns stored as pandas categoricals)
+and:
+
+- page() returns one sorted page; each sort order is an argsort computed once
+  and cached, so paging through a million rows only slices
+- the flagged queue holds rows at or above the HIGH tier, riskiest first, to
+  be worked through the Approve/Review/Block flow one at a time
+"""
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from score_file import resolve_columns, score_chunk
+from scoring_engine import DEFAULT_RISK_TABLE, RISK_TIERS, explain_risk_score, get_hour
+
+DEFAULT_CHUNK_SIZE = 50_000
+DEFAULT_PAGE_SIZE = 50
+
+# Rows whose tier is at least this one are queued for review
+FLAG_TIER = [tier[0] for tier in RISK_TIERS].index("HIGH")
+
+# Input columns kept next to the scores (besides the scoring columns)
+EXTRA_COLUMNS = ("id", "transaction_id", "card_id")
+
+CATEGORY_COLUMNS = ("payment_method", "merchant", "device_type", "risk_level", "risk_tier")
+
+
+class TriageJob:
+    """Scores a CSV file object in a background thread"""
+
+    def __init__(self, source, table=None, chunk_size=DEFAULT_CHUNK_SIZE, hour=None, name=None):
+        self.source = source
+        self.name = name or getattr(source, "name", "upload.csv")
+        self.table = DEFAULT_RISK_TABLE if table is None else table
+        self.chunk_size = chunk_size
+        self.hour = hour
+        self.status = "pending"
+        self.error = None
+        self.rows = 0
+        self.started = None
+        self.finished = None
+        self.results = None
+        self.flagged = np.empty(0, dtype=np.int64)
+        self.decisions = {}
+        self._size = _source_size(source)
+        self._chunks = []
+        self._orders = {}
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="triage-job", daemon=True)
+
+    def start(self):
+        self.status = "running"
+        self.started = time.perf_counter()
+        # Rows without a timestamp use the hour the job started, in every chunk and in transaction()
+        self.hour = datetime.now().hour if self.hour is None else self.hour
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    @property
+    def progress(self):
+        """Fraction of the input consumed (by bytes read)"""
+        if self.status == "done":
+            return 1.0
+        if not self._size:
+            return 0.0
+        try:
+            return min(self.source.tell() / self._size, 0.99)
+        except (AttributeError, ValueError, OSError):
+            return 0.0
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def _run(self):
+        try:
+            for chunk in pd.read_csv(self.source, chunksize=self.chunk_size):
+                if self._cancel.is_set():
+                    self.status = "cancelled"
+                    return
+                self._chunks.append(self._score(chunk))
+                self.rows += len(chunk)
+            self._finish()
+            self.status = "done"
+        except Exception as exc:
+            self.error = exc
+            self.status = "failed"
+        finally:
+            self.finished = time.perf_counter()
+
+    def _score(self, chunk):
+        scored = score_chunk(chunk, self.table, self.hour)
+        columns = resolve_columns(chunk.columns)
+        kept = pd.DataFrame({name: chunk[name].to_numpy() for name in EXTRA_COLUMNS
+                             if name in chunk.columns and name not in scored.columns})
+        for name, source in columns.items():
+            kept[name] = chunk[source].to_numpy()
+        return pd.concat([scored.reset_index(drop=True), kept], axis=1)
+
+    def _finish(self):
+        results = pd.concat(self._chunks, ignore_index=True) if self._chunks else pd.DataFrame()
+        self._chunks = []
+        for name in results.columns:
+            if name in CATEGORY_COLUMNS:
+                results[name] = results[name].astype("category")
+            elif isinstance(results[name].dtype, pd.StringDtype):
+                results[name] = _combine_chunks(results[name])
+        if "id" not in results and "transaction_id" not in results:
+            results.insert(0, "id", np.char.add("ROW-", np.arange(len(results)).astype(str)))
+        self.results = results
+        if len(results):
+            tiers = self.table.tiers.classify(results["risk_score"].to_numpy())
+            flagged = np.flatnonzero(tiers >= FLAG_TIER)
+            self.flagged = flagged[np.argsort(-results["risk_score"].to_numpy()[flagged], kind="stable")]
+
+    def page(self, number, size=DEFAULT_PAGE_SIZE, sort_by="risk_score", descending=True):
+        """Rows of page number (0-based) in the given sort order"""
+        if self.results is None:
+            return pd.DataFrame()
+        order = self._order(sort_by, descending)
+        start = number * size
+        rows = order[start:start + size] if order is not None else np.arange(start, min(start + size, len(self.results)))
+        return self.results.iloc[rows]
+
+    def _order(self, sort_by, descending):
+        if sort_by is None or sort_by not in self.results:
+            return None
+        key = (sort_by, descending)
+        if key not in self._orders:
+            column = self.results[sort_by]
+            values = column.cat.codes.to_numpy() if isinstance(column.dtype, pd.CategoricalDtype) else column.to_numpy()
+            order = np.argsort(values, kind="stable")
+            self._orders[key] = order[::-1] if descending else order
+        return self._orders[key]
+
+    def pages(self, size=DEFAULT_PAGE_SIZE):
+        return max(1, -(-len(self.results) // size)) if self.results is not None else 1
+
+    def pending_flagged(self):
+        """Flagged row positions not decided yet, riskiest first"""
+        return [row for row in self.flagged.tolist() if row not in self.decisions]
+
+    def next_flagged(self):
+        for row in self.flagged.tolist():
+            if row not in self.decisions:
+                return row
+        return None
+
+    def mark_decided(self, row, action):
+        self.decisions[row] = action
+
+    def transaction(self, row):
+        """A result row as the dashboard's transaction_data dict (for the Approve/Review/Block flow)"""
+        record = self.results.iloc[row]
+        timestamp = record.get("timestamp", record.get("time"))
+        if timestamp is None or pd.isna(timestamp):
+            # Scored with the job's fallback hour, as score_chunk did
+            timestamp, hour = None, self.hour
+        else:
+            hour = get_hour(_plain(timestamp))
+        card_id = record.get("card_id")
+        device_type = record.get("device_type", "Desktop")
+        contributions = explain_risk_score(
+            float(record["amount"]), float(record["v14"]), float(record["v17"]), record.get("payment_method"),
+            record.get("merchant"), device_type, self.table, hour=hour,
+        )
+        contributions["velocity"] = 0.0
+        return {
+            "id": str(record.get("id", record.get("transaction_id", row))),
+            "card_id": "—" if card_id is None or pd.isna(card_id) else str(_plain(card_id)),
+            "amount": float(record["amount"]),
+            "merchant": record.get("merchant"),
+            "v14": float(record["v14"]),
+            "v17": float(record["v17"]),
+            "payment_method": record.get("payment_method"),
+            "device_type": device_type,
+            "v21": 0.0,
+            "v22": 0.0,
+            "contributions": contributions,
+            "timestamp": str(timestamp) if timestamp is not None else f"{hour:02d}:00",
+            "risk_score": float(record["risk_score"]),
+            "triage_row": row,
+        }
+
+
+# Function to get the byte size of a file object, or None
+def _source_size(source):
+    size = getattr(source, "size", None)
+    if size is not None:
+        return size
+    try:
+        position = source.tell()
+        source.seek(0, 2)
+        size = source.tell()
+        source.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+# Function to merge the per-chunk buffers of a pyarrow-backed string column, so taking a page is one gather
+def _combine_chunks(column):
+    if column.dtype.storage != "pyarrow":
+        return column
+    import pyarrow as pa
+
+    data = column.array.__arrow_array__()
+    if isinstance(data, pa.ChunkedArray) and data.num_chunks > 1:
+        return pd.Series(pd.array(data.combine_chunks(), dtype=column.dtype), index=column.index, name=column.name)
+    return column
+
+
+# Function to turn a pandas/NumPy scalar into a plain Python value for get_hour
+def _plain(value):
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value